@@ -3,6 +3,11 @@ ASGI config for cebufitnesshubproject project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The staff notification stream (/staff/api/notifications/stream/) is
+only served under ASGI, e.g.:
+    gunicorn cebufitnesshubproject.asgi:application -k uvicorn.workers.UvicornWorker
+Under WSGI the dashboard falls back to polling.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import tempfile
 import dj_database_url
 from dotenv import load_dotenv
 from pathlib import Path
@@ -68,6 +69,9 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'gymapp.profiling.ProfilingMiddleware',  # No-op unless REQUEST_PROFILING is on
+    'gymapp.querylog.QueryLogMiddleware',  # No-op unless QUERY_LOG_FILE is set
+    'gymapp.metrics.MetricsMiddleware',  # No-op unless METRICS_ENABLED is on
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -97,6 +101,33 @@ WSGI_APPLICATION = 'cebufitnesshubproject.wsgi.application'
 
 
 # Database
+# Connection handling is configurable from the environment:
+#   DB_POOL_MODE        'persistent' (default): reuse one connection per worker
+#                         thread for DB_CONN_MAX_AGE seconds, health-checked
+#                         before reuse (CONN_HEALTH_CHECKS).
+#                       'pool': psycopg 3 connection pool inside each worker
+#                         (needs `psycopg[pool]`; best under ASGI).
+#                       'none': new connection per request (old behaviour).
+#   DB_CONN_MAX_AGE     max lifetime of a connection, seconds (default 60)
+#   DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE / DB_POOL_TIMEOUT   pool mode only
+#   DB_PGBOUNCER        'true' when DATABASE_URL goes through PgBouncer in
+#                       transaction mode; auto-detected for port 6543.
+#   DB_CONNECT_TIMEOUT  seconds to wait for a new PostgreSQL connection
+#                       (default 5), so an unreachable server fails fast.
+def env_int(name, default):
+    value = os.getenv(name, '').strip()
+    return int(value) if value else default
+
+def env_bool(name, default):
+    value = os.getenv(name, '').strip().lower()
+    if not value:
+        return default
+    return value in ('true', '1', 'yes', 'y')
+
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'persistent').strip().lower()
+DB_CONN_MAX_AGE = env_int('DB_CONN_MAX_AGE', 60)
+DB_CONNECT_TIMEOUT = env_int('DB_CONNECT_TIMEOUT', 5)
+
 # Use Supabase directly (bypass pgBouncer pooler) by rewriting port/path if needed.
 db_url = os.getenv('DATABASE_URL')
 if db_url:
@@ -110,28 +141,106 @@ if db_url:
     DATABASES = {
         'default': dj_database_url.parse(
             db_url,
-            conn_max_age=0,  # avoid long-lived connections
+            conn_max_age=DB_CONN_MAX_AGE if DB_POOL_MODE == 'persistent' else 0,
+            conn_health_checks=DB_POOL_MODE == 'persistent',
             ssl_require=True,
         )
     }
 else:
     DATABASES = {
         'default': dj_database_url.config(
-            conn_max_age=0,
+            conn_max_age=DB_CONN_MAX_AGE if DB_POOL_MODE == 'persistent' else 0,
+            conn_health_checks=DB_POOL_MODE == 'persistent',
             ssl_require=True,
         )
     }
 
+DB_PGBOUNCER = env_bool('DB_PGBOUNCER', str(DATABASES['default'].get('PORT', '')) == '6543')
+
 # Add search_path/ssl options when using PostgreSQL
 if DATABASES['default'].get('ENGINE') == 'django.db.backends.postgresql':
     DATABASES['default'].setdefault('OPTIONS', {})
     DATABASES['default']['OPTIONS'].update({
         'options': '-c search_path=public',
         'sslmode': 'require',
+        'connect_timeout': DB_CONNECT_TIMEOUT,
     })
     # Recommended for PgBouncer transaction pooling
     DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
 
+    if DB_POOL_MODE == 'pool':
+        try:
+            import psycopg_pool
+        except ImportError:
+            from django.core.exceptions import ImproperlyConfigured
+            raise ImproperlyConfigured("DB_POOL_MODE=pool needs psycopg 3 with the pool extra: pip install 'psycopg[binary,pool]'")
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': env_int('DB_POOL_MIN_SIZE', 1),
+            'max_size': env_int('DB_POOL_MAX_SIZE', 10),
+            'timeout': env_int('DB_POOL_TIMEOUT', 10),
+            'max_lifetime': DB_CONN_MAX_AGE or 3600,
+            'max_idle': 300,
+            # Validate a connection before handing it out (health check)
+            'check': psycopg_pool.ConnectionPool.check_connection,
+        }
+        if DB_PGBOUNCER:
+            # Server-side prepared statements do not survive transaction pooling
+            DATABASES['default']['OPTIONS']['prepare_threshold'] = None
+
+# Live notification stream (gymapp.events)
+# 'local': events reach streams served by the same process (one ASGI worker).
+# 'postgres': events go through LISTEN/NOTIFY so every worker receives them.
+NOTIFICATION_EVENTS = os.getenv('NOTIFICATION_EVENTS', 'local').strip().lower()
+# LISTEN needs a session connection; point this at the direct (non-PgBouncer) URL if needed.
+NOTIFICATION_LISTEN_URL = os.getenv('NOTIFICATION_LISTEN_URL') or None
+
+# Per-request profiling (gymapp.profiling): Server-Timing headers and the
+# staff page at /staff/profiling/. Off by default.
+REQUEST_PROFILING = env_bool('REQUEST_PROFILING', False)
+REQUEST_PROFILING_BUFFER = env_int('REQUEST_PROFILING_BUFFER', 500)  # Requests kept per process
+
+# Slow / duplicate query log (gymapp.querylog): JSON lines appended to
+# QUERY_LOG_FILE. Off (and free) unless a path is set.
+QUERY_LOG_FILE = os.getenv('QUERY_LOG_FILE') or None
+QUERY_LOG_SLOW_MS = env_int('QUERY_LOG_SLOW_MS', 200)
+QUERY_LOG_REPEAT_THRESHOLD = env_int('QUERY_LOG_REPEAT_THRESHOLD', 10)  # Same SQL, different params, per request
+
+# Prometheus metrics at /metrics (gymapp.metrics). Off by default.
+# METRICS_DIR: a local directory every worker on the node can write, so
+# one scrape covers all gunicorn workers (e.g. /tmp/cfh-metrics).
+METRICS_ENABLED = env_bool('METRICS_ENABLED', False)
+METRICS_DIR = os.getenv('METRICS_DIR') or None
+METRICS_FLUSH_SECONDS = env_int('METRICS_FLUSH_SECONDS', 1)  # How often a worker writes its snapshot
+METRICS_TOKEN = os.getenv('METRICS_TOKEN') or None  # If set, scrapes need 'Authorization: Bearer <token>'
+
+# Caches. 'shared' is one directory read by every worker on the node;
+# gymapp.gym_settings keeps the settings version stamp there.
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SHARED_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'cebufitnesshub-cache'),
+    },
+}
+GYM_SETTINGS_CHECK_SECONDS = env_int('GYM_SETTINGS_CHECK_SECONDS', 2)  # How long another worker's settings save may go unseen
+
+# Live occupancy (gymapp.occupancy). With a path set (POSIX only), the
+# count lives in a memory-mapped file shared by the workers on the node
+# and is written to OCCUPANCY_TRACKER.current_count behind it. Use tmpfs,
+# e.g. /dev/shm/cebufitnesshub-occupancy, so a reboot starts from a recount.
+OCCUPANCY_COUNTER_FILE = os.getenv('OCCUPANCY_COUNTER_FILE') or None
+OCCUPANCY_FLUSH_SECONDS = env_int('OCCUPANCY_FLUSH_SECONDS', 5)  # Write-behind interval
+# `manage.py close_stale_visits` checks out visits still open after this
+# many hours, crediting each with this duration at most.
+STALE_VISIT_HOURS = env_int('STALE_VISIT_HOURS', 4)
+
+# Health probes (gymapp.health): /health/live/ and /health/ready/.
+HEALTH_CHECK_CACHE_SECONDS = env_int('HEALTH_CHECK_CACHE_SECONDS', 5)  # Readiness results reused per worker
+HEALTH_DB_SLOW_MS = env_int('HEALTH_DB_SLOW_MS', 100)  # SELECT 1 slower than this is 'degraded'
+HEALTH_DB_TIMEOUT_MS = env_int('HEALTH_DB_TIMEOUT_MS', 2000)  # statement_timeout of the probe (PostgreSQL)
+HEALTH_CONNECTIONS_DEGRADED_PERCENT = env_int('HEALTH_CONNECTIONS_DEGRADED_PERCENT', 80)
+HEALTH_CONNECTIONS_FAIL_PERCENT = env_int('HEALTH_CONNECTIONS_FAIL_PERCENT', 95)
+
 #DATABASES = {
 #    'default': {
         # ----------------------------------------------------
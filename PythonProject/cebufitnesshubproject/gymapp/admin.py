@@ -6,9 +6,12 @@ from .models import (
     GymStaff,
     Account_Request,
     Billing_Record,
+    Daily_Revenue_Rollup,
     Check_In,
     Activity_Log,
     Notification,
+    Notification_Read,
+    Notification_Archive,
     ClassSchedule,
     OCCUPANCY_TRACKER
 )
@@ -101,6 +104,12 @@ class BillingRecordAdmin(admin.ModelAdmin):
     list_filter = ('transaction_type',)
     search_fields = ('member__user__email',)
 
+@admin.register(Daily_Revenue_Rollup)
+class DailyRevenueRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'transaction_type', 'total_amount', 'record_count')
+    list_filter = ('transaction_type',)
+    date_hierarchy = 'date'
+
 @admin.register(Check_In)
 class CheckInAdmin(admin.ModelAdmin):
     list_display = ('member', 'check_in_time', 'check_out_time')
@@ -113,8 +122,18 @@ class ActivityLogAdmin(admin.ModelAdmin):
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ('recipient_staff', 'notification_type', 'message', 'is_read', 'timestamp')
-    list_filter = ('is_read', 'notification_type')
+    list_display = ('notification_type', 'message', 'digest_count', 'timestamp')
+    list_filter = ('notification_type',)
+
+@admin.register(Notification_Read)
+class NotificationReadAdmin(admin.ModelAdmin):
+    list_display = ('notification', 'staff', 'read_at')
+    list_select_related = ('notification', 'staff__user')
+
+@admin.register(Notification_Archive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ('notification_type', 'message', 'timestamp', 'archived_at')
+    list_filter = ('notification_type',)
 
 @admin.register(ClassSchedule)
 class ClassScheduleAdmin(admin.ModelAdmin):
@@ -7,3 +7,7 @@ class GymappConfig(AppConfig):
 
     def ready(self):
         import gymapp.signals
+
+        from gymapp import querylog
+        if querylog.enabled():
+            querylog.install()
@@ -0,0 +1,146 @@
+"""
+Live notification events for the staff dashboard stream.
+
+Each server process keeps a set of subscriber queues, one per open
+Server-Sent Events connection (see `staff_notification_stream`).
+`publish` pushes an event into every queue without touching the
+database, so idle dashboards cost nothing while they wait.
+
+With NOTIFICATION_EVENTS = 'local' (the default) only streams served by
+the same process see an event, which is enough for a single ASGI
+worker. With 'postgres', events go out through pg_notify and every
+process runs one LISTEN thread that feeds its local queues, so any
+number of workers stay in sync. LISTEN needs a session, not a
+transaction-pooled connection: set NOTIFICATION_LISTEN_URL to a direct
+database URL when DATABASE_URL points at PgBouncer.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.db import connection, connections
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'gymapp_notifications'
+
+_subscribers = set()  # (event loop, asyncio.Queue) pairs
+_lock = threading.Lock()
+_listener = None
+
+
+def _backend():
+    return getattr(settings, 'NOTIFICATION_EVENTS', 'local')
+
+
+def subscribe():
+    """Registers a queue for the running event loop and returns it."""
+    queue = asyncio.Queue(maxsize=100)
+    with _lock:
+        _subscribers.add((asyncio.get_running_loop(), queue))
+    if _backend() == 'postgres':
+        _ensure_listener()
+    return queue
+
+
+def unsubscribe(queue):
+    with _lock:
+        for entry in [entry for entry in _subscribers if entry[1] is queue]:
+            _subscribers.discard(entry)
+
+
+def _put(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        pass  # Stalled client; it resyncs over HTTP when it reconnects
+
+
+def dispatch(event):
+    """Hands `event` to every subscriber in this process (thread-safe)."""
+    with _lock:
+        subscribers = list(_subscribers)
+    for loop, queue in subscribers:
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(_put, queue, event)
+
+
+def publish(event):
+    """
+    Sends `event` (a JSON-serializable dict) to every connected stream.
+    Call it after the transaction that created the data has committed.
+    """
+    if _backend() == 'postgres':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, json.dumps(event)])
+    else:
+        dispatch(event)
+
+
+# --- Postgres LISTEN thread (NOTIFICATION_EVENTS = 'postgres') ---
+
+def _listen_connection():
+    """
+    A dedicated autocommit session with LISTEN running, opened with the
+    driver the default database uses (psycopg2, or psycopg 3, which
+    DB_POOL_MODE=pool requires) and outside any pool.
+    """
+    database = connections['default']
+    listen_url = getattr(settings, 'NOTIFICATION_LISTEN_URL', None)
+    if listen_url:
+        conn = database.Database.connect(listen_url)
+    else:
+        conn = database.Database.connect(**database.get_connection_params())
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def _payloads(conn):
+    """Notification payloads as they arrive; wakes every 30 s when idle."""
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    if is_psycopg3:
+        while True:
+            for notify in conn.notifies(timeout=30):
+                yield notify.payload
+    while True:
+        if select.select([conn], [], [], 30) == ([], [], []):
+            continue
+        conn.poll()
+        while conn.notifies:
+            yield conn.notifies.pop(0).payload
+
+
+def _listen_forever():
+    while True:
+        conn = None
+        try:
+            conn = _listen_connection()
+            for payload in _payloads(conn):
+                dispatch(json.loads(payload))
+        except Exception:
+            logger.exception('Notification listener lost its connection; retrying.')
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()  # Otherwise every outage leaks a server connection
+                except Exception:
+                    pass
+        threading.Event().wait(5)
+
+
+def _ensure_listener():
+    global _listener
+    with _lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = threading.Thread(target=_listen_forever, name='notification-listener', daemon=True)
+            _listener.start()
@@ -0,0 +1,86 @@
+"""
+Cached access to the gym settings row (OCCUPANCY_TRACKER pk=1).
+
+Fee, capacity, peak hours and the membership ID prefix are read on hot
+paths (both dashboards, check-in/out, activation) but change only when
+staff save the settings page or the admin. Each worker keeps the row in
+memory next to the version stamp it was loaded under. The stamp lives
+in the 'shared' cache, a file every worker on the node reads, so a save
+in one worker makes the others reload. Each worker reads the stamp at
+most once every GYM_SETTINGS_CHECK_SECONDS; reads in between cost a
+clock read and a copy, with no file access and no query. A save is seen
+at once by the worker that made it and within that interval by the rest.
+
+Saving the row (any .save(), including the settings page and the admin)
+bumps the stamp through the post_save signal, and again once the
+transaction commits, so no worker keeps a row read before the commit.
+Queryset .update() calls skip the signal; call `invalidate()` after one.
+
+current_count is live data and changes on every check-in, so it must not
+be read from the cached row: use gymapp.occupancy.current_occupancy().
+"""
+import copy
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import OCCUPANCY_TRACKER
+
+VERSION_KEY = 'gym-settings-version'
+SETTINGS_PK = 1
+
+# First-run values, as on the staff settings page
+DEFAULTS = {
+    'capacity_limit': 120,
+    'peak_hours_start': '08:00',
+    'peak_hours_end': '20:00',
+    'default_monthly_fee': 2000.00,
+    'gym_name': 'Cebu Fitness Hub',
+    'contact_number': '+63 917 123 4567',
+    'contact_address': '5th Floor, 8 Banawa Centrale, R. Duterte Street, Cebu City',
+}
+
+_lock = threading.Lock()
+_cached = (None, None, 0.0)  # (version stamp, OCCUPANCY_TRACKER, time.monotonic() the stamp was checked)
+
+
+def _shared():
+    return caches['shared']
+
+
+def _current_version():
+    version = _shared().get(VERSION_KEY)
+    if version is None:
+        _shared().add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = _shared().get(VERSION_KEY)
+    return version
+
+
+def get_gym_settings():
+    """
+    The settings row, created with DEFAULTS on first use. Returns a copy,
+    so callers may change and save it without touching the cached row.
+    """
+    global _cached
+    cached_version, row, checked_at = _cached
+    now = time.monotonic()
+    if row is not None and now - checked_at < settings.GYM_SETTINGS_CHECK_SECONDS:
+        return copy.copy(row)
+    version = _current_version()
+    if row is None or cached_version != version:
+        row, _ = OCCUPANCY_TRACKER.objects.get_or_create(pk=SETTINGS_PK, defaults=DEFAULTS)
+    with _lock:
+        _cached = (version, row, now)
+    return copy.copy(row)
+
+
+def invalidate():
+    """Makes every worker reload the row on its next access."""
+    global _cached
+    _shared().set(VERSION_KEY, uuid.uuid4().hex, None)
+    with _lock:
+        _cached = (None, None, 0.0)
+
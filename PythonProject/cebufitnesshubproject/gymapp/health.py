@@ -0,0 +1,221 @@
+"""
+Liveness and readiness checks for the load balancer and the platform.
+
+/health/live/ only proves the worker can answer: it never touches the
+database, so a slow database does not get healthy workers restarted.
+
+/health/ready/ runs the checks below and reports each one as 'ok',
+'degraded' or 'fail'. The overall status is the worst of them, and
+'fail' answers 503 so the load balancer stops routing to the worker.
+
+  database     connect (if needed) and a timed SELECT 1;
+               degraded above HEALTH_DB_SLOW_MS. On PostgreSQL the
+               statement gives up after HEALTH_DB_TIMEOUT_MS, and a new
+               connection after DB_CONNECT_TIMEOUT seconds, so a hung
+               database fails the check instead of hanging the probe
+  connections  with DB_POOL_MODE=pool, this worker's pool: degraded when
+               HEALTH_CONNECTIONS_DEGRADED_PERCENT of it is in use, fail
+               while requests queue for a connection. Otherwise, on
+               PostgreSQL, server connections in use against
+               max_connections (degraded / fail at the two percentages)
+  migrations   fail while migrations are unapplied (new code, old schema)
+  cache        a set/get round trip on every configured cache
+
+Results are kept for HEALTH_CHECK_CACHE_SECONDS per worker, so probes
+from several load balancers cost at most one round of checks per
+interval. One probe runs the round; probes arriving meanwhile get the
+previous result (with its age) instead of waiting for it. Once a worker
+has seen no pending migrations it stops looking: its code, and so its
+migration set, cannot change.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+OK, DEGRADED, FAIL = 'ok', 'degraded', 'fail'
+_SEVERITY = {OK: 0, DEGRADED: 1, FAIL: 2}
+
+_started = time.monotonic()
+_lock = threading.Lock()
+_cached = None  # (monotonic time, result)
+_refreshing = False
+_migrations_applied = False
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def _usage_status(used, limit):
+    percent = used / limit * 100 if limit else 0
+    if percent >= settings.HEALTH_CONNECTIONS_FAIL_PERCENT:
+        return FAIL, round(percent, 1)
+    if percent >= settings.HEALTH_CONNECTIONS_DEGRADED_PERCENT:
+        return DEGRADED, round(percent, 1)
+    return OK, round(percent, 1)
+
+
+# --- Checks: each returns a dict with at least 'status' ---
+
+def check_database():
+    connection = connections[DEFAULT_DB_ALIAS]
+    started = time.perf_counter()
+    connection.ensure_connection()
+    connected = time.perf_counter()
+    postgresql = connection.vendor == 'postgresql'
+    with transaction.atomic(using=DEFAULT_DB_ALIAS), connection.cursor() as cursor:
+        if postgresql:
+            # Transaction-local; a timeout rolls it back with the savepoint, success restores it
+            cursor.execute(
+                "SELECT current_setting('statement_timeout'), set_config('statement_timeout', %s, true)",
+                [str(settings.HEALTH_DB_TIMEOUT_MS)],
+            )
+            previous_timeout = cursor.fetchone()[0]
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+        latency = time.perf_counter() - connected
+        if postgresql:
+            cursor.execute("SELECT set_config('statement_timeout', %s, true)", [previous_timeout])
+    return {
+        'status': DEGRADED if latency * 1000 > settings.HEALTH_DB_SLOW_MS else OK,
+        'vendor': connection.vendor,
+        'connect_ms': _ms(connected - started),
+        'latency_ms': _ms(latency),
+    }
+
+
+def check_connections():
+    connection = connections[DEFAULT_DB_ALIAS]
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        stats = pool.get_stats()
+        in_use = stats.get('pool_size', 0) - stats.get('pool_available', 0)
+        waiting = stats.get('requests_waiting', 0)
+        status, percent = _usage_status(in_use, pool.max_size)
+        return {
+            'status': FAIL if waiting else (DEGRADED if status == FAIL else status),
+            'mode': 'pool',
+            'in_use': in_use,
+            'max_size': pool.max_size,
+            'percent_used': percent,
+            'requests_waiting': waiting,
+        }
+    if connection.vendor != 'postgresql':
+        return {'status': OK, 'mode': settings.DB_POOL_MODE, 'detail': 'not measured on this database'}
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*), current_setting('max_connections')::int FROM pg_stat_activity")
+        in_use, limit = cursor.fetchone()
+    status, percent = _usage_status(in_use, limit)
+    return {
+        'status': status,
+        'mode': settings.DB_POOL_MODE,
+        'server_connections': in_use,
+        'max_connections': limit,
+        'percent_used': percent,
+    }
+
+
+def check_migrations():
+    global _migrations_applied
+    if _migrations_applied:
+        return {'status': OK, 'pending': []}
+    executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    pending = [f'{migration.app_label}.{migration.name}' for migration, _ in plan]
+    _migrations_applied = not pending
+    return {'status': FAIL if pending else OK, 'pending': pending}
+
+
+def check_cache():
+    results = {}
+    status = OK
+    key = f'health-check:{os.getpid()}'
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        value = time.time()
+        started = time.perf_counter()
+        try:
+            cache.set(key, value, 30)
+            working = cache.get(key) == value
+        except Exception as e:
+            results[alias] = {'status': FAIL, 'error': str(e)}
+            status = FAIL
+            continue
+        results[alias] = {'status': OK if working else FAIL, 'latency_ms': _ms(time.perf_counter() - started)}
+        if not working:
+            status = FAIL
+    return {'status': status, 'caches': results}
+
+
+CHECKS = [
+    ('database', check_database),
+    ('connections', check_connections),
+    ('migrations', check_migrations),
+    ('cache', check_cache),
+]
+
+
+def _run_checks():
+    checks = {}
+    for name, check in CHECKS:
+        started = time.perf_counter()
+        try:
+            result = check()
+        except Exception as e:
+            result = {'status': FAIL, 'error': f'{type(e).__name__}: {e}'}
+        result['duration_ms'] = _ms(time.perf_counter() - started)
+        checks[name] = result
+    return {
+        'status': max((check['status'] for check in checks.values()), key=_SEVERITY.get),
+        'checked_at': timezone.now().isoformat(),
+        'pid': os.getpid(),
+        'checks': checks,
+    }
+
+
+def readiness():
+    """
+    The latest check results, re-run at most every HEALTH_CHECK_CACHE_SECONDS.
+    Only one thread runs the checks; the others answer from the previous
+    round meanwhile, so a hanging check never piles up probe threads.
+    """
+    global _cached, _refreshing
+    with _lock:
+        now = time.monotonic()
+        due = _cached is None or now - _cached[0] >= settings.HEALTH_CHECK_CACHE_SECONDS
+        refresh = due and not _refreshing
+        if refresh:
+            _refreshing = True
+        cached = _cached
+    if refresh:
+        try:
+            cached = (now, _run_checks())
+            with _lock:
+                _cached = cached
+        finally:
+            with _lock:
+                _refreshing = False
+    if cached is None:
+        # The very first round is still running in another thread
+        return {'status': DEGRADED, 'detail': 'first round of checks still running',
+                'pid': os.getpid(), 'checks': {}, 'cached': False, 'age_seconds': None}
+    checked, result = cached
+    return dict(result, cached=not refresh, age_seconds=round(time.monotonic() - checked, 2))
+
+
+def liveness():
+    return {'status': OK, 'pid': os.getpid(), 'uptime_seconds': round(time.monotonic() - _started, 1)}
+
+
+def clear():
+    """Forgets cached results, including that migrations were applied (tests)."""
+    global _cached, _migrations_applied
+    with _lock:
+        _cached = None
+        _migrations_applied = False
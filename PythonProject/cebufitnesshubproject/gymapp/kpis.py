@@ -0,0 +1,81 @@
+"""
+KPI figures for the staff dashboard header.
+
+All figures take three small queries: a count of active members, a
+count of pending account requests (served by the partial
+acct_req_pending_idx) and one conditional aggregation over the current
+month's Daily_Revenue_Rollup rows (today's revenue, monthly revenue
+and MRR). The rollup is keyed by local date, so no
+per-row timezone conversion happens at read time. `day_range` gives
+the matching aware [start, end) timestamp range for code that has to
+query Billing_Record directly.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import Account_Request, Daily_Revenue_Rollup, gym_Member
+
+
+def local_day_start(day):
+    """Aware datetime for local midnight at the start of `day`."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def day_range(day):
+    """[start, end) timestamps covering one local calendar day."""
+    return local_day_start(day), local_day_start(day + timedelta(days=1))
+
+
+def active_member_filter(today, prefix=''):
+    """Q object matching members counted as 'active' on `today`."""
+    return (
+        Q(**{f'{prefix}user__is_active': True, f'{prefix}is_frozen': False}) &
+        (Q(**{f'{prefix}next_due_date__isnull': True}) | Q(**{f'{prefix}next_due_date__gte': today}))
+    )
+
+
+def member_kpis(today):
+    """
+    Active member count and pending approval count, in two queries.
+    Pending requests are counted on their own, so the count reads the
+    partial index instead of joining every member to its requests.
+    """
+    return {
+        'active_members': gym_Member.objects.filter(active_member_filter(today)).count(),
+        'pending_approvals': Account_Request.objects.filter(status='PENDING').count(),
+    }
+
+
+def revenue_kpis(today):
+    """
+    Today's revenue, this month's revenue and MRR, in one query over
+    the daily rollup (at most ~90 rows for a month).
+    Payments are stored as negative amounts, so they are flipped here.
+    """
+    first_of_month = today.replace(day=1)
+    totals = Daily_Revenue_Rollup.objects.filter(
+        date__gte=first_of_month,
+        date__lte=today,
+        transaction_type__in=['PAYMENT', 'FEE'],
+    ).aggregate(
+        todays_payments=Sum('total_amount', filter=Q(transaction_type='PAYMENT', date=today)),
+        monthly_payments=Sum('total_amount', filter=Q(transaction_type='PAYMENT')),
+        mrr=Sum('total_amount', filter=Q(transaction_type='FEE')),
+    )
+    zero = Decimal('0.00')
+    return {
+        'todays_revenue': zero - (totals['todays_payments'] or zero),
+        'monthly_revenue': zero - (totals['monthly_payments'] or zero),
+        'mrr': totals['mrr'] or zero,
+    }
+
+
+def dashboard_kpis(now=None):
+    """Every KPI shown in the staff dashboard header."""
+    today = timezone.localdate(now or timezone.now())
+    kpis = member_kpis(today)
+    kpis.update(revenue_kpis(today))
+    return kpis
@@ -0,0 +1,81 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from gymapp.models import OCCUPANCY_TRACKER
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures per-request database latency under the configured connection "
+        "mode (DB_POOL_MODE / DB_CONN_MAX_AGE) and, with --compare, under a new "
+        "connection per request (the old conn_max_age=0 behaviour). Each simulated "
+        "request fires Django's request_started/request_finished signals, so "
+        "connections are opened, reused and closed exactly as in a real request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Simulated requests per run. Default: 100.')
+        parser.add_argument('--queries', type=int, default=3, help='Queries per request. Default: 3.')
+        parser.add_argument('--compare', action='store_true',
+                            help='Also run with a new connection per request and print both.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['queries'] < 1:
+            raise CommandError('--requests and --queries must be at least 1.')
+
+        self.stdout.write(
+            f"Database: {connection.vendor} | DB_POOL_MODE={settings.DB_POOL_MODE} "
+            f"CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']} "
+            f"CONN_HEALTH_CHECKS={connection.settings_dict['CONN_HEALTH_CHECKS']} "
+            f"PgBouncer={settings.DB_PGBOUNCER}"
+        )
+
+        if options['compare']:
+            if settings.DB_POOL_MODE == 'pool':
+                raise CommandError('--compare needs DB_POOL_MODE=persistent; pool mode cannot be switched off at runtime.')
+            saved = connection.settings_dict['CONN_MAX_AGE']
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = 0
+            try:
+                self._report('new connection per request', self._run(options))
+            finally:
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = saved
+
+        self._report('configured mode', self._run(options))
+
+    def _run(self, options):
+        opened = []
+
+        def count_connection(sender, **kwargs):
+            opened.append(1)
+
+        connection_created.connect(count_connection)
+        timings = []
+        try:
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                request_started.send(sender=WSGIHandler)
+                for _ in range(options['queries']):
+                    OCCUPANCY_TRACKER.objects.filter(pk=1).exists()
+                request_finished.send(sender=WSGIHandler)
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection_created.disconnect(count_connection)
+        return timings, len(opened)
+
+    def _report(self, label, result):
+        timings, opened = result
+        ordered = sorted(timings)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: mean {statistics.mean(timings):.2f} ms | p50 {statistics.median(timings):.2f} ms | "
+            f"p95 {p95:.2f} ms | max {ordered[-1]:.2f} ms | connections opened: {opened}"
+        ))
@@ -0,0 +1,206 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from gymapp.models import (
+    Account_Request, Activity_Log, Billing_Record, Check_In, CustomUser, Notification, gym_Member,
+)
+
+# (label, url name, url args, query string, role). Read-only requests only,
+# so repeated runs measure the same data.
+ENDPOINTS = [
+    ('landing', 'landing', [], {}, None),
+    ('member dashboard', 'member_dashboard', [], {}, 'member'),
+    ('account settings', 'account_settings', [], {}, 'member'),
+    ('member details', 'member_details', [], {}, 'member'),
+    ('check-in history', 'check_in', [], {}, 'member'),
+    ('billing history', 'billing_history', [], {}, 'member'),
+    ('member schedule', 'member_schedule', [], {}, 'member'),
+    ('member schedule API', 'member_schedule_data', [], {}, 'member'),
+    ('staff dashboard', 'staff_dashboard', [], {}, 'staff'),
+    ('staff schedule', 'staff_schedule', [], {}, 'staff'),
+    ('staff schedule API', 'staff_schedule_data', [], {}, 'staff'),
+    ('staff settings', 'staff_settings', [], {}, 'staff'),
+    ('members API (active)', 'staff_member_list_api', ['active'], {}, 'staff'),
+    ('members API (pending)', 'staff_member_list_api', ['pending'], {}, 'staff'),
+    ('members API (frozen)', 'staff_member_list_api', ['frozen'], {}, 'staff'),
+    ('members API (deactivated)', 'staff_member_list_api', ['deactivated'], {}, 'staff'),
+    ('members API (search)', 'staff_member_list_api', ['active'], {'q': 'an'}, 'staff'),
+    ('KPI API', 'staff_kpis_api', [], {}, 'staff'),
+    ('revenue chart (daily)', 'revenue_chart_data', [], {'filter': 'daily'}, 'staff'),
+    ('revenue chart (monthly)', 'revenue_chart_data', [], {'filter': 'monthly'}, 'staff'),
+    ('revenue chart (3 years)', 'revenue_chart_data', [], {'granularity': 'month'}, 'staff'),
+    ('notifications API', 'fetch_notifications_api', [], {}, 'staff'),
+]
+
+VOLUME_MODELS = [
+    ('users', CustomUser), ('members', gym_Member), ('check_ins', Check_In), ('activity_logs', Activity_Log),
+    ('billing_records', Billing_Record), ('account_requests', Account_Request), ('notifications', Notification),
+]
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=settings.BASE_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Times every read-only page and JSON API against the current database "
+        "(fill it first with generate_synthetic_data) and writes a JSON report "
+        "with per-endpoint latency percentiles, query counts and the table "
+        "volumes. Pass --compare with an earlier report to see the change per "
+        "endpoint; --max-regression turns slowdowns into a failing exit code."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10, help='Timed requests per endpoint. Default: 10.')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per endpoint first. Default: 2.')
+        parser.add_argument('--output', help='Report path. Default: benchmark-<timestamp>.json.')
+        parser.add_argument('--compare', help='Earlier report to compare against.')
+        parser.add_argument('--max-regression', type=float,
+                            help='Fail if any p50 is this many percent slower than in --compare, '
+                                 'or any endpoint runs more queries.')
+        parser.add_argument('--staff-email', help='Staff account to benchmark as. Default: first staff account.')
+        parser.add_argument('--member-email', help='Member to benchmark as. Default: the approved member with most visits.')
+        parser.add_argument('--only', action='append', help='Only endpoints whose label contains this (repeatable).')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError('--iterations must be at least 1 and --warmup cannot be negative.')
+        if options['max_regression'] is not None and not options['compare']:
+            raise CommandError('--max-regression needs --compare.')
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as handle:
+                    baseline = {row['label']: row for row in json.load(handle)['results']}
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Cannot read report '{options['compare']}': {e}")
+
+        users = {None: None, 'staff': self._staff(options['staff_email']), 'member': self._member(options['member_email'])}
+        endpoints = [
+            endpoint for endpoint in ENDPOINTS
+            if not options['only'] or any(term.lower() in endpoint[0].lower() for term in options['only'])
+        ]
+        if not endpoints:
+            raise CommandError('No endpoints match --only.')
+
+        results = []
+        for label, name, url_args, query, role in endpoints:
+            result = self._measure(label, reverse(name, args=url_args), query, users[role], role, options)
+            results.append(result)
+            self._print(result, baseline.get(label) if baseline else None)
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'git_commit': _git_commit(),
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'iterations': options['iterations'],
+            'volumes': {label: model.objects.count() for label, model in VOLUME_MODELS},
+            'results': results,
+        }
+        path = options['output'] or f"benchmark-{timezone.now():%Y%m%d-%H%M%S}.json"
+        with open(path, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Report written to {path}'))
+
+        if options['max_regression'] is not None:
+            self._check_regressions(results, baseline, options['max_regression'])
+
+    def _staff(self, email):
+        staff = CustomUser.objects.filter(is_staff=True, is_active=True, gym_staff__isnull=False)
+        user = staff.filter(email=email).first() if email else staff.order_by('pk').first()
+        if user is None:
+            raise CommandError('No staff account found. Run generate_synthetic_data or pass --staff-email.')
+        return user
+
+    def _member(self, email):
+        members = CustomUser.objects.filter(is_active=True, gym_member__activation_status='approved')
+        if email:
+            user = members.filter(email=email).first()
+        else:
+            # The busiest member has the longest history pages
+            user = members.annotate(visits=Count('gym_member__check_ins')).order_by('-visits', 'pk').first()
+        if user is None:
+            raise CommandError('No approved member found. Run generate_synthetic_data or pass --member-email.')
+        return user
+
+    def _client(self, user):
+        # Client() sends Host: testserver, which ALLOWED_HOSTS only accepts under the test runner
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+        client = Client(HTTP_HOST=hosts[0] if hosts else 'localhost')
+        if user is not None:
+            client.force_login(user)
+        return client
+
+    def _measure(self, label, url, query, user, role, options):
+        client = self._client(user)
+        for _ in range(options['warmup']):
+            client.get(url, query)
+
+        timings = []
+        for _ in range(options['iterations']):
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = client.get(url, query)
+                timings.append((time.perf_counter() - started) * 1000)
+
+        ordered = sorted(timings)
+        return {
+            'label': label,
+            'url': url,
+            'query': query,
+            'role': role,
+            'status': response.status_code,
+            'queries': len(ctx.captured_queries),
+            'bytes': len(response.content),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(_percentile(ordered, 0.95), 2),
+            'max_ms': round(ordered[-1], 2),
+        }
+
+    def _print(self, result, previous):
+        line = (f"{result['label']:<28} {result['status']} | p50 {result['p50_ms']:>8.2f} ms | "
+                f"p95 {result['p95_ms']:>8.2f} ms | {result['queries']:>3} queries")
+        if previous:
+            change = (result['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] * 100 if previous['p50_ms'] else 0
+            line += f" | p50 {change:+.1f}% | queries {result['queries'] - previous['queries']:+d}"
+        style = self.style.ERROR if result['status'] >= 400 else (lambda text: text)
+        self.stdout.write(style(line))
+
+    def _check_regressions(self, results, baseline, limit):
+        failures = []
+        for result in results:
+            previous = baseline.get(result['label'])
+            if not previous:
+                continue
+            if result['queries'] > previous['queries']:
+                failures.append(f"{result['label']}: {previous['queries']} -> {result['queries']} queries")
+            if previous['p50_ms'] and (result['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] * 100 > limit:
+                failures.append(f"{result['label']}: p50 {previous['p50_ms']} -> {result['p50_ms']} ms")
+        if failures:
+            raise CommandError('Performance regressions:\n  ' + '\n  '.join(failures))
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gymapp import occupancy
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks out members who left without checking out: closes open visits "
+        "older than STALE_VISIT_HOURS (or --max-hours), writes their Activity_Log "
+        "rows and lowers the live occupancy count. Run hourly (e.g. cron), and "
+        "with --all at closing time to empty the gym."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-hours', type=int, default=None,
+                            help='Close visits open longer than this, crediting this long at most. '
+                                 'Default: STALE_VISIT_HOURS.')
+        parser.add_argument('--all', action='store_true', dest='everyone',
+                            help='Close every open visit (closing time).')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Visits per transaction. Default: 500.')
+
+    def handle(self, *args, **options):
+        max_hours = options['max_hours'] if options['max_hours'] is not None else settings.STALE_VISIT_HOURS
+        for name, value in (('max-hours', max_hours), ('batch-size', options['batch_size'])):
+            if value < 1:
+                raise CommandError(f'--{name} must be at least 1.')
+
+        closed = occupancy.close_stale_visits(
+            timedelta(hours=max_hours), everyone=options['everyone'], batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Closed {closed} open visits; occupancy is now {occupancy.current_occupancy()}.'
+        ))
@@ -0,0 +1,258 @@
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from gymapp.models import (
+    Account_Request, Activity_Log, Billing_Record, Check_In, CustomUser, GymStaff, Notification,
+    OCCUPANCY_TRACKER, gym_Member,
+)
+from gymapp import occupancy
+from gymapp.notifications import recount_all_unread
+from gymapp.revenue import rebuild_rollup
+
+SYNTHETIC_DOMAIN = 'synthetic.test'
+PASSWORD = 'SyntheticPass123'
+
+FIRST_NAMES = ['Andrea', 'Bea', 'Carlo', 'Dan', 'Ella', 'Franco', 'Gia', 'Hans', 'Isa', 'Jun',
+               'Kyla', 'Leo', 'Mika', 'Nico', 'Olive', 'Paolo', 'Rica', 'Sam', 'Tina', 'Vince']
+LAST_NAMES = ['Abella', 'Bautista', 'Cruz', 'Dela Cruz', 'Escano', 'Flores', 'Garcia', 'Lim',
+              'Mendoza', 'Navarro', 'Ong', 'Perez', 'Quijano', 'Reyes', 'Santos', 'Tan', 'Uy', 'Villanueva']
+
+# Share of members in each roster list; the rest are active
+PENDING_SHARE = 0.04
+FROZEN_SHARE = 0.04
+EXPIRED_SHARE = 0.08
+DEACTIVATED_SHARE = 0.03
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with synthetic members, staff, visit history, billing "
+        "ledgers, account requests and notifications at production-like volumes. "
+        "Rows are written with bulk inserts, so the per-row signals do not fire; "
+        "the revenue rollup, unread counters and occupancy count are rebuilt at "
+        "the end. Synthetic accounts use @" + SYNTHETIC_DOMAIN + " addresses and "
+        "the password '" + PASSWORD + "'. Never run this against production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=2000, help='Members to create. Default: 2000.')
+        parser.add_argument('--staff', type=int, default=5, help='Staff accounts to create. Default: 5.')
+        parser.add_argument('--years', type=int, default=3, help='Years of history. Default: 3.')
+        parser.add_argument('--visits-per-week', type=float, default=2.5,
+                            help='Average visits per member per week. Default: 2.5.')
+        parser.add_argument('--requests-per-member', type=float, default=0.5,
+                            help='Average freeze/unfreeze requests per member. Default: 0.5.')
+        parser.add_argument('--notifications', type=int, default=5000, help='Notifications to create. Default: 5000.')
+        parser.add_argument('--checked-in', type=int, default=40,
+                            help='Members currently in the gym (open check-ins). Default: 40.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, for repeatable data. Default: 42.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT. Default: 5000.')
+        parser.add_argument('--flush', action='store_true', help='Delete earlier synthetic data first.')
+
+    def handle(self, *args, **options):
+        for name in ('members', 'staff', 'years', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+        for name in ('visits_per_week', 'requests_per_member', 'notifications', 'checked_in'):
+            if options[name] < 0:
+                raise CommandError(f"--{name.replace('_', '-')} cannot be negative.")
+
+        existing = CustomUser.objects.filter(email__endswith=f'@{SYNTHETIC_DOMAIN}')
+        if existing.exists():
+            if not options['flush']:
+                raise CommandError('Synthetic data already exists. Re-run with --flush to replace it.')
+            self._flush(existing)
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=365 * options['years'])
+        self.counts = {}
+
+        OCCUPANCY_TRACKER.objects.get_or_create(pk=1)
+        self.fee = OCCUPANCY_TRACKER.objects.get(pk=1).default_monthly_fee or Decimal('1500.00')
+
+        staff = self._create_staff(options['staff'])
+        members = self._create_members(options['members'])
+        self._create_history(members, staff, options['visits_per_week'], options['requests_per_member'])
+        self._create_open_visits(members, options['checked_in'])
+        self._create_notifications(members, options['notifications'])
+
+        self.stdout.write('Rebuilding revenue rollup and unread counters...')
+        rebuild_rollup()
+        recount_all_unread()
+        occupancy.recover()  # current_count (and the shared counter) from the open visits
+
+        summary = ', '.join(f'{count} {label}' for label, count in self.counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary}.'))
+
+    # --- Helpers ---
+
+    def _count(self, label, amount):
+        self.counts[label] = self.counts.get(label, 0) + amount
+
+    def _insert(self, model, rows, label):
+        """Bulk-inserts `rows` in batches, each batch in its own transaction."""
+        for offset in range(0, len(rows), self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(rows[offset:offset + self.batch_size])
+        self._count(label, len(rows))
+
+    def _random_time(self, start, end):
+        return start + timedelta(seconds=self.rng.uniform(0, max((end - start).total_seconds(), 1)))
+
+    def _flush(self, users):
+        self.stdout.write('Deleting earlier synthetic data...')
+        with transaction.atomic():
+            members = gym_Member.objects.filter(user__in=users)
+            Notification.objects.filter(related_member__in=members).delete()
+            Billing_Record.objects.filter(member__in=members).delete()  # PROTECT blocks the cascade
+            users.delete()
+        rebuild_rollup()
+
+    def _users(self, prefix, count, **fields):
+        password = make_password(PASSWORD)  # Hashed once, shared by every synthetic account
+        users = []
+        for i in range(count):
+            users.append(CustomUser(
+                email=f'{prefix}{i:06d}@{SYNTHETIC_DOMAIN}',
+                password=password,
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                contact_number=f'09{self.rng.randrange(10**9):09d}',
+                date_joined=fields.get('date_joined') or self._random_time(self.start, self.now - timedelta(days=1)),
+                is_staff=fields.get('is_staff', False),
+            ))
+        self._insert(CustomUser, users, f'{prefix} accounts')
+        # Re-read for primary keys; not every backend returns them from bulk_create
+        return list(CustomUser.objects.filter(email__startswith=prefix, email__endswith=f'@{SYNTHETIC_DOMAIN}').order_by('pk'))
+
+    def _create_staff(self, count):
+        # Staff joined before the history starts, so they see every notification
+        users = self._users('staff', count, is_staff=True, date_joined=self.start - timedelta(days=1))
+        self._insert(GymStaff, [GymStaff(user=user) for user in users], 'staff profiles')
+        return list(GymStaff.objects.filter(user__in=users))
+
+    def _create_members(self, count):
+        users = self._users('member', count)
+        today = self.now.date()
+        profiles, inactive = [], []
+        for i, user in enumerate(users):
+            roll = self.rng.random()
+            profile = gym_Member(user=user, activation_status='approved',
+                                 membership_id=f'SYN-{user.date_joined.year}-{i:06d}')
+            if roll < PENDING_SHARE:
+                profile.activation_status = 'pending'
+                profile.membership_id = None
+                inactive.append(user.pk)
+            elif roll < PENDING_SHARE + FROZEN_SHARE:
+                profile.is_frozen = True
+                profile.days_remaining_on_freeze = self.rng.randint(1, 29)
+                profile.next_due_date = today
+            elif roll < PENDING_SHARE + FROZEN_SHARE + EXPIRED_SHARE:
+                profile.next_due_date = today - timedelta(days=self.rng.randint(1, 60))
+            elif roll < PENDING_SHARE + FROZEN_SHARE + EXPIRED_SHARE + DEACTIVATED_SHARE:
+                profile.next_due_date = today - timedelta(days=self.rng.randint(30, 300))
+                inactive.append(user.pk)
+            else:
+                profile.next_due_date = today + timedelta(days=self.rng.randint(1, 30))
+            profiles.append(profile)
+
+        self._insert(gym_Member, profiles, 'members')
+        CustomUser.objects.filter(pk__in=inactive).update(is_active=False)
+        return [profile for profile in profiles if profile.activation_status == 'approved']
+
+    def _create_history(self, members, staff, visits_per_week, requests_per_member):
+        """Visits, activity logs, monthly fees/payments and account requests per member."""
+        check_ins, activity, billing, requests = [], [], [], []
+        visit_chance = min(visits_per_week / 7, 1)
+        today = self.now.date()
+
+        for member in members:
+            joined = member.user.date_joined
+            last_day = min(today - timedelta(days=1), member.next_due_date or today)
+
+            # Visits: one chance per day between joining and the last paid day
+            day = joined.date()
+            while day <= last_day:
+                if self.rng.random() < visit_chance:
+                    check_in = timezone.make_aware(datetime.combine(day, time(self.rng.randint(6, 20), self.rng.randrange(60))))
+                    minutes = self.rng.randint(30, 120)
+                    check_ins.append(Check_In(member=member, check_in_time=check_in,
+                                              check_out_time=check_in + timedelta(minutes=minutes)))
+                    activity.append(Activity_Log(member=member, activity_date=day, duration_minutes=minutes))
+                day += timedelta(days=1)
+
+            # Ledger: a fee every 30 days, usually paid in full a few days later
+            balance = Decimal('0.00')
+            due = joined
+            while due <= self.now:
+                processor = self.rng.choice(staff)
+                billing.append(Billing_Record(member=member, staff_processor=processor, transaction_type='FEE',
+                                              amount=self.fee, timestamp=due, description='Monthly Membership Fee'))
+                balance += self.fee
+                paid_at = due + timedelta(days=self.rng.randint(0, 5))
+                if paid_at <= self.now and self.rng.random() < 0.9:
+                    billing.append(Billing_Record(member=member, staff_processor=processor, transaction_type='PAYMENT',
+                                                  amount=-self.fee, timestamp=paid_at, description='Onsite Payment'))
+                    balance -= self.fee
+                due += timedelta(days=30)
+            member.balance = balance
+
+            # Account requests: decided ones in the past, occasionally one still pending
+            for _ in range(int(requests_per_member) + (self.rng.random() < requests_per_member % 1)):
+                requested = self._random_time(joined, self.now)
+                pending = requested > self.now - timedelta(days=3)
+                requests.append(Account_Request(
+                    member=member,
+                    request_type=self.rng.choice(['FREEZE', 'UNFREEZE']),
+                    reason='Synthetic request.',
+                    request_date=requested,
+                    days_requested=self.rng.randint(1, 5),
+                    status='PENDING' if pending else self.rng.choice(['APPROVED', 'REJECTED']),
+                    staff_reviewer=None if pending else self.rng.choice(staff),
+                    decision_date=None if pending else requested + timedelta(hours=self.rng.randint(1, 48)),
+                ))
+
+            if len(check_ins) >= self.batch_size:
+                self._insert(Check_In, check_ins, 'check-ins')
+                self._insert(Activity_Log, activity, 'activity logs')
+                check_ins, activity = [], []
+            if len(billing) >= self.batch_size:
+                self._insert(Billing_Record, billing, 'billing records')
+                billing = []
+
+        self._insert(Check_In, check_ins, 'check-ins')
+        self._insert(Activity_Log, activity, 'activity logs')
+        self._insert(Billing_Record, billing, 'billing records')
+        self._insert(Account_Request, requests, 'account requests')
+        gym_Member.objects.bulk_update(members, ['balance'], batch_size=self.batch_size)
+
+    def _create_open_visits(self, members, count):
+        today = self.now.date()
+        present = [m for m in members if not m.is_frozen and m.next_due_date and m.next_due_date >= today]
+        rows = [
+            Check_In(member=member, check_in_time=self.now - timedelta(minutes=self.rng.randint(5, 90)))
+            for member in self.rng.sample(present, min(count, len(present)))
+        ]
+        self._insert(Check_In, rows, 'open check-ins')
+
+    def _create_notifications(self, members, count):
+        rows = []
+        for _ in range(count):
+            member = self.rng.choice(members)
+            name = member.user.get_full_name()
+            notification_type, message = self.rng.choice([
+                ('NEW_REGISTRATION', f'New member registration: {name}.'),
+                ('NEW_REQUEST', f'New Freeze Account request from {name}.'),
+                ('PAYMENT_DUE', f'Payment due for {name}.'),
+            ])
+            rows.append(Notification(notification_type=notification_type, message=message,
+                                     timestamp=self._random_time(self.start, self.now), related_member=member))
+        self._insert(Notification, rows, 'notifications')
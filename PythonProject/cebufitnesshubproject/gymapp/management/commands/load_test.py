@@ -0,0 +1,283 @@
+import itertools
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from decimal import Decimal
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from gymapp.models import CustomUser, OCCUPANCY_TRACKER, gym_Member
+
+PAYMENT = Decimal('1.00')
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0
+
+
+class LoadClient:
+    """One simulated browser: its own session cookie, CSRF token and stats."""
+
+    def __init__(self, base_url, user, timeout, results):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.results = results
+        self.csrf = get_random_string(32)
+        self.cookie = f'{settings.CSRF_COOKIE_NAME}={self.csrf}'
+        if user is not None:
+            self.cookie += f'; {settings.SESSION_COOKIE_NAME}={self._session_for(user)}'
+
+    @staticmethod
+    def _session_for(user):
+        """Creates a logged-in session directly, like Client.force_login()."""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session.session_key
+
+    def request(self, label, path, payload=None):
+        """Sends one request and records (label, seconds, error or None). Returns the JSON body if any."""
+        headers = {'Cookie': self.cookie, 'X-CSRFToken': self.csrf, 'Referer': self.base_url + '/'}
+        data = None
+        if payload is not None:
+            data = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers)
+
+        error, body = None, None
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                content = response.read()
+                if response.headers.get_content_type() == 'application/json':
+                    body = json.loads(content)
+                    if body.get('status') == 'error':
+                        error = f"app error: {body.get('message')}"
+        except urllib.error.HTTPError as e:
+            error = f'HTTP {e.code}'
+        except (urllib.error.URLError, OSError) as e:
+            error = f'{type(e).__name__}: {getattr(e, "reason", e)}'
+        self.results.append((label, time.perf_counter() - started, error))
+        return body
+
+
+# --- Scenarios: each runs one client until `deadline` ---
+
+def front_desk(client, members, deadline, think_time):
+    """Staff at the counter: check a member in, take a payment, check them out."""
+    check_in_out = reverse('check_in_out_view')
+    payment = reverse('log_payment_view')
+    for member in itertools.cycle(members):
+        if time.monotonic() >= deadline:
+            return
+        client.request('check in', check_in_out, {'member_id': member['pk'], 'action': 'checkin'})
+        if member['balance'] >= PAYMENT:
+            body = client.request('log payment', payment, {'member_id': member['pk'], 'amount': str(PAYMENT)})
+            if body and body.get('status') != 'error':
+                member['balance'] -= PAYMENT
+        client.request('check out', check_in_out, {'member_id': member['pk'], 'action': 'checkout'})
+        time.sleep(think_time)
+
+
+def member_kiosk(client, deadline, think_time):
+    """A member on the kiosk or their phone: dashboard, now and then their visit history."""
+    dashboard = reverse('member_dashboard')
+    history = reverse('check_in')
+    for step in itertools.count():
+        if time.monotonic() >= deadline:
+            return
+        client.request('member dashboard', dashboard)
+        if step % 5 == 4:
+            client.request('check-in history', history)
+        time.sleep(think_time)
+
+
+class LockSampler(threading.Thread):
+    """Polls pg_stat_activity for sessions waiting on a lock while the test runs."""
+
+    QUERY = (
+        "SELECT count(*), coalesce(max(extract(epoch FROM now() - query_start)), 0) "
+        "FROM pg_stat_activity WHERE wait_event_type = 'Lock' AND datname = current_database()"
+    )
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stop = threading.Event()
+        self.samples = []
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self.stop.is_set():
+                    cursor.execute(self.QUERY)
+                    self.samples.append(cursor.fetchone())
+                    self.stop.wait(self.interval)
+        finally:
+            connection.close()
+
+    def summary(self):
+        waiting = [(count, float(longest)) for count, longest in self.samples if count]
+        return {
+            'samples': len(self.samples),
+            'samples_with_waits': len(waiting),
+            'max_waiting_sessions': max((count for count, _ in waiting), default=0),
+            'longest_wait_ms': round(max((longest for _, longest in waiting), default=0) * 1000, 1),
+            'waiting_session_seconds': round(sum(count for count, _ in waiting) * self.interval, 2),
+        }
+
+
+def _deadlocks():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()')
+        return cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs concurrent front-desk and member clients against a running server "
+        "(e.g. `manage.py runserver` or gunicorn on a local PostgreSQL database) "
+        "and reports throughput, p50/p95/p99 latency, error rates and, on "
+        "PostgreSQL, lock waits. Front-desk clients check members in and out and "
+        "log small payments, so point it at synthetic data (generate_synthetic_data), "
+        "never at production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server base URL. Default: http://127.0.0.1:8000.')
+        parser.add_argument('--front-desk', type=int, default=4, help='Concurrent staff clients. Default: 4.')
+        parser.add_argument('--members', type=int, default=20, help='Concurrent member clients. Default: 20.')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run. Default: 30.')
+        parser.add_argument('--think-time', type=float, default=0, help='Pause between a client\'s steps, in seconds. Default: 0.')
+        parser.add_argument('--timeout', type=float, default=10, help='Per-request timeout in seconds. Default: 10.')
+        parser.add_argument('--lock-interval', type=float, default=0.1,
+                            help='Seconds between lock-wait samples (PostgreSQL). Default: 0.1.')
+        parser.add_argument('--output', help='Also write the report as JSON to this path.')
+
+    def handle(self, *args, **options):
+        if options['front_desk'] < 0 or options['members'] < 0 or options['front_desk'] + options['members'] < 1:
+            raise CommandError('Need at least one client (--front-desk / --members).')
+        if options['duration'] <= 0:
+            raise CommandError('--duration must be positive.')
+
+        results = []  # (label, seconds, error) from every client; list.append is thread-safe
+        clients = self._build_clients(options, results)
+
+        sampler = LockSampler(options['lock_interval']) if connection.vendor == 'postgresql' else None
+        deadlocks_before = _deadlocks() if sampler else None
+        if sampler:
+            sampler.start()
+
+        self.stdout.write(f"Running {options['front_desk']} front-desk and {options['members']} member "
+                          f"clients against {options['url']} for {options['duration']:g}s...")
+        deadline = time.monotonic() + options['duration']
+        started = time.perf_counter()
+        threads = [threading.Thread(target=target, args=(client,) + args + (deadline, options['think_time']))
+                   for target, client, args in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        locks = None
+        if sampler:
+            sampler.stop.set()
+            sampler.join()
+            locks = sampler.summary()
+            locks['deadlocks'] = _deadlocks() - deadlocks_before
+
+        report = self._report(results, elapsed, locks, options)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def _build_clients(self, options, results):
+        staff = CustomUser.objects.filter(is_staff=True, is_active=True, gym_staff__isnull=False).order_by('pk').first()
+        if options['front_desk'] and staff is None:
+            raise CommandError('No staff account found. Run generate_synthetic_data first.')
+        if not OCCUPANCY_TRACKER.objects.filter(pk=1).exists():
+            raise CommandError('OCCUPANCY_TRACKER row 1 is missing. Run generate_synthetic_data first.')
+
+        available = list(
+            gym_Member.objects.filter(activation_status='approved', is_frozen=False, user__is_active=True)
+            .select_related('user').order_by('pk')[:max(options['members'], options['front_desk'] * 25)]
+        )
+        if not available:
+            raise CommandError('No approved members found. Run generate_synthetic_data first.')
+
+        clients = []
+        # Each front-desk client serves its own members, so contention is on shared rows only
+        for desk in range(options['front_desk']):
+            queue = [{'pk': m.pk, 'balance': m.balance} for m in available[desk::options['front_desk']]]
+            client = LoadClient(options['url'], staff, options['timeout'], results)
+            clients.append((front_desk, client, (queue or [{'pk': available[0].pk, 'balance': 0}],)))
+        for i in range(options['members']):
+            client = LoadClient(options['url'], available[i % len(available)].user, options['timeout'], results)
+            clients.append((member_kiosk, client, ()))
+        connections.close_all()  # Worker threads never touch the database
+        return clients
+
+    def _report(self, results, elapsed, locks, options):
+        by_label = defaultdict(list)
+        errors = Counter()
+        for label, seconds, error in results:
+            by_label[label].append((seconds, error))
+            if error:
+                errors[f'{label}: {error}'] += 1
+
+        rows = []
+        for label in sorted(by_label) + ['all']:
+            entries = [entry for entries in by_label.values() for entry in entries] if label == 'all' else by_label[label]
+            latencies = sorted(seconds * 1000 for seconds, _ in entries)
+            failed = sum(1 for _, error in entries if error)
+            rows.append({
+                'endpoint': label,
+                'requests': len(entries),
+                'throughput_rps': round(len(entries) / elapsed, 1),
+                'error_rate': round(failed / len(entries), 4) if entries else 0,
+                'mean_ms': round(statistics.mean(latencies), 1) if latencies else 0,
+                'p50_ms': round(_percentile(latencies, 0.50), 1),
+                'p95_ms': round(_percentile(latencies, 0.95), 1),
+                'p99_ms': round(_percentile(latencies, 0.99), 1),
+                'max_ms': round(latencies[-1], 1) if latencies else 0,
+            })
+
+        for row in rows:
+            line = (f"{row['endpoint']:<18} {row['requests']:>6} req | {row['throughput_rps']:>7.1f} req/s | "
+                    f"p50 {row['p50_ms']:>7.1f} | p95 {row['p95_ms']:>7.1f} | p99 {row['p99_ms']:>7.1f} ms | "
+                    f"errors {row['error_rate']:.2%}")
+            self.stdout.write(self.style.ERROR(line) if row['error_rate'] else line)
+        for message, count in errors.most_common(5):
+            self.stdout.write(self.style.WARNING(f'  {count} x {message}'))
+        if locks is None:
+            self.stdout.write('Lock waits: only sampled on PostgreSQL.')
+        else:
+            self.stdout.write(
+                f"Lock waits: {locks['samples_with_waits']}/{locks['samples']} samples, "
+                f"up to {locks['max_waiting_sessions']} sessions waiting, longest {locks['longest_wait_ms']} ms, "
+                f"~{locks['waiting_session_seconds']} session-seconds spent waiting, {locks['deadlocks']} deadlocks."
+            )
+
+        return {
+            'url': options['url'],
+            'front_desk_clients': options['front_desk'],
+            'member_clients': options['members'],
+            'duration_s': round(elapsed, 2),
+            'results': rows,
+            'errors': dict(errors),
+            'lock_waits': locks,
+        }
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gymapp.notifications import archive_notifications, coalesce_bursts, recount_all_unread
+
+
+class Command(BaseCommand):
+    help = (
+        "Keeps the Notification table small: merges old bursts of same-type "
+        "notifications into daily digest entries and moves read or stale "
+        "notifications into Notification_Archive. Safe to run daily (e.g. cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--coalesce-after-hours', type=int, default=24,
+                            help='Only merge notifications older than this. Default: 24.')
+        parser.add_argument('--min-burst', type=int, default=5,
+                            help='Merge a type/day only when it has at least this many notifications. Default: 5.')
+        parser.add_argument('--archive-read-days', type=int, default=30,
+                            help='Archive notifications every staff member has read after this many days. Default: 30.')
+        parser.add_argument('--archive-stale-days', type=int, default=180,
+                            help='Archive any notification, read or not, after this many days. Default: 180.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows per transaction. Default: 500.')
+        parser.add_argument('--no-coalesce', action='store_true', help='Skip the digest step.')
+
+    def handle(self, *args, **options):
+        for name in ('coalesce_after_hours', 'min_burst', 'archive_read_days', 'archive_stale_days', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+
+        now = timezone.now()
+        merged = 0
+        if not options['no_coalesce']:
+            merged = coalesce_bursts(
+                now - timedelta(hours=options['coalesce_after_hours']),
+                min_burst=options['min_burst'],
+                batch_size=options['batch_size'],
+            )
+        archived = archive_notifications(
+            read_before=now - timedelta(days=options['archive_read_days']),
+            stale_before=now - timedelta(days=options['archive_stale_days']),
+            batch_size=options['batch_size'],
+        )
+        if merged or archived:
+            recount_all_unread()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Merged {merged} notifications into digests; archived {archived} notifications.'
+        ))
@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gymapp.revenue import rebuild_rollup
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}'. Use YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds Daily_Revenue_Rollup from the Billing_Record ledger. "
+        "Use after bulk imports or manual ledger fixes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First local date to rebuild (YYYY-MM-DD). Default: beginning of the ledger.')
+        parser.add_argument('--end', help='Last local date to rebuild (YYYY-MM-DD). Default: end of the ledger.')
+
+    def handle(self, *args, **options):
+        start = _parse_date(options['start']) if options['start'] else None
+        end = _parse_date(options['end']) if options['end'] else None
+        if start and end and start > end:
+            raise CommandError('--start must not be after --end.')
+
+        written = rebuild_rollup(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt revenue rollup: {written} rows written.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from gymapp import occupancy
+
+
+class Command(BaseCommand):
+    help = (
+        "Recounts open check-ins (no check-out time yet) and resets the live "
+        "occupancy count to it: OCCUPANCY_TRACKER.current_count and, when "
+        "OCCUPANCY_COUNTER_FILE is set, the shared counter the workers use."
+    )
+
+    def handle(self, *args, **options):
+        count = occupancy.recover()
+        where = 'shared counter and tracker row' if occupancy.enabled() else 'tracker row'
+        self.stdout.write(self.style.SUCCESS(f'Occupancy reset to {count} ({where}).'))
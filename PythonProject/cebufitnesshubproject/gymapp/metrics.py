@@ -0,0 +1,429 @@
+"""
+Prometheus metrics (METRICS_ENABLED = True), served as text at /metrics.
+
+MetricsMiddleware records, per view:
+  gymapp_http_requests_total            requests by view, method and status
+  gymapp_http_request_duration_seconds  latency histogram
+  gymapp_db_queries_total               SQL statements run by the view
+  gymapp_db_query_seconds_total         time spent in those statements
+and, per process:
+  gymapp_http_requests_in_flight        requests being served right now
+  gymapp_db_connection_setup_seconds    histogram of new connection setup
+Signals add business counters (gymapp_check_ins_total,
+gymapp_payments_total, gymapp_payment_amount_total); their per-minute
+rates come from rate(...[1m]) in Prometheus. Occupancy, capacity,
+active members and pending approvals are read from the database when
+/metrics is scraped.
+
+Each gunicorn worker keeps its numbers in memory and writes a snapshot
+to METRICS_DIR/metrics-<pid>-<id>.json at most every
+METRICS_FLUSH_SECONDS (and at exit); the random id keeps a recycled
+pid from overwriting a dead worker's file. The worker that answers a
+scrape adds up every snapshot, using its own live numbers in place of
+its file, so the output covers the whole node. Snapshots of workers
+that have exited are folded into METRICS_DIR/exited.json and deleted,
+under a file lock, so counters never go backwards and the directory
+does not grow as workers are recycled; their in-flight gauge is
+dropped. Without METRICS_DIR each worker only reports itself.
+
+With the setting off the middleware removes itself, the signal
+handlers return at once and /metrics answers 404.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from . import sqltiming
+from .gym_settings import get_gym_settings
+from .kpis import member_kpis
+from .occupancy import current_occupancy
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help). Output follows this order.
+METRICS = {
+    'gymapp_http_requests_total': ('counter', 'HTTP requests served, by view, method and status.'),
+    'gymapp_http_request_duration_seconds': ('histogram', 'Time to produce a response, by view.'),
+    'gymapp_http_requests_in_flight': ('gauge', 'Requests being served by live workers.'),
+    'gymapp_db_queries_total': ('counter', 'SQL statements run while serving requests, by view.'),
+    'gymapp_db_query_seconds_total': ('counter', 'Seconds spent in SQL statements while serving requests, by view.'),
+    'gymapp_db_connection_setup_seconds': ('histogram', 'Time to open a new database connection.'),
+    'gymapp_check_ins_total': ('counter', 'Member check-ins recorded.'),
+    'gymapp_payments_total': ('counter', 'Payments logged.'),
+    'gymapp_payment_amount_total': ('counter', 'Sum of payments logged, in pesos.'),
+    'gymapp_occupancy_current': ('gauge', 'Members checked in right now.'),
+    'gymapp_occupancy_capacity': ('gauge', 'Capacity limit from the gym settings.'),
+    'gymapp_active_members': ('gauge', 'Members counted as active on the staff dashboard.'),
+    'gymapp_pending_approvals': ('gauge', 'Members with a pending account request.'),
+}
+
+UNMATCHED = '<unmatched>'  # View label for requests that did not resolve (404s)
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_in_flight = 0
+_last_flush = 0.0
+_installed = False
+_process = (None, None)  # (pid, random id) naming this process's snapshot file
+
+try:
+    import fcntl
+except ImportError:  # Windows: exited workers' files are read but not folded
+    fcntl = None
+
+EXITED_FILE = 'exited.json'
+LOCK_FILE = '.lock'
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+def authorized(request):
+    """True if no METRICS_TOKEN is set or the request carries it as a bearer token."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    return not token or constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Adds to a counter. Does nothing while metrics are off."""
+    if not enabled():
+        return
+    key = (name, _labels(**labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    """Records one histogram observation."""
+    key = (name, _labels(**labels))
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        series[bisect_left(BUCKETS, value)] += 1  # Cumulated when rendered
+        series[-1] += value
+
+
+# --- Shared store ---
+
+def _process_id():
+    """Unique per process, including workers forked after this module was imported."""
+    global _process
+    pid = os.getpid()
+    if _process[0] != pid:
+        _process = (pid, uuid.uuid4().hex[:12])
+    return _process[1]
+
+
+def _snapshot():
+    with _lock:
+        return {
+            'pid': os.getpid(),
+            'id': _process_id(),
+            'counters': [[name, labels, value] for (name, labels), value in _counters.items()],
+            'histograms': [[name, labels, series] for (name, labels), series in _histograms.items()],
+            'in_flight': _in_flight,
+        }
+
+
+def flush(force=False):
+    """Writes this worker's snapshot for the others to read (at most every METRICS_FLUSH_SECONDS)."""
+    global _last_flush
+    directory = getattr(settings, 'METRICS_DIR', None)
+    now = time.monotonic()
+    if not directory or (not force and now - _last_flush < settings.METRICS_FLUSH_SECONDS):
+        return
+    _last_flush = now
+    path = os.path.join(directory, f'metrics-{os.getpid()}-{_process_id()}.json')
+    try:
+        os.makedirs(directory, exist_ok=True)
+        _write_atomically(path, _snapshot())  # Readers never see a half-written file
+    except OSError:
+        pass  # Metrics must never break a request
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomically(path, data):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as handle:
+        json.dump(data, handle)
+    os.replace(temporary, path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # Listed in exited.json, so it is skipped until a later scrape removes it
+
+
+def _fold_exited(directory, folded, exited):
+    """
+    Adds the snapshots of exited workers to exited.json, then deletes
+    their files. exited.json lists the files it already holds, so one
+    left behind by a failed delete is removed, not counted twice.
+    Returns the new exited.json snapshot.
+    """
+    counters, histograms, _ = _merge([folded] + [snapshot for _, snapshot in exited])
+    names = [os.path.basename(path) for path, _ in exited]
+    leftovers = [name for name in folded.get('files', ()) if os.path.exists(os.path.join(directory, name))]
+    folded = {
+        'pid': None,
+        'files': leftovers + names,
+        'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+        'histograms': [[name, labels, series] for (name, labels), series in histograms.items()],
+        'in_flight': 0,
+    }
+    _write_atomically(os.path.join(directory, EXITED_FILE), folded)
+    for name in names:
+        _remove(os.path.join(directory, name))
+    return folded
+
+
+def _snapshots():
+    """This worker's live snapshot, the last one of every other worker, and the exited ones' total."""
+    own = _snapshot()
+    result = [own]
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return result
+    lock = None
+    try:
+        if fcntl is not None:
+            os.makedirs(directory, exist_ok=True)
+            lock = open(os.path.join(directory, LOCK_FILE), 'a')
+            fcntl.flock(lock, fcntl.LOCK_EX)  # One scrape folds at a time, and never mid-read of another
+
+        folded = _read(os.path.join(directory, EXITED_FILE)) or {'counters': [], 'histograms': [], 'in_flight': 0}
+        already_folded = set(folded.get('files', ()))
+        exited = []
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            if os.path.basename(path) in already_folded:
+                if lock is not None:
+                    _remove(path)
+                continue
+            snapshot = _read(path)
+            if snapshot is None:
+                continue
+            if snapshot.get('pid') == own['pid']:
+                if snapshot.get('id') == own['id']:
+                    continue  # Our own file; the live numbers are used instead
+                alive = False  # An earlier process that had our pid
+            else:
+                alive = _alive(snapshot['pid'])
+            if alive:
+                result.append(snapshot)
+            else:
+                snapshot['in_flight'] = 0
+                exited.append((path, snapshot))
+
+        if lock is not None and exited:
+            try:
+                folded = _fold_exited(directory, folded, exited)
+                exited = []
+            except OSError:
+                pass  # exited.json is unchanged; folded on a later scrape
+        result.append(folded)
+        result.extend(snapshot for _, snapshot in exited)
+    except OSError:
+        pass  # Metrics must never break a request
+    finally:
+        if lock is not None:
+            lock.close()  # Releases the flock
+    return result
+
+
+def _merge(snapshots):
+    counters, histograms, in_flight = {}, {}, 0
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, series in snapshot['histograms']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.setdefault(key, [0] * len(series))
+            for i, value in enumerate(series):
+                merged[i] += value
+        in_flight += snapshot['in_flight']
+    return counters, histograms, in_flight
+
+
+# --- Exposition ---
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _business_gauges():
+    """Read at scrape time: three small counts (settings are cached)."""
+    gauges = {
+        'gymapp_occupancy_current': current_occupancy(),
+        'gymapp_occupancy_capacity': get_gym_settings().capacity_limit,
+    }
+    totals = member_kpis(timezone.localdate())
+    gauges['gymapp_active_members'] = totals['active_members']
+    gauges['gymapp_pending_approvals'] = totals['pending_approvals']
+    return gauges
+
+
+def render():
+    """Every metric of every worker on this node, in the text exposition format."""
+    counters, histograms, in_flight = _merge(_snapshots())
+    gauges = {'gymapp_http_requests_in_flight': in_flight}
+    gauges.update(_business_gauges())
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (series_name, labels), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_number(value)}')
+        elif kind == 'histogram':
+            for (series_name, labels), series in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), series[:-1]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _number(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", le)])} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_number(series[-1])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        elif name in gauges:
+            lines.append(f'{name} {_number(gauges[name])}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Clears this worker's numbers (tests)."""
+    global _in_flight
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _in_flight = 0
+
+
+# --- Collection ---
+
+def _instrument_connections():
+    """Times BaseDatabaseWrapper.connect, which every backend (and the pool) goes through."""
+    global _installed
+    if _installed:
+        return
+    from django.db.backends.base.base import BaseDatabaseWrapper
+
+    original = BaseDatabaseWrapper.connect
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            if enabled():
+                observe('gymapp_db_connection_setup_seconds', time.perf_counter() - started,
+                        database=self.alias)
+
+    BaseDatabaseWrapper.connect = connect
+    atexit.register(flush, force=True)
+    _installed = True
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_request_queries = ContextVar('metrics_request_queries', default=None)
+
+
+def _count_query(sql, params, many, seconds, context):
+    """gymapp.sqltiming listener: adds the statement to the current request's counter."""
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.count += 1
+        queries.seconds += seconds
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _instrument_connections()
+        sqltiming.add_listener(_count_query)
+
+    def __call__(self, request):
+        global _in_flight
+        with _lock:
+            _in_flight += 1
+        queries = _QueryCounter()
+        token = _request_queries.set(queries)
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_queries.reset(token)
+            match = getattr(request, 'resolver_match', None)
+            view = match.view_name if match else UNMATCHED
+            with _lock:
+                _in_flight -= 1
+            inc('gymapp_http_requests_total', view=view, method=request.method, status=status)
+            observe('gymapp_http_request_duration_seconds', elapsed, view=view)
+            if queries.count:
+                inc('gymapp_db_queries_total', queries.count, view=view)
+                inc('gymapp_db_query_seconds_total', queries.seconds, view=view)
+            flush()
@@ -0,0 +1,24 @@
+"""
+Migration operations shared by gymapp's migrations.
+
+AddIndexConcurrently builds the index with CREATE INDEX CONCURRENTLY on
+PostgreSQL, so writes to the table (check-ins, ledger entries,
+notifications) carry on while it builds, instead of waiting behind the
+table lock a plain CREATE INDEX holds for the whole build. On other
+databases (SQLite in development and tests) it is a plain AddIndex.
+Migrations using it must set `atomic = False`.
+"""
+from django.contrib.postgres import operations
+
+
+class AddIndexConcurrently(operations.AddIndexConcurrently):
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return operations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return operations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
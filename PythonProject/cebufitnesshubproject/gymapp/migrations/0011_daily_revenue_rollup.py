@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:00
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rollup(apps, schema_editor):
+    """Seed the rollup from the existing ledger."""
+    Billing_Record = apps.get_model('gymapp', 'Billing_Record')
+    Daily_Revenue_Rollup = apps.get_model('gymapp', 'Daily_Revenue_Rollup')
+    totals = (
+        Billing_Record.objects.order_by()
+        .annotate(day=TruncDate('timestamp'))
+        .values('day', 'transaction_type')
+        .annotate(total=Sum('amount'), records=Count('pk'))
+    )
+    Daily_Revenue_Rollup.objects.bulk_create([
+        Daily_Revenue_Rollup(
+            date=row['day'],
+            transaction_type=row['transaction_type'],
+            total_amount=row['total'],
+            record_count=row['records'],
+        )
+        for row in totals
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gymapp', '0010_account_request_days_requested'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Daily_Revenue_Rollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('PAYMENT', 'Payment'), ('FEE', 'Membership Fee'), ('ADJUSTMENT', 'Adjustment')], max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('record_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily Revenue Rollup',
+                'verbose_name_plural': 'Daily Revenue Rollups',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'transaction_type'), name='unique_daily_revenue_rollup')],
+            },
+        ),
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ]
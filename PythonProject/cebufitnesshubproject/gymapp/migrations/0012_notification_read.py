@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gymapp', '0011_daily_revenue_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification_Read',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_receipts', to='gymapp.notification')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_reads', to='gymapp.gymstaff')),
+            ],
+            options={
+                'verbose_name': 'Notification Read Receipt',
+                'verbose_name_plural': 'Notification Read Receipts',
+                'constraints': [models.UniqueConstraint(fields=('staff', 'notification'), name='unique_notification_read')],
+            },
+        ),
+    ]
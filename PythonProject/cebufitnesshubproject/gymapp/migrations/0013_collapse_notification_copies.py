@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:04
+
+from datetime import timedelta
+
+from django.db import migrations
+
+# Per-staff copies of one event were written in the same request, so
+# they share every field and sit within a few milliseconds of each other.
+COPY_WINDOW = timedelta(minutes=1)
+KEY_FIELDS = ('notification_type', 'message', 'redirect_url', 'related_member_id', 'related_request_id')
+
+
+def collapse_copies(apps, schema_editor):
+    """
+    Keeps the earliest row of each event, turns is_read on the other
+    copies into Notification_Read rows, and deletes the copies.
+    """
+    Notification = apps.get_model('gymapp', 'Notification')
+    Notification_Read = apps.get_model('gymapp', 'Notification_Read')
+
+    rows = Notification.objects.order_by(*KEY_FIELDS, 'timestamp', 'pk').values_list(
+        'pk', 'timestamp', 'recipient_staff_id', 'is_read', *KEY_FIELDS
+    )
+
+    receipts, duplicates = [], []
+    survivor = group_key = group_start = None
+    group_staff = set()
+    for pk, timestamp, staff_id, is_read, *key in rows.iterator(chunk_size=2000):
+        same_event = (
+            key == group_key
+            and timestamp - group_start <= COPY_WINDOW
+            and staff_id not in group_staff
+        )
+        if not same_event:
+            survivor, group_key, group_start, group_staff = pk, key, timestamp, set()
+        else:
+            duplicates.append(pk)
+        group_staff.add(staff_id)
+        if is_read:
+            receipts.append(Notification_Read(notification_id=survivor, staff_id=staff_id, read_at=timestamp))
+
+    Notification_Read.objects.bulk_create(receipts, batch_size=1000, ignore_conflicts=True)
+    for start in range(0, len(duplicates), 1000):
+        Notification.objects.filter(pk__in=duplicates[start:start + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gymapp', '0012_notification_read'),
+    ]
+
+    operations = [
+        migrations.RunPython(collapse_copies, migrations.RunPython.noop),
+    ]
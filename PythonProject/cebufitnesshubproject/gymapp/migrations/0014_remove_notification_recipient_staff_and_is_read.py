@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:04
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gymapp', '0013_collapse_notification_copies'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='notification',
+            name='recipient_staff',
+        ),
+        migrations.RemoveField(
+            model_name='notification',
+            name='is_read',
+        ),
+    ]
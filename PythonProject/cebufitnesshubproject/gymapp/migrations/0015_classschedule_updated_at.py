@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gymapp', '0014_remove_notification_recipient_staff_and_is_read'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classschedule',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:07
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def count_unread(apps, schema_editor):
+    """Seeds the unread counter from the existing read receipts."""
+    GymStaff = apps.get_model('gymapp', 'GymStaff')
+    Notification = apps.get_model('gymapp', 'Notification')
+    Notification_Read = apps.get_model('gymapp', 'Notification_Read')
+    for staff in GymStaff.objects.select_related('user'):
+        unread = Notification.objects.filter(timestamp__gte=staff.user.date_joined).exclude(
+            Exists(Notification_Read.objects.filter(notification=OuterRef('pk'), staff=staff))
+        ).count()
+        GymStaff.objects.filter(pk=staff.pk).update(unread_notifications=unread)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gymapp', '0015_classschedule_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gymstaff',
+            name='notifications_cleared_through',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gymstaff',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
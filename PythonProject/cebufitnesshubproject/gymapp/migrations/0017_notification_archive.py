@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gymapp', '0016_gymstaff_unread_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification_Archive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_id', models.IntegerField()),
+                ('notification_type', models.CharField(max_length=50)),
+                ('message', models.TextField()),
+                ('timestamp', models.DateTimeField()),
+                ('related_member_id', models.IntegerField(blank=True, null=True)),
+                ('related_request_id', models.IntegerField(blank=True, null=True)),
+                ('digest_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Archived Notification',
+                'verbose_name_plural': 'Archived Notifications',
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='digest_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
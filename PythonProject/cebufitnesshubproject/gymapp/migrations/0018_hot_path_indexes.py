@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:11
+
+from django.db import migrations, models
+
+from gymapp.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('gymapp', '0017_notification_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='account_request',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['request_date'], name='acct_req_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='account_request',
+            index=models.Index(fields=['member', 'status', 'request_type'], name='acct_req_member_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='activity_log',
+            index=models.Index(fields=['member', 'activity_date'], name='activity_member_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='billing_record',
+            index=models.Index(fields=['transaction_type', '-timestamp'], name='billing_type_time_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='billing_record',
+            index=models.Index(fields=['member', '-timestamp'], name='billing_member_time_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='check_in',
+            index=models.Index(fields=['member', '-check_in_time'], name='checkin_member_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gym_member',
+            index=models.Index(condition=models.Q(('activation_status', 'pending')), fields=['activation_status'], name='member_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gym_member',
+            index=models.Index(condition=models.Q(('is_frozen', True)), fields=['is_frozen'], name='member_frozen_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gym_member',
+            index=models.Index(fields=['next_due_date'], name='member_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gym_member',
+            index=models.Index(fields=['membership_id'], name='member_id_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['-timestamp', '-notification_id'], name='notification_feed_idx'),
+        ),
+    ]
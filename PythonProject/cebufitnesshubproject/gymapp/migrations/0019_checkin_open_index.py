@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gymapp', '0018_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='check_in',
+            index=models.Index(condition=models.Q(('check_out_time__isnull', True)), fields=['check_in_time', 'checkin_id'], name='checkin_open_idx'),
+        ),
+    ]
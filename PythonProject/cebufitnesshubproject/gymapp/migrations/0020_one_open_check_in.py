@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:42
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def close_duplicate_open_visits(apps, schema_editor):
+    """
+    Double clicks left some members with several open visits. Keeps the
+    latest one open and closes the older ones when it started, then
+    resets the live count to the open visits that remain.
+    """
+    Check_In = apps.get_model('gymapp', 'Check_In')
+    OCCUPANCY_TRACKER = apps.get_model('gymapp', 'OCCUPANCY_TRACKER')
+
+    open_visits = Check_In.objects.filter(check_out_time__isnull=True)
+    duplicated = (
+        open_visits.order_by().values('member_id')
+        .annotate(visits=Count('checkin_id'), latest=Max('check_in_time'))
+        .filter(visits__gt=1)
+    )
+    for row in list(duplicated):
+        keep = open_visits.filter(member_id=row['member_id']).order_by('-check_in_time', '-checkin_id').first()
+        open_visits.filter(member_id=row['member_id']).exclude(pk=keep.pk).update(check_out_time=row['latest'])
+
+    OCCUPANCY_TRACKER.objects.filter(pk=1).update(current_count=open_visits.count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gymapp', '0019_checkin_open_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_open_visits, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='check_in',
+            constraint=models.UniqueConstraint(condition=models.Q(('check_out_time__isnull', True)), fields=('member',), name='unique_open_check_in'),
+        ),
+    ]
@@ -128,6 +128,15 @@ class gym_Member(models.Model):
     class Meta:
         verbose_name = 'Gym Member Profile'
         verbose_name_plural = 'Gym Member Profiles'
+        indexes = [
+            # Pending / frozen tabs and KPI filters only touch a few rows
+            models.Index(fields=['activation_status'], name='member_pending_idx', condition=models.Q(activation_status='pending')),
+            models.Index(fields=['is_frozen'], name='member_frozen_idx', condition=models.Q(is_frozen=True)),
+            # Active vs. expired split
+            models.Index(fields=['next_due_date'], name='member_due_date_idx'),
+            # membership_id__startswith (new ID sequence); pattern ops are PostgreSQL-only
+            models.Index(fields=['membership_id'], name='member_id_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return f"Member Profile for {self.user.email}"
@@ -147,6 +156,11 @@ class GymStaff(models.Model):
     # The ERD shows no other attributes.
     # If you need staff-specific fields (e.g., 'job_title'), add them here.
 
+    # Notification bookkeeping (maintained by gymapp.notifications)
+    unread_notifications = models.PositiveIntegerField(default=0)
+    # "Mark all as read" watermark: notifications up to this id count as read
+    notifications_cleared_through = models.IntegerField(default=0)
+
     class Meta:
         verbose_name = 'Gym Staff Profile'
         verbose_name_plural = 'Gym Staff Profiles'
@@ -187,6 +201,14 @@ class Account_Request(models.Model):
     
     days_requested = models.IntegerField(null=True, blank=True, help_text="Requested freeze duration in days (1-5)")
 
+    class Meta:
+        indexes = [
+            # Approval queue and pending-approval KPI
+            models.Index(fields=['request_date'], name='acct_req_pending_idx', condition=models.Q(status='PENDING')),
+            # Member's pending request / recent approved freeze checks
+            models.Index(fields=['member', 'status', 'request_type'], name='acct_req_member_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.get_request_type_display()} request for {self.member.user.email} ({self.status})"
 
@@ -212,10 +234,39 @@ class Billing_Record(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Recent payments table and ledger rebuilds by date range
+            models.Index(fields=['transaction_type', '-timestamp'], name='billing_type_time_idx'),
+            # Member billing history
+            models.Index(fields=['member', '-timestamp'], name='billing_member_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_transaction_type_display()} of {self.amount} for {self.member.user.email}"
 
+class Daily_Revenue_Rollup(models.Model):
+    """
+    One row per (local date, transaction type) summarising Billing_Record.
+    Kept up to date by the Billing_Record signals in signals.py and
+    rebuilt from the ledger with `manage.py rebuild_revenue_rollup`.
+    Revenue charts and KPIs read this instead of scanning the ledger.
+    """
+    date = models.DateField()
+    transaction_type = models.CharField(max_length=20, choices=Billing_Record.TRANSACTION_CHOICES)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    record_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name = 'Daily Revenue Rollup'
+        verbose_name_plural = 'Daily Revenue Rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'transaction_type'], name='unique_daily_revenue_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.transaction_type}: {self.total_amount} ({self.record_count})"
+
 class Check_In(models.Model):
     """
     NEW MODEL
@@ -228,6 +279,18 @@ class Check_In(models.Model):
 
     class Meta:
         ordering = ['-check_in_time']
+        indexes = [
+            # Latest check-in per member (roster annotations), history and counts
+            models.Index(fields=['member', '-check_in_time'], name='checkin_member_time_idx'),
+            # Only the visits still open: the live roster and the occupancy count
+            models.Index(fields=['check_in_time', 'checkin_id'], name='checkin_open_idx',
+                         condition=models.Q(check_out_time__isnull=True)),
+        ]
+        constraints = [
+            # A member is inside at most once: a second open visit is rejected by the database
+            models.UniqueConstraint(fields=['member'], condition=models.Q(check_out_time__isnull=True),
+                                    name='unique_open_check_in'),
+        ]
 
     def __str__(self):
         return f"Check-in for {self.member.user.email} at {self.check_in_time}"
@@ -244,6 +307,9 @@ class Activity_Log(models.Model):
 
     class Meta:
         ordering = ['-activity_date']
+        indexes = [
+            models.Index(fields=['member', 'activity_date'], name='activity_member_date_idx'),
+        ]
 
     def __str__(self):
         return f"Activity for {self.member.user.email} on {self.activity_date} ({self.duration_minutes} mins)"
@@ -253,27 +319,75 @@ class Activity_Log(models.Model):
 
 class Notification(models.Model):
     """
-    NEW MODEL
-    Stores notifications for staff members (e.g., new pending request).
+    Stores staff notifications (e.g., new pending request).
+    One row per event, shared by every staff member; who has read it
+    is tracked in Notification_Read.
     """
     notification_id = models.AutoField(primary_key=True)
-    recipient_staff = models.ForeignKey(GymStaff, on_delete=models.CASCADE, related_name='notifications')
     message = models.TextField()
     notification_type = models.CharField(max_length=50) # e.g., 'NEW_REQUEST', 'PAYMENT_DUE'
     timestamp = models.DateTimeField(default=timezone.now)
-    is_read = models.BooleanField(default=False)
 
     redirect_url = models.CharField(max_length=255, blank=True, null=True, help_text="URL to redirect to on click")
 
     related_member = models.ForeignKey('gym_Member', on_delete=models.SET_NULL, null=True, blank=True)
 
     related_request = models.ForeignKey('Account_Request', on_delete=models.SET_NULL, null=True, blank=True, related_name='notifications')
+
+    # Set on digest entries: how many notifications were merged into this one
+    digest_count = models.PositiveIntegerField(null=True, blank=True)
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Newest-first staff feed
+            models.Index(fields=['-timestamp', '-notification_id'], name='notification_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"Notification ({self.notification_type}) at {self.timestamp:%Y-%m-%d %H:%M}"
+
+class Notification_Read(models.Model):
+    """
+    Read receipt: one row per (notification, staff member) once that
+    staff member has opened it. No row means unread.
+    """
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='read_receipts')
+    staff = models.ForeignKey(GymStaff, on_delete=models.CASCADE, related_name='notification_reads')
+    read_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Notification Read Receipt'
+        verbose_name_plural = 'Notification Read Receipts'
+        constraints = [
+            models.UniqueConstraint(fields=['staff', 'notification'], name='unique_notification_read'),
+        ]
+
+    def __str__(self):
+        return f"{self.staff.user.email} read notification {self.notification_id}"
+
+class Notification_Archive(models.Model):
+    """
+    Compact copy of notifications moved out of the live table by the
+    prune_notifications command. Plain ids instead of foreign keys, so
+    archiving never touches or locks the related tables.
+    """
+    notification_id = models.IntegerField()
+    notification_type = models.CharField(max_length=50)
+    message = models.TextField()
+    timestamp = models.DateTimeField()
+    related_member_id = models.IntegerField(null=True, blank=True)
+    related_request_id = models.IntegerField(null=True, blank=True)
+    digest_count = models.PositiveIntegerField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-timestamp']
+        verbose_name = 'Archived Notification'
+        verbose_name_plural = 'Archived Notifications'
 
     def __str__(self):
-        return f"Notification for {self.recipient_staff.user.email} ({self.notification_type})"
+        return f"Archived notification {self.notification_id} ({self.notification_type})"
 
 class ClassSchedule(models.Model):
     """
@@ -298,6 +412,7 @@ class ClassSchedule(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
     location = models.CharField(max_length=100, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True) # Part of the schedule ETag
 
     class Meta:
         ordering = ['day_of_week', 'start_time']
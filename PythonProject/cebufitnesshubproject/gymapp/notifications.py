@@ -0,0 +1,365 @@
+"""
+Staff notification feed.
+
+A Notification is a single broadcast row per event. Read state is
+per staff member and lives in Notification_Read, so raising an event
+costs one INSERT and marking it read costs one more, whatever the
+number of staff accounts. New notifications are also pushed to open
+dashboards through `gymapp.events` once their transaction commits.
+
+Each GymStaff row carries an `unread_notifications` counter, kept in
+step by the helpers below so the dashboard badge never has to count,
+and a `notifications_cleared_through` watermark set by "mark all as
+read" (everything up to that id counts as read without receipt rows).
+
+The retention helpers at the bottom back the prune_notifications
+command: they merge old bursts into digest entries and move old rows
+into Notification_Archive, one bounded batch per transaction.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Count, Exists, ExpressionWrapper, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.timesince import timesince
+
+from . import events
+from .kpis import day_range
+from .models import GymStaff, Notification, Notification_Archive, Notification_Read
+
+FEED_SIZE = 10
+
+
+def serialize_notification(notification, is_read=False):
+    """JSON shape used by the polling API and the live stream."""
+    # Determine the prefix/label based on type
+    prefix = "System:"
+    if notification.notification_type == 'NEW_REQUEST':
+        prefix = "Action Required:"
+    elif notification.notification_type == 'NEW_REGISTRATION':
+        prefix = "New Member:"
+
+    # Determine styling class (matches the dashboard template)
+    style_type = "neutral"
+    if notification.notification_type in ['NEW_REQUEST', 'NEW_REGISTRATION']:
+        style_type = "warning"
+
+    return {
+        'id': notification.notification_id,
+        'message': notification.message,
+        'prefix': prefix,
+        'time_ago': timesince(notification.timestamp) + " ago",
+        'is_read': is_read,
+        'style_type': style_type,
+        'read_url': reverse('mark_notification_read', args=[notification.notification_id]),
+    }
+
+
+def notify_all_staff(**fields):
+    """
+    Raises one notification that every staff member will see, and
+    pushes it to connected dashboards after the transaction commits.
+    """
+    with transaction.atomic(savepoint=False):  # The row and the counters become visible together (see mark_all_read)
+        notification = Notification.objects.create(**fields)
+        GymStaff.objects.update(unread_notifications=F('unread_notifications') + 1)
+    payload = serialize_notification(notification)
+    transaction.on_commit(lambda: events.publish(payload))
+    return notification
+
+
+def staff_notifications(staff):
+    """
+    Notifications visible to `staff`, annotated with `is_read`.
+    Events from before the staff account was created are left out,
+    as they were when every staff member got a private copy.
+    """
+    return Notification.objects.filter(
+        timestamp__gte=staff.user.date_joined
+    ).annotate(
+        is_read=ExpressionWrapper(
+            Q(pk__lte=staff.notifications_cleared_through) | Exists(
+                Notification_Read.objects.filter(notification=OuterRef('pk'), staff=staff)
+            ),
+            output_field=BooleanField(),
+        )
+    )
+
+
+def staff_feed(staff, limit=FEED_SIZE):
+    """The newest `limit` notifications for the dashboard feed."""
+    return staff_notifications(staff).order_by('-timestamp', '-pk')[:limit]
+
+
+def _lock_staff(staff):
+    """
+    Locks the staff row until the transaction ends and returns its
+    (unread counter, watermark). Every "mark read" takes this lock
+    first, so concurrent ones for one staff member run one after the
+    other. Refreshes `staff.notifications_cleared_through`, which
+    another request may have moved.
+    """
+    unread, cleared_through = GymStaff.objects.select_for_update().filter(pk=staff.pk).values_list(
+        'unread_notifications', 'notifications_cleared_through'
+    ).get()
+    staff.notifications_cleared_through = cleared_through
+    return unread, cleared_through
+
+
+def _decrement_unread(staff, amount=1):
+    GymStaff.objects.filter(pk=staff.pk).update(
+        unread_notifications=Greatest(F('unread_notifications') - amount, 0)
+    )
+
+
+def mark_read(notification, staff):
+    """
+    Records that `staff` has read `notification` (idempotent).
+    Returns True if it was unread before.
+    """
+    if notification.pk <= staff.notifications_cleared_through:
+        return False
+    with transaction.atomic():
+        _, cleared_through = _lock_staff(staff)
+        if notification.pk <= cleared_through:
+            return False  # "Mark all" got there first
+        try:
+            with transaction.atomic():
+                Notification_Read.objects.create(notification=notification, staff=staff)
+        except IntegrityError:
+            return False  # Already read (e.g. opened in two tabs)
+        _decrement_unread(staff)
+    return True
+
+
+def mark_all_read(staff, notification_type=None):
+    """
+    Marks every visible notification as read for `staff`, or only the
+    ones of `notification_type`. Returns how many were unread.
+
+    Both run with the staff row locked. Without a type, one UPDATE moves
+    the watermark up to the newest notification and zeroes the counter:
+    a notification raised meanwhile either committed before the lock (so
+    it is under the watermark) or increments the counter after it. With
+    a type, receipts for the unread ones are written in one batched
+    INSERT and the counter drops by that many; no receipt can appear in
+    between, since mark_read takes the same lock.
+    """
+    with transaction.atomic(savepoint=False):
+        unread, _ = _lock_staff(staff)
+        if notification_type is None:
+            latest = Coalesce(Subquery(Notification.objects.order_by('-pk').values('pk')[:1]), 0)
+            GymStaff.objects.filter(pk=staff.pk).update(
+                notifications_cleared_through=Greatest(F('notifications_cleared_through'), latest),
+                unread_notifications=0,
+            )
+            return unread
+
+        unread_ids = list(
+            staff_notifications(staff)
+            .filter(notification_type=notification_type, is_read=False)
+            .values_list('pk', flat=True)
+        )
+        Notification_Read.objects.bulk_create(
+            [Notification_Read(notification_id=pk, staff=staff) for pk in unread_ids],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        if unread_ids:
+            _decrement_unread(staff, len(unread_ids))
+    return len(unread_ids)
+
+
+def recount_unread(staff):
+    """
+    Recomputes the unread counter from scratch (repairs drift). Holds the
+    staff row lock from the count to the write, so a read marked or a
+    notification raised meanwhile is not overwritten.
+    """
+    with transaction.atomic(savepoint=False):
+        _lock_staff(staff)
+        count = staff_notifications(staff).filter(is_read=False).count()
+        GymStaff.objects.filter(pk=staff.pk).update(unread_notifications=count)
+    return count
+
+
+def feed_etag(staff):
+    """
+    Version token for the staff member's feed, from one primary-key
+    lookup: the newest notification id, this staff member's newest
+    read receipt, unread counter and watermark, and the current minute
+    (the feed shows "x minutes ago").
+    """
+    versions = GymStaff.objects.filter(pk=staff.pk).values(
+        'unread_notifications',
+        'notifications_cleared_through',
+        latest=Subquery(Notification.objects.order_by('-pk').values('pk')[:1]),
+        read=Subquery(Notification_Read.objects.filter(staff=staff).order_by('-pk').values('pk')[:1]),
+    ).first() or {}
+    minute = timezone.now().strftime('%Y%m%d%H%M')
+    return '-'.join(str(part or 0) for part in (
+        staff.pk,
+        versions.get('latest'),
+        versions.get('read'),
+        versions.get('unread_notifications'),
+        versions.get('notifications_cleared_through'),
+        minute,
+    ))
+
+
+# --- Retention (prune_notifications command) ---
+
+DIGEST_LABELS = {
+    'NEW_REGISTRATION': 'new member registrations',
+    'NEW_REQUEST': 'new account requests',
+}
+
+
+def _digest_message(notification_type, count, day):
+    label = DIGEST_LABELS.get(notification_type, f'{notification_type.replace("_", " ").lower()} notifications')
+    return f"{count} {label} on {day:%b %d, %Y}."
+
+
+def _unread_by_someone():
+    """Exists(): some staff member who can see the notification has not read it."""
+    return Exists(
+        GymStaff.objects.filter(
+            user__date_joined__lte=OuterRef('timestamp'),
+            notifications_cleared_through__lt=OuterRef('pk'),
+        ).exclude(
+            Exists(Notification_Read.objects.filter(notification=OuterRef(OuterRef('pk')), staff=OuterRef('pk')))
+        )
+    )
+
+
+def _archive(notification_ids):
+    """Copies the given notifications into the archive and deletes them."""
+    rows = Notification.objects.filter(pk__in=notification_ids).values(
+        'pk', 'notification_type', 'message', 'timestamp',
+        'related_member_id', 'related_request_id', 'digest_count',
+    )
+    Notification_Archive.objects.bulk_create([
+        Notification_Archive(
+            notification_id=row['pk'],
+            notification_type=row['notification_type'],
+            message=row['message'],
+            timestamp=row['timestamp'],
+            related_member_id=row['related_member_id'],
+            related_request_id=row['related_request_id'],
+            digest_count=row['digest_count'],
+        )
+        for row in rows
+    ])
+    Notification_Read.objects.filter(notification_id__in=notification_ids).delete()
+    Notification.objects.filter(pk__in=notification_ids).delete()
+
+
+def _staff_read_all(staff_rows, batch, receipts):
+    """Ids of staff who had read every notification of `batch` they could see."""
+    readers = set()
+    for staff_pk, joined, cleared_through in staff_rows:
+        if all(
+            pk <= cleared_through or (pk, staff_pk) in receipts
+            for pk, timestamp in batch
+            if timestamp >= joined
+        ):
+            readers.add(staff_pk)
+    return readers
+
+
+def coalesce_bursts(older_than, min_burst=5, batch_size=500):
+    """
+    Merges notifications older than `older_than` into one digest entry
+    per (type, local day) when that day has at least `min_burst` of
+    them. Merged rows go to the archive. A staff member sees the digest
+    as read only if they had read everything merged into it.
+    Returns the number of notifications merged.
+    """
+    bursts = (
+        Notification.objects.filter(timestamp__lt=older_than, digest_count__isnull=True)
+        .order_by()
+        .annotate(day=TruncDate('timestamp'))
+        .values('notification_type', 'day')
+        .annotate(total=Count('pk'))
+        .filter(total__gte=min_burst)
+    )
+    staff_rows = list(GymStaff.objects.values_list('pk', 'user__date_joined', 'notifications_cleared_through'))
+
+    merged = 0
+    for burst in list(bursts):
+        notification_type, day = burst['notification_type'], burst['day']
+        day_start, day_end = day_range(day)
+        members = Notification.objects.filter(
+            notification_type=notification_type,
+            timestamp__gte=day_start,
+            timestamp__lt=min(day_end, older_than),
+            digest_count__isnull=True,
+        ).order_by('pk')
+
+        while True:
+            batch = list(members.values_list('pk', 'timestamp')[:batch_size])
+            if not batch:
+                break
+            ids = [pk for pk, _ in batch]
+            receipts = set(Notification_Read.objects.filter(notification_id__in=ids).values_list('notification_id', 'staff_id'))
+            readers = _staff_read_all(staff_rows, batch, receipts)
+            redirect_urls = set(Notification.objects.filter(pk__in=ids).values_list('redirect_url', flat=True))
+
+            with transaction.atomic():
+                digest = Notification.objects.select_for_update().filter(
+                    notification_type=notification_type,
+                    timestamp__gte=day_start,
+                    timestamp__lt=day_end,
+                    digest_count__isnull=False,
+                ).first()
+                if digest is None:
+                    digest = Notification.objects.create(
+                        notification_type=notification_type,
+                        message='',
+                        timestamp=max(timestamp for _, timestamp in batch),
+                        digest_count=0,
+                        redirect_url=redirect_urls.pop() if len(redirect_urls) == 1 else None,
+                    )
+                    Notification_Read.objects.bulk_create(
+                        [Notification_Read(notification=digest, staff_id=staff_pk) for staff_pk in readers]
+                    )
+                else:
+                    # Still read only for staff who also read this batch
+                    digest.read_receipts.exclude(staff_id__in=readers).delete()
+                    if redirect_urls != {digest.redirect_url}:
+                        digest.redirect_url = None
+
+                digest.digest_count += len(ids)
+                digest.message = _digest_message(notification_type, digest.digest_count, day)
+                digest.timestamp = max([digest.timestamp] + [timestamp for _, timestamp in batch])
+                digest.save(update_fields=['digest_count', 'message', 'timestamp', 'redirect_url'])
+                _archive(ids)
+            merged += len(ids)
+    return merged
+
+
+def archive_notifications(read_before, stale_before, batch_size=500):
+    """
+    Moves notifications into the archive: those older than
+    `read_before` that every staff member has read, and anything older
+    than `stale_before`. Works in batches of `batch_size`, each in its
+    own short transaction. Returns the number archived.
+    """
+    candidates = Notification.objects.filter(
+        (Q(timestamp__lt=read_before) & ~_unread_by_someone()) | Q(timestamp__lt=stale_before)
+    ).order_by('pk')
+
+    archived = 0
+    while True:
+        ids = list(candidates.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return archived
+        with transaction.atomic():
+            _archive(ids)
+        archived += len(ids)
+
+
+def recount_all_unread():
+    """Recomputes every staff member's unread counter."""
+    for staff in GymStaff.objects.select_related('user'):
+        recount_unread(staff)
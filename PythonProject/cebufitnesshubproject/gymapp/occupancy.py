@@ -0,0 +1,265 @@
+"""
+Live gym occupancy: the number of members checked in right now.
+
+By default the count is read from the open Check_In rows (an index-only
+count, see roster.in_gym_count) and every check-in/out also runs one
+conditional UPDATE on OCCUPANCY_TRACKER.current_count to keep the row
+(shown in the admin) in step.
+
+With OCCUPANCY_COUNTER_FILE set (POSIX only), the count lives in a small
+memory-mapped file shared by every worker on the node, and the row is
+only written behind it:
+
+  - check-ins and check-outs change the mapped count under an exclusive
+    file lock (flock), so increments from all workers are atomic and the
+    count never goes below zero;
+  - reads (member dashboard, metrics) take the same lock and never query;
+  - whichever worker touches the counter once OCCUPANCY_FLUSH_SECONDS
+    have passed since the last flush copies it to current_count, and
+    each worker flushes at exit;
+  - the first worker to open a new file recounts the open Check_In rows
+    (check_out_time IS NULL), the source of truth, and starts from that.
+    Writers call prepare_counter() before changing a visit, so no change
+    lands both in the recount and in an add.
+    Put the file on tmpfs (e.g. /dev/shm) so a reboot or a new container
+    starts from a recount; `manage.py recover_occupancy` recounts on
+    demand.
+
+Visits nobody checked out are closed by `manage.py close_stale_visits`
+(close_stale_visits below), which lowers the count batch by batch.
+"""
+import atexit
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import OCCUPANCY_TRACKER, Activity_Log, Check_In
+from .roster import in_gym_count
+
+try:
+    import fcntl
+except ImportError:  # Windows: the database row stays the only counter
+    fcntl = None
+
+TRACKER_PK = 1
+
+# magic, count, last flushed count, last flush (epoch seconds)
+LAYOUT = struct.Struct('<8sqqd')
+MAGIC = b'CFHOCC01'
+
+_open_lock = threading.Lock()
+_counter = None
+_flush_at_exit = False
+
+
+class SharedCounter:
+    """An int64 in a memory-mapped file, changed under an exclusive flock."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < LAYOUT.size:
+            os.ftruncate(self.fd, LAYOUT.size)  # New file: zeroes, so no MAGIC yet
+        self.map = mmap.mmap(self.fd, LAYOUT.size)
+        self._thread_lock = threading.Lock()  # flock is per open file, not per thread
+
+    @contextmanager
+    def locked(self):
+        with self._thread_lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def read(self):
+        """(initialized, count, flushed count, flushed at). Call while locked."""
+        magic, count, flushed, flushed_at = LAYOUT.unpack_from(self.map, 0)
+        return magic == MAGIC, count, flushed, flushed_at
+
+    def write(self, count, flushed, flushed_at):
+        LAYOUT.pack_into(self.map, 0, MAGIC, count, flushed, flushed_at)
+
+    def add(self, delta):
+        """Adds `delta` (never going below zero) and returns the new count."""
+        with self.locked():
+            _, count, flushed, flushed_at = self.read()
+            count = max(0, count + delta)
+            self.write(count, flushed, flushed_at)
+        return count
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+
+def enabled():
+    return bool(getattr(settings, 'OCCUPANCY_COUNTER_FILE', None)) and fcntl is not None
+
+
+def open_count():
+    """Open visits in the database (the source of truth)."""
+    return in_gym_count()
+
+
+def _write_tracker(count):
+    OCCUPANCY_TRACKER.objects.filter(pk=TRACKER_PK).update(current_count=count, last_updated=timezone.now())
+
+
+def _shared_counter():
+    """This process's mapping of OCCUPANCY_COUNTER_FILE, recovering a new file first."""
+    global _counter, _flush_at_exit
+    path = settings.OCCUPANCY_COUNTER_FILE
+    if _counter is not None and _counter.path == path:
+        return _counter
+    with _open_lock:
+        if _counter is None or _counter.path != path:
+            if _counter is not None:
+                _counter.close()
+            counter = SharedCounter(path)
+            with counter.locked():
+                initialized = counter.read()[0]
+                if not initialized:
+                    count = open_count()
+                    counter.write(count, count, time.time())
+                    _write_tracker(count)
+            _counter = counter
+            if not _flush_at_exit:
+                atexit.register(flush, force=True)
+                _flush_at_exit = True
+    return _counter
+
+
+def flush(force=False):
+    """Copies the shared count to current_count if it changed and the interval has passed."""
+    if not enabled() or _counter is None:
+        return
+    counter = _shared_counter()
+    now = time.time()
+    with counter.locked():
+        _, count, flushed, flushed_at = counter.read()
+        if count == flushed or (not force and now - flushed_at < settings.OCCUPANCY_FLUSH_SECONDS):
+            return
+        counter.write(count, count, now)  # Claimed: other workers skip this interval
+    try:
+        _write_tracker(count)
+    except DatabaseError:
+        # The shared count is still right; give the claim back so the next touch retries
+        with counter.locked():
+            _, current, _, _ = counter.read()
+            counter.write(current, -1, 0.0)
+
+
+def prepare_counter():
+    """
+    Opens the shared counter before a visit is written. The first open
+    recounts the open visits, so it must not run between another
+    request's write and its record_check_in/out, or that change would be
+    counted twice.
+    """
+    if enabled():
+        _shared_counter()
+
+
+def record_check_in():
+    if enabled():
+        _shared_counter().add(1)
+        flush()
+    else:
+        OCCUPANCY_TRACKER.objects.filter(pk=TRACKER_PK).update(
+            current_count=F('current_count') + 1, last_updated=timezone.now()
+        )
+
+
+def record_check_out(count=1):
+    if enabled():
+        _shared_counter().add(-count)
+        flush()
+    else:
+        OCCUPANCY_TRACKER.objects.filter(pk=TRACKER_PK, current_count__gt=0).update(
+            current_count=Greatest(F('current_count') - count, 0), last_updated=timezone.now()
+        )
+
+
+def current_occupancy():
+    """Members inside right now."""
+    if enabled():
+        counter = _shared_counter()
+        with counter.locked():
+            count = counter.read()[1]
+        flush()
+        return count
+    return open_count()
+
+
+def recover():
+    """Recounts open visits and resets the shared counter and current_count to it."""
+    count = open_count()
+    if enabled():
+        counter = _shared_counter()
+        with counter.locked():
+            counter.write(count, count, time.time())
+    _write_tracker(count)
+    return count
+
+
+def close_stale_visits(max_duration, everyone=False, batch_size=500):
+    """
+    Checks out members who left without checking out. Closes open visits
+    that started more than `max_duration` ago, or with `everyone` (at
+    closing time) every open visit. A visit is closed at its start plus
+    `max_duration`, or now if that is earlier, and gets the Activity_Log
+    row a check-out at the desk would have written.
+
+    Works in batches of `batch_size`, oldest first. Each batch is one
+    transaction: lock the visits (skipping any being checked out at the
+    desk right now), close them in one UPDATE and insert their logs in
+    one INSERT. Once it commits, the occupancy count is lowered once, as
+    check_in_out_view does. Visits opened after the sweep started are
+    left alone. Returns the number closed.
+    """
+    now = timezone.now()
+    # Walks the partial checkin_open_idx
+    stale = Check_In.objects.filter(check_out_time__isnull=True, check_in_time__lte=now)
+    if not everyone:
+        stale = stale.filter(check_in_time__lt=now - max_duration)
+    stale = stale.order_by('check_in_time', 'pk').only('pk', 'member_id', 'check_in_time')
+
+    prepare_counter()
+    closed = 0
+    while True:
+        with transaction.atomic():
+            visits = list(stale.select_for_update(skip_locked=True)[:batch_size])
+            if not visits:
+                return closed
+            for visit in visits:
+                visit.check_out_time = min(visit.check_in_time + max_duration, now)
+            Check_In.objects.bulk_update(visits, ['check_out_time'])
+            Activity_Log.objects.bulk_create([
+                Activity_Log(
+                    member_id=visit.member_id,
+                    activity_date=visit.check_in_time.date(),
+                    duration_minutes=int((visit.check_out_time - visit.check_in_time).total_seconds() / 60),
+                )
+                for visit in visits
+            ])
+        record_check_out(len(visits))  # After the commit: the shared counter cannot be rolled back
+        closed += len(visits)
+
+
+def close():
+    """Unmaps this process's counter (tests)."""
+    global _counter
+    with _open_lock:
+        if _counter is not None:
+            _counter.close()
+            _counter = None
@@ -0,0 +1,176 @@
+"""
+Opt-in per-request profiling (REQUEST_PROFILING = True).
+
+ProfilingMiddleware times each request, counts its SQL queries and
+their total time through the shared execute wrapper in
+gymapp.sqltiming (so it works with DEBUG off), flags statements run
+more than once with the same parameters, and times template rendering. The numbers are sent back in
+a Server-Timing header, which browsers show in the network panel, and
+kept in a bounded in-process buffer that staff can read at
+/staff/profiling/. Each worker process has its own buffer.
+
+With the setting off the middleware removes itself at startup, so it
+costs nothing.
+"""
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+from . import sqltiming
+
+SQL_PREVIEW = 300  # Characters of a duplicated statement kept for display
+
+_profiles = deque(maxlen=500)
+_lock = threading.Lock()
+_current = ContextVar('request_profile', default=None)
+_templates_instrumented = False
+
+
+def enabled():
+    return getattr(settings, 'REQUEST_PROFILING', False)
+
+
+class RequestProfile:
+    """Counters for one request, fed by `record_query`."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statements = Counter()
+
+    def record_query(self, sql, params, seconds):
+        self.sql_seconds += seconds
+        self.sql_count += 1
+        try:
+            self.statements[(sql, repr(params))] += 1
+        except Exception:
+            pass  # Unprintable params; still counted above
+
+    def duplicates(self):
+        """[(sql, times run)] for statements repeated with identical parameters."""
+        return [(sql, count) for (sql, _), count in self.statements.most_common() if count > 1]
+
+
+def _record_query(sql, params, many, seconds, context):
+    """gymapp.sqltiming listener: adds the statement to the current request's profile."""
+    profile = _current.get()
+    if profile is not None:
+        profile.record_query(sql, params, seconds)
+
+
+def _instrument_templates():
+    """Times top-level template renders (includes are part of their parent's time)."""
+    global _templates_instrumented
+    if _templates_instrumented:
+        return
+    from django.template.backends.django import Template
+
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return original(self, context, request)
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            profile.template_seconds += time.perf_counter() - started
+
+    Template.render = render
+    _templates_instrumented = True
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        global _profiles
+        size = getattr(settings, 'REQUEST_PROFILING_BUFFER', 500)
+        if _profiles.maxlen != size:
+            with _lock:
+                _profiles = deque(_profiles, maxlen=size)
+        _instrument_templates()
+        sqltiming.add_listener(_record_query)
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        duplicates = profile.duplicates()
+        repeated = sum(count - 1 for _, count in duplicates)
+        match = getattr(request, 'resolver_match', None)
+        entry = {
+            'timestamp': timezone.now(),
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'sql_count': profile.sql_count,
+            'sql_ms': round(profile.sql_seconds * 1000, 2),
+            'template_ms': round(profile.template_seconds * 1000, 2),
+            'duplicate_queries': repeated,
+            'duplicates': [{'sql': sql[:SQL_PREVIEW], 'count': count} for sql, count in duplicates[:5]],
+        }
+        with _lock:
+            _profiles.append(entry)
+
+        response['Server-Timing'] = ', '.join([
+            f"total;dur={entry['total_ms']}",
+            f"sql;dur={entry['sql_ms']};desc=\"{profile.sql_count} queries, {repeated} duplicate\"",
+            f"tpl;dur={entry['template_ms']}",
+        ])
+        return response
+
+
+def recent_profiles(limit=None):
+    """Newest first."""
+    with _lock:
+        entries = list(_profiles)
+    entries.reverse()
+    return entries[:limit] if limit else entries
+
+
+def view_summary():
+    """Per-view aggregates over the buffer, slowest total time first."""
+    by_view = {}
+    for entry in recent_profiles():
+        by_view.setdefault(entry['view'] or entry['path'], []).append(entry)
+
+    rows = []
+    for view, entries in by_view.items():
+        totals = sorted(entry['total_ms'] for entry in entries)
+        rows.append({
+            'view': view,
+            'requests': len(entries),
+            'mean_ms': round(statistics.mean(totals), 2),
+            'p95_ms': totals[min(len(totals) - 1, int(len(totals) * 0.95))],
+            'max_ms': totals[-1],
+            'mean_sql_count': round(statistics.mean(entry['sql_count'] for entry in entries), 1),
+            'max_sql_count': max(entry['sql_count'] for entry in entries),
+            'mean_sql_ms': round(statistics.mean(entry['sql_ms'] for entry in entries), 2),
+            'mean_template_ms': round(statistics.mean(entry['template_ms'] for entry in entries), 2),
+            'with_duplicates': sum(1 for entry in entries if entry['duplicate_queries']),
+        })
+    rows.sort(key=lambda row: row['mean_ms'] * row['requests'], reverse=True)
+    return rows
+
+
+def clear_profiles():
+    with _lock:
+        _profiles.clear()
@@ -0,0 +1,185 @@
+"""
+Slow-query and duplicate-query log (QUERY_LOG_FILE).
+
+When QUERY_LOG_FILE is set, `install` registers `log_queries` with the
+shared execute wrapper (gymapp.sqltiming), which is added to every
+database connection as it is opened, so queries from views, management
+commands and background threads all pass through it. Each event is
+appended to the file as one JSON object per line:
+
+  slow_query          a statement that took at least QUERY_LOG_SLOW_MS
+  duplicate_query     the same SQL with the same parameters run more than
+                      once in one request (e.g. a settings row re-read)
+  repeated_statement  the same SQL with different parameters run at least
+                      QUERY_LOG_REPEAT_THRESHOLD times in one request
+                      (the N+1 pattern, e.g. a lookup per member)
+
+Events carry the parameters, the request's view and path, and the first
+stack frame in project code that issued the statement. Duplicates are
+tracked inside requests only (QueryLogMiddleware opens the scope) and
+written once per statement when the request ends.
+
+With QUERY_LOG_FILE unset nothing is installed and the middleware
+removes itself, so there is no per-query cost at all. When it is set,
+a normal query costs a dictionary update on top of the shared timing; stacks
+are only walked for slow statements and the first repeat of a duplicate.
+"""
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+from . import sqltiming
+
+SQL_LIMIT = 2000  # Characters of SQL written per event
+
+_scope = ContextVar('query_log_scope', default=None)
+_write_lock = threading.Lock()
+_file = None
+_file_path = None
+
+_PROJECT_ROOT = str(settings.BASE_DIR)
+_SKIP_PATHS = (
+    os.path.dirname(__file__) + os.sep + 'querylog.py',
+    os.path.dirname(__file__) + os.sep + 'sqltiming.py',
+    os.sep + 'site-packages' + os.sep,
+)
+
+
+def enabled():
+    return bool(getattr(settings, 'QUERY_LOG_FILE', None))
+
+
+def _write(event):
+    global _file, _file_path
+    path = settings.QUERY_LOG_FILE
+    line = json.dumps(event, default=str) + '\n'
+    with _write_lock:
+        if _file is None or _file_path != path:
+            if _file is not None:
+                _file.close()
+            _file = open(path, 'a', buffering=1)  # Line-buffered appends; safe to share between workers
+            _file_path = path
+        _file.write(line)
+
+
+def _origin():
+    """'path:line in function' of the innermost project frame outside this module."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT_ROOT) and not any(skip in filename for skip in _SKIP_PATHS):
+            return f'{os.path.relpath(filename, _PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def _params(params):
+    try:
+        json.dumps(params, default=str)
+        return params
+    except (TypeError, ValueError):
+        return repr(params)
+
+
+class RequestScope:
+    """Statement counters for one request."""
+
+    def __init__(self, request):
+        self.request = request
+        self.identical = Counter()
+        self.by_sql = Counter()
+        self.first_params = {}
+        self.origins = {}
+
+    @property
+    def view(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else None
+
+    def count(self, sql, params):
+        self.by_sql[sql] += 1
+        try:
+            key = (sql, repr(params))
+        except Exception:
+            return
+        self.identical[key] += 1
+        if self.identical[key] == 1:
+            self.first_params.setdefault(sql, params)
+        elif self.identical[key] == 2 and key not in self.origins:
+            self.origins[key] = _origin()
+        if self.by_sql[sql] == settings.QUERY_LOG_REPEAT_THRESHOLD and sql not in self.origins:
+            self.origins[sql] = _origin()
+
+    def events(self):
+        base = {'view': self.view, 'method': self.request.method, 'path': self.request.path}
+        for (sql, params), count in self.identical.items():
+            if count > 1:
+                yield dict(base, type='duplicate_query', count=count, sql=sql[:SQL_LIMIT],
+                           params=params, origin=self.origins.get((sql, params)))
+        threshold = settings.QUERY_LOG_REPEAT_THRESHOLD
+        variants = Counter(sql for sql, _ in self.identical)
+        for sql, count in self.by_sql.items():
+            distinct = variants[sql]
+            if count >= threshold and distinct > 1:
+                yield dict(base, type='repeated_statement', count=count, distinct_params=distinct,
+                           sql=sql[:SQL_LIMIT], params=_params(self.first_params.get(sql)),
+                           origin=self.origins.get(sql))
+
+
+def log_queries(sql, params, many, seconds, context):
+    """gymapp.sqltiming listener: counts the statement and logs it if slow."""
+    elapsed_ms = seconds * 1000
+    scope = _scope.get()
+    if scope is not None and not many:
+        scope.count(sql, params)
+    if elapsed_ms >= settings.QUERY_LOG_SLOW_MS:
+        _write({
+            'type': 'slow_query',
+            'timestamp': timezone.now().isoformat(),
+            'pid': os.getpid(),
+            'database': context['connection'].alias,
+            'duration_ms': round(elapsed_ms, 2),
+            'sql': sql[:SQL_LIMIT],
+            'params': _params(params),
+            'many': many,
+            'view': scope.view if scope else None,
+            'path': scope.request.path if scope else None,
+            'origin': _origin(),
+        })
+
+
+def install():
+    """Logs statements on every connection opened from now on (and the current thread's open ones)."""
+    sqltiming.add_listener(log_queries)
+
+
+def uninstall():
+    sqltiming.remove_listener(log_queries)
+
+
+class QueryLogMiddleware:
+    """Opens a duplicate-tracking scope per request and writes its findings at the end."""
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        scope = RequestScope(request)
+        token = _scope.set(scope)
+        try:
+            return self.get_response(request)
+        finally:
+            _scope.reset(token)
+            now = timezone.now().isoformat()
+            for event in scope.events():
+                _write(dict(event, timestamp=now, pid=os.getpid()))
@@ -0,0 +1,160 @@
+"""
+Daily revenue rollup maintenance.
+
+Daily_Revenue_Rollup holds one row per (local date, transaction type).
+`apply_billing_change` is called from the Billing_Record signals, so
+it runs inside the same transaction as the write that triggered it.
+`rebuild_rollup` recomputes rows from the ledger and backs the
+`rebuild_revenue_rollup` management command. `revenue_series` buckets
+the rollup by day, week or month for the revenue chart.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .kpis import local_day_start
+from .models import Billing_Record, Daily_Revenue_Rollup
+
+
+def apply_billing_change(transaction_type, timestamp, amount, count=1):
+    """
+    Adds `amount` (and `count` records) to the rollup row for the local
+    date of `timestamp`. Pass negative values to undo a record.
+    """
+    day = timezone.localdate(timestamp)
+    rows = Daily_Revenue_Rollup.objects.filter(date=day, transaction_type=transaction_type)
+
+    updated = rows.update(
+        total_amount=F('total_amount') + amount,
+        record_count=F('record_count') + count,
+    )
+    if updated:
+        return
+
+    try:
+        # Savepoint, so a concurrent insert of the same row does not
+        # break the caller's transaction.
+        with transaction.atomic():
+            Daily_Revenue_Rollup.objects.create(
+                date=day,
+                transaction_type=transaction_type,
+                total_amount=amount,
+                record_count=count,
+            )
+    except IntegrityError:
+        rows.update(
+            total_amount=F('total_amount') + amount,
+            record_count=F('record_count') + count,
+        )
+
+
+def rebuild_rollup(start_date=None, end_date=None):
+    """
+    Recomputes the rollup from Billing_Record for the given (inclusive)
+    local date range, or for the whole ledger when no range is given.
+    Returns the number of rollup rows written.
+    """
+    ledger = Billing_Record.objects.all()
+    existing = Daily_Revenue_Rollup.objects.all()
+    if start_date:
+        ledger = ledger.filter(timestamp__gte=local_day_start(start_date))
+        existing = existing.filter(date__gte=start_date)
+    if end_date:
+        ledger = ledger.filter(timestamp__lt=local_day_start(end_date + timedelta(days=1)))
+        existing = existing.filter(date__lte=end_date)
+
+    totals = (
+        ledger.order_by()
+        .annotate(day=TruncDate('timestamp'))
+        .values('day', 'transaction_type')
+        .annotate(total=Sum('amount'), records=Count('pk'))
+    )
+
+    with transaction.atomic():
+        rows = [
+            Daily_Revenue_Rollup(
+                date=row['day'],
+                transaction_type=row['transaction_type'],
+                total_amount=row['total'],
+                record_count=row['records'],
+            )
+            for row in totals
+        ]
+        existing.delete()
+        Daily_Revenue_Rollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+# --- Chart series ---
+
+GRANULARITIES = ('day', 'week', 'month')
+MAX_BUCKETS = 1000
+CENT = Decimal('0.01')
+
+
+def bucket_start(day, granularity):
+    """First date of the bucket that `day` falls in."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())  # Monday, like TruncWeek
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        if day.month == 12:
+            return day.replace(year=day.year + 1, month=1)
+        return day.replace(month=day.month + 1)
+    return day + timedelta(days=1)
+
+
+def count_buckets(start_date, end_date, granularity):
+    if granularity == 'week':
+        return (bucket_start(end_date, 'week') - bucket_start(start_date, 'week')).days // 7 + 1
+    if granularity == 'month':
+        return (end_date.year - start_date.year) * 12 + end_date.month - start_date.month + 1
+    return (end_date - start_date).days + 1
+
+
+def revenue_series(start_date, end_date, granularity='day', transaction_type='PAYMENT'):
+    """
+    Returns [(bucket_date, Decimal total), ...] covering every bucket
+    from start_date to end_date (inclusive), with empty buckets as 0.
+
+    Bucketing and summing happen in the database over the rollup, so
+    the cost depends on the number of days in range, not on how many
+    payments were made. Payments are flipped to positive amounts.
+    """
+    rows = Daily_Revenue_Rollup.objects.filter(
+        transaction_type=transaction_type,
+        date__gte=start_date,
+        date__lte=end_date,
+    )
+    if granularity == 'week':
+        rows = rows.annotate(bucket=TruncWeek('date'))
+    elif granularity == 'month':
+        rows = rows.annotate(bucket=TruncMonth('date'))
+    else:
+        rows = rows.annotate(bucket=F('date'))
+
+    totals = {
+        row['bucket']: row['total']
+        for row in rows.order_by().values('bucket').annotate(total=Sum('total_amount'))
+    }
+
+    sign = -1 if transaction_type == 'PAYMENT' else 1
+    zero = Decimal('0.00')
+    series = []
+    bucket = bucket_start(start_date, granularity)
+    while bucket <= end_date:
+        total = sign * (totals.get(bucket) or zero)
+        series.append((bucket, (zero + total).quantize(CENT)))
+        bucket = next_bucket(bucket, granularity)
+    return series
@@ -0,0 +1,225 @@
+"""
+Roster queries for the staff dashboard.
+
+Every member-list helper returns a gym_Member queryset that already
+carries the member's latest check-in (time and open/closed state) as
+annotations, so a whole list renders in a single query instead of one
+extra query per member.
+
+The live "in the gym" list and count read the open Check_In rows
+(check_out_time IS NULL) through the checkin_open_idx partial index,
+which only ever holds the people inside.
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import BooleanField, Case, OuterRef, Q, Subquery, Value, When
+
+from .models import Check_In, gym_Member
+
+
+def _latest_check_in(field):
+    """Correlated subquery returning `field` from the member's newest Check_In."""
+    return Subquery(
+        Check_In.objects.filter(member=OuterRef('pk'))
+        .order_by('-check_in_time')
+        .values(field)[:1]
+    )
+
+
+def with_latest_check_in(queryset):
+    """
+    Annotates a gym_Member queryset with:
+    - last_checkin_time: when the member last checked in (or None)
+    - last_checkout_time: when that same visit was closed (or None)
+    - is_checked_in: True if the latest visit is still open
+    """
+    return queryset.annotate(
+        last_checkin_time=_latest_check_in('check_in_time'),
+        last_checkout_time=_latest_check_in('check_out_time'),
+    ).annotate(
+        is_checked_in=Case(
+            When(
+                last_checkin_time__isnull=False,
+                last_checkout_time__isnull=True,
+                then=Value(True),
+            ),
+            default=Value(False),
+            output_field=BooleanField(),
+        )
+    )
+
+
+def search_members(queryset, search_query):
+    """Filters a roster by name, email or membership ID."""
+    if not search_query:
+        return queryset
+    return queryset.filter(
+        Q(user__first_name__icontains=search_query) |
+        Q(user__last_name__icontains=search_query) |
+        Q(user__email__icontains=search_query) |
+        Q(membership_id__icontains=search_query)
+    )
+
+
+# --- Roster lists (one query each) ---
+
+def active_members(today, search_query=None):
+    """Active, unfrozen members whose plan has not expired."""
+    queryset = gym_Member.objects.filter(
+        user__is_active=True,
+        is_frozen=False
+    ).filter(
+        Q(next_due_date__isnull=True) | Q(next_due_date__gte=today)
+    ).select_related('user')
+    return with_latest_check_in(search_members(queryset, search_query))
+
+
+def pending_members():
+    """Fresh registrations waiting for staff activation."""
+    return gym_Member.objects.filter(activation_status='pending').select_related('user')
+
+
+def frozen_members():
+    """Members whose plan is currently paused."""
+    queryset = gym_Member.objects.filter(is_frozen=True).select_related('user')
+    return with_latest_check_in(queryset)
+
+
+def deactivated_members(today):
+    """
+    Approved members who were either deactivated by staff or whose
+    plan has expired. `status_label` tells the two apart.
+    """
+    queryset = gym_Member.objects.filter(
+        activation_status='approved'
+    ).filter(
+        Q(user__is_active=False) | Q(next_due_date__lt=today)
+    ).select_related('user').annotate(
+        status_label=Case(
+            When(user__is_active=False, then=Value('Deactivated')),
+            default=Value('Expired'),
+        )
+    )
+    return with_latest_check_in(queryset)
+
+
+# --- Tabs and keyset pagination (used by the member list API) ---
+
+MEMBER_TABS = ('active', 'pending', 'frozen', 'deactivated')
+
+# Public sort key -> model field. Every key is paired with the primary
+# key as a tie-breaker, so (field, pk) is unique and the cursor is stable.
+SORT_FIELDS = {
+    'name': 'user__first_name',
+    'joined': 'user__date_joined',
+    'balance': 'balance',
+}
+DEFAULT_SORT = 'name'
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+def tab_queryset(tab, today, search_query=None, status=None, checked_in=None):
+    """
+    Returns the roster queryset behind one dashboard tab, with the
+    optional filters applied. Raises KeyError for an unknown tab.
+    """
+    if tab == 'active':
+        queryset = active_members(today)
+    elif tab == 'pending':
+        queryset = pending_members()
+    elif tab == 'frozen':
+        queryset = frozen_members()
+    elif tab == 'deactivated':
+        queryset = deactivated_members(today)
+        if status == 'expired':
+            queryset = queryset.filter(user__is_active=True)
+        elif status == 'deactivated':
+            queryset = queryset.filter(user__is_active=False)
+    else:
+        raise KeyError(tab)
+
+    queryset = search_members(queryset, search_query)
+    if checked_in is not None and tab != 'pending':
+        queryset = queryset.filter(is_checked_in=checked_in)
+    return queryset
+
+
+def _sort_value(member, field):
+    value = member
+    for part in field.split('__'):
+        value = getattr(value, part)
+    return value
+
+
+def encode_cursor(member, field):
+    value = _sort_value(member, field)
+    value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    raw = json.dumps([value, member.pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return value, int(pk)
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+def paginate(queryset, sort=DEFAULT_SORT, cursor=None, limit=DEFAULT_PAGE_SIZE, sort_fields=SORT_FIELDS):
+    """
+    Keyset pagination over a roster queryset.
+
+    `sort` is one of `sort_fields`, optionally prefixed with '-' for
+    descending order. Returns (members, next_cursor); next_cursor is
+    None on the last page. Pages are fetched with a range filter on
+    (field, pk) instead of an OFFSET, so deep pages cost the same as
+    the first one.
+    """
+    descending = sort.startswith('-')
+    field = sort_fields.get(sort.lstrip('-'))
+    if field is None:
+        raise KeyError(sort)
+
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        op = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{field}__{op}': value}) |
+            Q(**{field: value, f'pk__{op}': pk})
+        )
+
+    prefix = '-' if descending else ''
+    members = list(queryset.order_by(f'{prefix}{field}', f'{prefix}pk')[:limit + 1])
+
+    next_cursor = None
+    if len(members) > limit:
+        members = members[:limit]
+        next_cursor = encode_cursor(members[-1], field)
+    return members, next_cursor
+
+
+# --- Who is in the gym (open visits) ---
+
+IN_GYM_SORT_FIELDS = {'checked_in': 'check_in_time'}
+IN_GYM_DEFAULT_SORT = 'checked_in'  # Longest inside first, so forgotten check-outs surface
+
+
+def open_visits():
+    """Visits not checked out yet, with the member and user for display."""
+    return Check_In.objects.filter(check_out_time__isnull=True).select_related('member__user')
+
+
+def in_gym_count():
+    """
+    Members inside right now, counted from the open visits themselves.
+    Occupancy shown anywhere comes from this, so it cannot drift.
+    """
+    return Check_In.objects.filter(check_out_time__isnull=True).count()
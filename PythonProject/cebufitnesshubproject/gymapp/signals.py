@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from django.db import transaction
 from django.conf import settings
-from .models import CustomUser, gym_Member, GymStaff, Account_Request, Notification
+from .models import CustomUser, gym_Member, GymStaff, Account_Request, Billing_Record, Check_In, OCCUPANCY_TRACKER
+from . import gym_settings, metrics
+from .notifications import notify_all_staff
+from .revenue import apply_billing_change
 from django.urls import reverse
 
 # Use settings.AUTH_USER_MODEL to refer to your CustomUser
@@ -51,27 +55,22 @@ def create_request_notification(sender, instance, created, **kwargs):
     """
     # Only run if the request is NEW and its status is PENDING
     if created and instance.status == 'PENDING':
-        # 1. Get all staff members
-        all_staff = GymStaff.objects.all()
-        
-        # 2. Create the message
+        # 1. Create the message (member name is looked up once, not per staff)
         member_name = instance.member.user.get_full_name()
         request_type = instance.get_request_type_display()
         message = f"New {request_type} request from {member_name}."
         
-        # 3. Define the redirect URL
+        # 2. Define the redirect URL
         # This points to your main staff dashboard, the 'Approval Queue' section
         redirect_url = reverse('staff_dashboard') + '#approvals' 
 
-        # 4. Create a notification for each staff member
-        for staff in all_staff:
-            Notification.objects.create(
-                recipient_staff=staff,
-                message=message,
-                notification_type='NEW_REQUEST',
-                redirect_url=redirect_url,
-                related_request=instance
-            )
+        # 3. Raise one notification shared by every staff member
+        notify_all_staff(
+            message=message,
+            notification_type='NEW_REQUEST',
+            redirect_url=redirect_url,
+            related_request=instance
+        )
 
 
 #For the creation of the pending activation notification
@@ -85,10 +84,7 @@ def create_registration_notification(sender, instance, created, **kwargs):
 
     # Run if it's a brand new creation OR a re-application
     if created or is_reapplication:
-        # 1. Get all staff
-        all_staff = GymStaff.objects.all()
-        
-        # 2. Create message
+        # 1. Create message
         member_name = instance.user.get_full_name()
         
         # Custom message for re-applicants
@@ -97,15 +93,94 @@ def create_registration_notification(sender, instance, created, **kwargs):
         else:
             message = f"{member_name} has registered. Pending activation."
         
-        # 3. Define URL
+        # 2. Define URL
         redirect_url = reverse('staff_dashboard') + '?filter=pending'
 
-        # 4. Create notifications
-        for staff in all_staff:
-            Notification.objects.create(
-                recipient_staff=staff,
-                message=message,
-                notification_type='NEW_REGISTRATION',
-                redirect_url=redirect_url,
-                related_member=instance 
-            )
\ No newline at end of file
+        # 3. Raise one notification shared by every staff member
+        notify_all_staff(
+            message=message,
+            notification_type='NEW_REGISTRATION',
+            redirect_url=redirect_url,
+            related_member=instance 
+        )
+
+
+# --- Daily revenue rollup ---
+# These run inside the same transaction as the Billing_Record write,
+# so the rollup can never disagree with a committed ledger.
+
+ROLLUP_FIELDS = {'transaction_type', 'timestamp', 'amount'}
+
+
+@receiver(pre_save, sender=Billing_Record)
+def remember_billing_before_edit(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Keeps the stored values of an edited record, however it is saved, so
+    the rollup can move the amount to its new date/type. Saves limited by
+    update_fields to other columns cannot move money and skip the lookup.
+    """
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not ROLLUP_FIELDS.intersection(update_fields):
+        return
+    instance._rollup_previous = (
+        Billing_Record.objects.filter(pk=instance.pk)
+        .values_list('transaction_type', 'timestamp', 'amount')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Billing_Record)
+def add_billing_to_rollup(sender, instance, created, raw=False, **kwargs):
+    """
+    Signal to add every new Billing_Record to Daily_Revenue_Rollup.
+    """
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    if not created and previous:
+        transaction_type, timestamp, amount = previous
+        apply_billing_change(transaction_type, timestamp, -amount, count=-1)
+    if created or previous:
+        apply_billing_change(instance.transaction_type, instance.timestamp, instance.amount)
+    instance._rollup_previous = None
+
+
+@receiver(post_delete, sender=Billing_Record)
+def remove_billing_from_rollup(sender, instance, **kwargs):
+    """
+    Signal to take a deleted Billing_Record back out of the rollup.
+    """
+    apply_billing_change(instance.transaction_type, instance.timestamp, -instance.amount, count=-1)
+
+
+# --- Business counters for /metrics (gymapp.metrics) ---
+# No-ops unless METRICS_ENABLED is on.
+
+@receiver(post_save, sender=Check_In)
+def count_check_in(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        metrics.inc('gymapp_check_ins_total')
+
+
+@receiver(post_save, sender=Billing_Record)
+def count_payment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.transaction_type == 'PAYMENT':
+        metrics.inc('gymapp_payments_total')
+        metrics.inc('gymapp_payment_amount_total', float(-instance.amount))  # Payments are stored negative
+
+
+# --- Gym settings cache (gymapp.gym_settings) ---
+
+@receiver(post_save, sender=OCCUPANCY_TRACKER)
+@receiver(post_delete, sender=OCCUPANCY_TRACKER)
+def refresh_gym_settings(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal to make every worker reload the settings row after the
+    settings page, the admin or anything else saves it.
+    Occupancy-only saves leave the cache alone.
+    """
+    if update_fields and set(update_fields) <= {'current_count', 'last_updated'}:
+        return
+    gym_settings.invalidate()
+    transaction.on_commit(gym_settings.invalidate)  # Drops rows other workers read before the commit
@@ -0,0 +1,70 @@
+"""
+One timing wrapper for every SQL statement, shared by the query
+consumers: request profiling (gymapp.profiling), the slow/duplicate
+query log (gymapp.querylog) and Prometheus metrics (gymapp.metrics).
+
+`add_listener` installs `timed_execute` as an execute wrapper on every
+database connection as it is opened (and on the current thread's open
+ones), once. Each statement is timed once and handed to every
+registered listener as
+
+    listener(sql, params, many, seconds, context)
+
+Listeners that only care about statements inside a request keep their
+per-request state in a ContextVar and return at once outside one.
+Nothing is installed until a consumer is enabled, so with all three
+off a query runs with no wrapper at all.
+"""
+import threading
+import time
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_listeners = ()  # Replaced, never mutated, so the wrapper reads it without a lock
+_lock = threading.Lock()
+_installed = False
+
+
+def timed_execute(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - started
+        for listener in _listeners:
+            listener(sql, params, many, seconds, context)
+
+
+def _attach(sender, connection, **kwargs):
+    if timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timed_execute)
+
+
+def _install():
+    global _installed
+    if _installed:
+        return
+    connection_created.connect(_attach, dispatch_uid='gymapp.sqltiming')
+    for connection in connections.all(initialized_only=True):
+        _attach(None, connection)
+    _installed = True
+
+
+def add_listener(listener):
+    """Registers `listener` (idempotent) and makes sure statements are timed."""
+    global _listeners
+    with _lock:
+        if listener not in _listeners:
+            _listeners = _listeners + (listener,)
+        _install()
+
+
+def remove_listener(listener):
+    global _listeners
+    with _lock:
+        _listeners = tuple(registered for registered in _listeners if registered is not listener)
+
+
+def listening(listener):
+    return listener in _listeners
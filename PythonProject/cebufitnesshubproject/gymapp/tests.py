@@ -1,3 +1,1828 @@
-from django.test import TestCase
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import Sum
+from django.http import JsonResponse
+from django.test import Client, LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import events, gym_settings, health, metrics, occupancy, profiling, querylog, roster, sqltiming
+from .gym_settings import get_gym_settings
+from .kpis import dashboard_kpis, day_range, member_kpis
+from .notifications import mark_all_read, mark_read, recount_unread, staff_feed
+from .occupancy import current_occupancy
+from .models import (
+    Account_Request, Activity_Log, Billing_Record, Check_In, ClassSchedule, CustomUser, Daily_Revenue_Rollup, GymStaff,
+    Notification, Notification_Archive, Notification_Read, OCCUPANCY_TRACKER, gym_Member,
+)
+
+
+def make_staff(email='staff@example.com'):
+    return CustomUser.objects.create_user(
+        email=email, password='StaffPass123', first_name='Staff', last_name='User', is_staff=True
+    )
+
+
+def make_member(index, **profile_fields):
+    """Creates an approved member (the signal builds the gym_Member profile)."""
+    user = CustomUser.objects.create_user(
+        email=f'member{index}@example.com', password='MemberPass123',
+        first_name=f'Member{index}', last_name='Test',
+    )
+    member = user.gym_member
+    member.activation_status = profile_fields.pop('activation_status', 'approved')
+    member.next_due_date = profile_fields.pop('next_due_date', timezone.now().date() + timedelta(days=30))
+    member.membership_id = f'CFH-TEST-{index:04d}'
+    for field, value in profile_fields.items():
+        setattr(member, field, value)
+    member.save()
+    return member
+
+
+def seed_roster(count, start=0):
+    """Creates `count` members spread across the four dashboard lists, each with visits."""
+    today = timezone.now().date()
+    now = timezone.now()
+    for i in range(start, start + count):
+        bucket = i % 4
+        if bucket == 0:
+            member = make_member(i)
+        elif bucket == 1:
+            member = make_member(i, activation_status='pending')
+        elif bucket == 2:
+            member = make_member(i, is_frozen=True)
+        else:
+            member = make_member(i, next_due_date=today - timedelta(days=3))
+        Check_In.objects.create(
+            member=member,
+            check_in_time=now - timedelta(days=1, hours=2),
+            check_out_time=now - timedelta(days=1),
+        )
+        if i % 2 == 0:
+            # Latest visit still open -> member counts as checked in
+            Check_In.objects.create(member=member, check_in_time=now - timedelta(minutes=30))
+
+
+class RosterQueryTests(TestCase):
+    """The roster lists must cost a fixed number of queries, however many members exist."""
+
+    def setUp(self):
+        OCCUPANCY_TRACKER.objects.create(pk=1)
+
+    def _count_roster_queries(self):
+        today = timezone.now().date()
+        with CaptureQueriesContext(connection) as ctx:
+            for queryset in (
+                roster.active_members(today),
+                roster.pending_members(),
+                roster.frozen_members(),
+                roster.deactivated_members(today),
+            ):
+                for member in queryset:
+                    member.user.get_full_name()
+                    getattr(member, 'last_checkin_time', None)
+        return len(ctx.captured_queries)
+
+    def test_roster_query_count_is_constant(self):
+        seed_roster(8)
+        small = self._count_roster_queries()
+        seed_roster(40, start=8)
+        large = self._count_roster_queries()
+        self.assertEqual(small, 4)
+        self.assertEqual(small, large)
+
+    def test_latest_check_in_annotations(self):
+        now = timezone.now()
+        open_member = make_member(1)
+        Check_In.objects.create(member=open_member, check_in_time=now - timedelta(days=2),
+                                check_out_time=now - timedelta(days=2) + timedelta(hours=1))
+        latest = Check_In.objects.create(member=open_member, check_in_time=now - timedelta(minutes=5))
+        closed_member = make_member(2)
+        Check_In.objects.create(member=closed_member, check_in_time=now - timedelta(hours=3),
+                                check_out_time=now - timedelta(hours=2))
+        idle_member = make_member(3)
+
+        members = {m.pk: m for m in roster.active_members(now.date())}
+        self.assertTrue(members[open_member.pk].is_checked_in)
+        self.assertEqual(members[open_member.pk].last_checkin_time, latest.check_in_time)
+        self.assertFalse(members[closed_member.pk].is_checked_in)
+        self.assertFalse(members[idle_member.pk].is_checked_in)
+        self.assertIsNone(members[idle_member.pk].last_checkin_time)
+
+    def test_deactivated_status_label(self):
+        today = timezone.now().date()
+        expired = make_member(1, next_due_date=today - timedelta(days=1))
+        deactivated = make_member(2)
+        deactivated.user.is_active = False
+        deactivated.user.save()
+
+        labels = {m.pk: m.status_label for m in roster.deactivated_members(today)}
+        self.assertEqual(labels[expired.pk], 'Expired')
+        self.assertEqual(labels[deactivated.pk], 'Deactivated')
+
+    def test_staff_dashboard_query_count_is_constant(self):
+        staff = make_staff()
+        self.client.force_login(staff)
+        url = reverse('staff_dashboard')
+
+        seed_roster(8)
+        get_gym_settings()  # Warm, as in steady state
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        seed_roster(40, start=8)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class MemberListApiTests(TestCase):
+    """Paged JSON endpoint behind the lazily loaded member tabs."""
+
+    def setUp(self):
+        OCCUPANCY_TRACKER.objects.create(pk=1)
+        self.client.force_login(make_staff())
+
+    def _collect(self, tab, **params):
+        url = reverse('staff_member_list_api', args=[tab])
+        seen, cursor, pages = [], None, 0
+        while True:
+            query = dict(params, limit=3)
+            if cursor:
+                query['cursor'] = cursor
+            response = self.client.get(url, query)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            seen.extend(row['member_id'] for row in data['results'])
+            pages += 1
+            cursor = data['next_cursor']
+            if not cursor:
+                return seen, pages
+
+    def test_keyset_pages_cover_every_member_once(self):
+        members = [make_member(i) for i in range(10)]
+        for sort in ('name', '-name', 'joined', '-balance'):
+            seen, pages = self._collect('active', sort=sort)
+            self.assertEqual(sorted(seen), sorted(m.pk for m in members))
+            self.assertEqual(len(seen), len(set(seen)))
+            self.assertEqual(pages, 4)
+
+    def test_page_query_count_is_constant(self):
+        url = reverse('staff_member_list_api', args=['active'])
+        seed_roster(8)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        seed_roster(40, start=8)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_search_and_status_filters(self):
+        today = timezone.now().date()
+        make_member(1)
+        make_member(2)
+        make_member(3, next_due_date=today - timedelta(days=2))
+
+        seen, _ = self._collect('active', q='Member2')
+        self.assertEqual(len(seen), 1)
+        seen, _ = self._collect('deactivated', status='expired')
+        self.assertEqual(len(seen), 1)
+        seen, _ = self._collect('deactivated', status='deactivated')
+        self.assertEqual(seen, [])
+
+    def test_rejects_bad_parameters(self):
+        url = reverse('staff_member_list_api', args=['active'])
+        self.assertEqual(self.client.get(url, {'sort': 'password'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'not-a-cursor'}).status_code, 400)
+        bad_tab = reverse('staff_member_list_api', args=['everyone'])
+        self.assertEqual(self.client.get(bad_tab).status_code, 404)
+
+
+class InGymApiTests(TestCase):
+    """The live 'In the Gym' list pages through open visits; its count is what members see."""
+
+    def setUp(self):
+        OCCUPANCY_TRACKER.objects.create(pk=1, capacity_limit=60, current_count=99)  # Row count has drifted
+        self.staff = make_staff()
+        self.client.force_login(self.staff)
+        now = timezone.now()
+        self.members = [make_member(i) for i in range(7)]
+        for i, member in enumerate(self.members):
+            Check_In.objects.create(member=member, check_in_time=now - timedelta(minutes=10 * (i + 1)))
+        # Closed visits never show
+        Check_In.objects.create(member=self.members[0], check_in_time=now - timedelta(days=1, hours=1),
+                                check_out_time=now - timedelta(days=1))
+
+    def test_pages_longest_inside_first(self):
+        url = reverse('staff_in_gym_api')
+        rows, cursor = [], None
+        while True:
+            data = self.client.get(url, {'limit': 3, **({'cursor': cursor} if cursor else {})}).json()
+            self.assertEqual(data['count'], 7)
+            self.assertEqual(data['capacity'], 60)
+            rows.extend(data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual([row['member_id'] for row in rows], [m.user.pk for m in reversed(self.members)])
+        self.assertEqual(rows[0]['membership_id'], 'CFH-TEST-0006')
+        self.assertEqual(rows[0]['elapsed_minutes'], 70)
+        self.assertEqual(rows[-1]['elapsed_minutes'], 10)
+
+        newest = self.client.get(url, {'sort': '-checked_in', 'limit': 1}).json()['results']
+        self.assertEqual(newest[0]['member_id'], self.members[0].user.pk)
+
+    def test_member_dashboard_shows_the_same_count(self):
+        self.client.force_login(self.members[0].user)
+        response = self.client.get(reverse('member_dashboard'))
+        self.assertEqual(response.context['occupancy'].current_count, 7)
+
+        self.client.force_login(self.staff)
+        self.client.post(reverse('check_in_out_view'), data={'member_id': self.members[0].user.pk, 'action': 'checkout'},
+                         content_type='application/json')
+        self.assertEqual(self.client.get(reverse('staff_in_gym_api')).json()['count'], 6)
+
+    def test_staff_only_and_bad_parameters(self):
+        url = reverse('staff_in_gym_api')
+        self.assertEqual(self.client.get(url, {'sort': 'name'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'not-a-cursor'}).status_code, 400)
+        self.client.force_login(self.members[0].user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class DashboardKpiTests(TestCase):
+    """KPI header figures take two counts and one aggregate over the daily revenue rollup."""
+
+    def test_kpis_match_ledger(self):
+        today = timezone.localdate()
+        day_start, _ = day_range(today)
+        member = make_member(1)
+        make_member(2, is_frozen=True)
+        Account_Request.objects.create(member=member, request_type='FREEZE', status='PENDING')
+        Account_Request.objects.create(member=member, request_type='UNFREEZE', status='REJECTED')
+
+        Billing_Record.objects.create(member=member, transaction_type='FEE', amount=Decimal('2000.00'),
+                                      timestamp=day_start + timedelta(hours=9))
+        Billing_Record.objects.create(member=member, transaction_type='PAYMENT', amount=Decimal('-500.00'),
+                                      timestamp=day_start + timedelta(hours=9))
+        # Just before local midnight: this month (unless today is the 1st) but not today
+        Billing_Record.objects.create(member=member, transaction_type='PAYMENT', amount=Decimal('-250.50'),
+                                      timestamp=day_start - timedelta(minutes=1))
+
+        with self.assertNumQueries(3):
+            kpis = dashboard_kpis()
+
+        self.assertEqual(kpis['active_members'], 1)
+        self.assertEqual(kpis['pending_approvals'], 1)
+        self.assertEqual(kpis['todays_revenue'], Decimal('500.00'))
+        self.assertEqual(kpis['mrr'], Decimal('2000.00'))
+        expected_month = Decimal('500.00') if today.day == 1 else Decimal('750.50')
+        self.assertEqual(kpis['monthly_revenue'], expected_month)
+
+    def test_kpi_api(self):
+        self.client.force_login(make_staff())
+        data = self.client.get(reverse('staff_kpis_api')).json()
+        self.assertEqual(data['todays_revenue'], '0.00')
+        self.assertEqual(data['pending_approvals'], 0)
+
+
+class RevenueRollupTests(TestCase):
+    """Daily_Revenue_Rollup follows every ledger write and can be rebuilt."""
+
+    def _snapshot(self):
+        return sorted(
+            Daily_Revenue_Rollup.objects.values_list('date', 'transaction_type', 'total_amount', 'record_count')
+        )
+
+    def test_rollup_tracks_create_edit_and_delete(self):
+        member = make_member(1)
+        now = timezone.now()
+        fee = Billing_Record.objects.create(member=member, transaction_type='FEE', amount=Decimal('2000.00'))
+        Billing_Record.objects.create(member=member, transaction_type='PAYMENT', amount=Decimal('-500.00'))
+        Billing_Record.objects.create(member=member, transaction_type='PAYMENT', amount=Decimal('-250.00'))
+
+        payments = Daily_Revenue_Rollup.objects.get(date=timezone.localdate(now), transaction_type='PAYMENT')
+        self.assertEqual(payments.total_amount, Decimal('-750.00'))
+        self.assertEqual(payments.record_count, 2)
+
+        fee.timestamp = now - timedelta(days=3)
+        fee.save()
+        fee_rows = dict(Daily_Revenue_Rollup.objects.filter(transaction_type='FEE').values_list('date', 'record_count'))
+        self.assertEqual(fee_rows[timezone.localdate(now)], 0)
+        self.assertEqual(fee_rows[timezone.localdate(fee.timestamp)], 1)
+
+        fee.delete()
+        self.assertFalse(Daily_Revenue_Rollup.objects.filter(transaction_type='FEE', record_count__gt=0).exists())
+
+    def test_plain_save_moves_an_edited_amount(self):
+        record = Billing_Record.objects.create(member=make_member(1), transaction_type='PAYMENT',
+                                               amount=Decimal('-100.00'))
+        record.amount = Decimal('-250.00')
+        record.save()
+        payments = Daily_Revenue_Rollup.objects.get(date=timezone.localdate(record.timestamp), transaction_type='PAYMENT')
+        self.assertEqual((payments.total_amount, payments.record_count), (Decimal('-250.00'), 1))
+
+        before = self._snapshot()
+        call_command('rebuild_revenue_rollup', stdout=StringIO())
+        self.assertEqual(self._snapshot(), before)
+
+    def test_updates_of_other_columns_skip_the_lookup(self):
+        record = Billing_Record.objects.create(member=make_member(1), transaction_type='PAYMENT',
+                                               amount=Decimal('-500.00'))
+        before = self._snapshot()
+        record.staff_processor = None
+        with CaptureQueriesContext(connection) as ctx:
+            record.save(update_fields=['staff_processor'])
+        self.assertEqual(len(ctx.captured_queries), 1)  # Just the UPDATE
+        self.assertEqual(self._snapshot(), before)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        member = make_member(1)
+        now = timezone.now()
+        for days_ago in (0, 0, 1, 40):
+            Billing_Record.objects.create(member=member, transaction_type='PAYMENT', amount=Decimal('-100.25'),
+                                          timestamp=now - timedelta(days=days_ago))
+        Billing_Record.objects.create(member=member, transaction_type='FEE', amount=Decimal('2000.00'))
+        incremental = self._snapshot()
+
+        Daily_Revenue_Rollup.objects.all().delete()
+        call_command('rebuild_revenue_rollup', stdout=StringIO())
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_payment_view_updates_rollup(self):
+        staff = make_staff()
+        member = make_member(1, balance=Decimal('1000.00'))
+        self.client.force_login(staff)
+        response = self.client.post(
+            reverse('log_payment_view'),
+            data={'member_id': member.pk, 'amount': '400.00'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['status'], 'success')
+        self.assertEqual(dashboard_kpis()['todays_revenue'], Decimal('400.00'))
+
+
+class RevenueChartApiTests(TestCase):
+    """Revenue chart buckets come from the rollup, with gaps filled server-side."""
+
+    def setUp(self):
+        self.client.force_login(make_staff())
+        self.url = reverse('revenue_chart_data')
+        member = make_member(1)
+        for day, amount in (('2023-12-31', '-100.10'), ('2024-01-01', '-200.20'),
+                            ('2024-01-03', '-0.01'), ('2024-03-15', '-50.00')):
+            local_noon = timezone.make_aware(datetime.fromisoformat(f'{day} 12:00'))
+            Billing_Record.objects.create(member=member, transaction_type='PAYMENT',
+                                          amount=Decimal(amount), timestamp=local_noon)
+
+    def test_daily_buckets_fill_gaps(self):
+        data = self.client.get(self.url, {'start': '2023-12-31', 'end': '2024-01-04', 'granularity': 'day'}).json()
+        self.assertEqual(data['data'], ['100.10', '200.20', '0.00', '0.01', '0.00'])
+        self.assertEqual(data['labels'][0], 'Dec 31, 2023')
+        self.assertEqual(data['total'], '300.31')
+
+    def test_weekly_and_monthly_buckets(self):
+        weekly = self.client.get(self.url, {'start': '2024-01-01', 'end': '2024-01-14', 'granularity': 'week'}).json()
+        self.assertEqual(weekly['buckets'], ['2024-01-01', '2024-01-08'])
+        self.assertEqual(weekly['data'], ['200.21', '0.00'])
+
+        monthly = self.client.get(self.url, {'start': '2023-12-01', 'end': '2024-03-31', 'granularity': 'month'}).json()
+        self.assertEqual(monthly['labels'], ['Dec 2023', 'Jan 2024', 'Feb 2024', 'Mar 2024'])
+        self.assertEqual(monthly['data'], ['100.10', '200.21', '0.00', '50.00'])
+
+    def test_query_count_does_not_depend_on_range(self):
+        with CaptureQueriesContext(connection) as short:
+            self.client.get(self.url, {'start': '2024-01-01', 'end': '2024-01-31', 'granularity': 'day'})
+        with CaptureQueriesContext(connection) as long:
+            self.client.get(self.url, {'start': '2015-01-01', 'end': '2024-12-31', 'granularity': 'month'})
+        self.assertEqual(len(short.captured_queries), len(long.captured_queries))
+
+    def test_legacy_filters_and_bad_input(self):
+        self.assertEqual(len(self.client.get(self.url, {'filter': 'monthly'}).json()['data']), 12)
+        self.assertEqual(self.client.get(self.url, {'start': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'granularity': 'hour'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '1990-01-01', 'end': '2024-01-01'}).status_code, 400)
+
+
+class NotificationFanOutTests(TestCase):
+    """Each event is one broadcast Notification row; read state is per staff member."""
+
+    def _registration_queries(self, index):
+        user = CustomUser.objects.create_user(
+            email=f'fanout{index}@example.com', password='MemberPass123', first_name='Fan', last_name='Out',
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            user.gym_member._is_reapplication = True
+            user.gym_member.save()
+        return ctx.captured_queries
+
+    def test_fan_out_cost_is_constant(self):
+        make_staff('staff0@example.com')
+        small = self._registration_queries(1)
+        for i in range(1, 30):
+            make_staff(f'staff{i}@example.com')
+        large = self._registration_queries(2)
+
+        self.assertEqual(len(small), len(large))
+        inserts = [q for q in large if q['sql'].startswith('INSERT') and 'gymapp_notification' in q['sql']]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Notification.objects.filter(message__startswith='Fan Out has re-applied').count(), 2)
+
+    def test_read_receipts_are_per_staff(self):
+        first, second = make_staff('staff0@example.com'), make_staff('staff1@example.com')
+        member = make_member(1)
+        Account_Request.objects.create(member=member, request_type='FREEZE', status='PENDING')
+        notification = Notification.objects.get(notification_type='NEW_REQUEST')
+        self.assertEqual(notification.message, 'New Freeze Account request from Member1 Test.')
+
+        self.client.force_login(first)
+        url = reverse('mark_notification_read', args=[notification.notification_id])
+        self.client.get(url)
+        self.client.get(url)  # Opening it twice leaves one receipt
+        self.assertEqual(notification.read_receipts.count(), 1)
+
+        def feed_for(user):
+            self.client.force_login(user)
+            return {n['id']: n['is_read'] for n in self.client.get(reverse('fetch_notifications_api')).json()['notifications']}
+
+        self.assertTrue(feed_for(first)[notification.notification_id])
+        self.assertFalse(feed_for(second)[notification.notification_id])
+
+    def test_staff_do_not_see_events_from_before_they_joined(self):
+        make_member(1)
+        late_staff = make_staff('late@example.com')
+        self.client.force_login(late_staff)
+        self.assertEqual(self.client.get(reverse('fetch_notifications_api')).json()['notifications'], [])
+
+
+class NotificationStreamTests(TestCase):
+    """Committed notifications are pushed to open SSE streams."""
+
+    async def test_stream_pushes_committed_notification(self):
+        staff = await sync_to_async(make_staff)()
+        await self.async_client.aforce_login(staff)
+        response = await self.async_client.get(reverse('staff_notification_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        def register():
+            with self.captureOnCommitCallbacks(execute=True):
+                CustomUser.objects.create_user(email='live@example.com', password='MemberPass123',
+                                               first_name='Live', last_name='Member')
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)  # Let the stream start waiting on its queue
+        await sync_to_async(register)()
+        chunk = (await asyncio.wait_for(pending, timeout=5)).decode()
+        await stream.aclose()
+
+        self.assertTrue(chunk.startswith('event: notification\n'))
+        payload = json.loads(chunk.split('data: ', 1)[1])
+        self.assertEqual(payload['message'], 'Live Member has registered. Pending activation.')
+        self.assertFalse(payload['is_read'])
+
+    def test_wsgi_requests_fall_back_to_polling(self):
+        self.client.force_login(make_staff())
+        self.assertEqual(self.client.get(reverse('staff_notification_stream')).status_code, 204)
+
+    @skipUnless(connection.vendor == 'postgresql', 'LISTEN/NOTIFY is PostgreSQL only.')
+    def test_listener_uses_the_configured_driver(self):
+        listener = events._listen_connection()
+        sender = events._listen_connection()  # Autocommit, so the NOTIFY is delivered at once
+        try:
+            self.assertEqual(type(listener).__module__.split('.')[0], connection.Database.__name__.split('.')[0])
+            with sender.cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', [events.CHANNEL, '{"id": 7}'])
+            self.assertEqual(json.loads(next(events._payloads(listener))), {'id': 7})
+        finally:
+            listener.close()
+            sender.close()
+
+    @skipUnless(connection.vendor == 'postgresql', 'LISTEN/NOTIFY is PostgreSQL only.')
+    def test_listener_closes_a_lost_connection(self):
+        class Stop(BaseException):
+            pass
+
+        opened = []
+
+        def lose_connection(conn):
+            opened.append(conn)
+            raise Stop  # Not an Exception, so the retry loop ends here
+            yield
+
+        self.addCleanup(setattr, events, '_payloads', events._payloads)
+        events._payloads = lose_connection
+        with self.assertRaises(Stop):
+            events._listen_forever()
+        self.assertTrue(opened[0].closed)
+
+
+class ConditionalGetTests(TestCase):
+    """Polled JSON endpoints answer If-None-Match with 304 until their data changes."""
+
+    def test_notifications_etag(self):
+        staff = make_staff()
+        self.client.force_login(staff)
+        url = reverse('fetch_notifications_api')
+        first = self.client.get(url)
+        etag = first['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertFalse(any('read_receipts' in q['sql'] or 'EXISTS' in q['sql'] for q in ctx.captured_queries))
+
+        make_member(1)  # Raises a registration notification
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_schedule_etag_changes_on_edit_and_delete(self):
+        self.client.force_login(make_staff())
+        url = reverse('staff_schedule_data')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.client.post(reverse('staff_schedule_add'), data={
+            'class_name': 'Yoga', 'instructor_name': 'Ana', 'day_of_week': 1,
+            'start_time': '08:00', 'end_time': '09:00',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()['classes']), 1)
+
+        self.client.delete(reverse('staff_schedule_delete', args=[response.json()['class_id']]))
+        self.assertNotEqual(self.client.get(url)['ETag'], changed['ETag'])
+
+
+class UnreadCounterTests(TestCase):
+    """GymStaff.unread_notifications follows new notifications and read actions."""
+
+    def setUp(self):
+        self.staff = make_staff()
+        self.client.force_login(self.staff)
+
+    def _unread(self):
+        return GymStaff.objects.get(pk=self.staff.pk).unread_notifications
+
+    def test_counter_tracks_reads(self):
+        member = make_member(1)
+        Account_Request.objects.create(member=member, request_type='FREEZE', status='PENDING')
+        self.assertEqual(self._unread(), 2)
+
+        notification = Notification.objects.get(notification_type='NEW_REQUEST')
+        url = reverse('mark_notification_read', args=[notification.notification_id])
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(self._unread(), 1)
+        self.assertEqual(self.client.get(reverse('fetch_notifications_api')).json()['unread_count'], 1)
+
+    def test_mark_all_read_by_type_and_overall(self):
+        for i in range(3):
+            make_member(i)
+        Account_Request.objects.create(member=make_member(9), request_type='FREEZE', status='PENDING')
+        self.assertEqual(self._unread(), 5)
+        url = reverse('mark_all_notifications_read')
+
+        data = self.client.post(url, {'type': 'NEW_REGISTRATION'}, content_type='application/json').json()
+        self.assertEqual((data['marked'], data['unread_count']), (4, 1))
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.post(url, {}, content_type='application/json').json()
+        self.assertEqual((data['marked'], data['unread_count']), (1, 0))
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]), 1)
+
+        feed = self.client.get(reverse('fetch_notifications_api')).json()['notifications']
+        self.assertTrue(all(item['is_read'] for item in feed))
+        self.assertEqual(recount_unread(GymStaff.objects.get(pk=self.staff.pk)), 0)
+
+        make_member(20)  # Arrives after "mark all": unread again
+        self.assertEqual(self._unread(), 1)
+
+    def test_stale_copies_do_not_decrement_twice(self):
+        for i in range(3):
+            make_member(i)
+        Account_Request.objects.create(member=make_member(9), request_type='FREEZE', status='PENDING')
+        first_tab, second_tab = (GymStaff.objects.get(pk=self.staff.pk) for _ in range(2))
+
+        self.assertEqual(mark_all_read(first_tab, 'NEW_REGISTRATION'), 4)
+        self.assertEqual(mark_all_read(second_tab, 'NEW_REGISTRATION'), 0)
+        self.assertEqual(self._unread(), 1)
+
+        mark_all_read(first_tab)
+        request = Notification.objects.get(notification_type='NEW_REQUEST')
+        self.assertFalse(mark_read(request, second_tab))  # Its copy predates the watermark
+        self.assertEqual(self._unread(), 0)
+        self.assertEqual(recount_unread(GymStaff.objects.get(pk=self.staff.pk)), 0)
+
+    def test_recount_uses_the_stored_watermark(self):
+        for i in range(3):
+            make_member(i)
+        stale_copy = GymStaff.objects.get(pk=self.staff.pk)
+        mark_all_read(GymStaff.objects.get(pk=self.staff.pk))
+        make_member(20)
+        self.assertEqual(recount_unread(stale_copy), 1)
+        self.assertEqual(self._unread(), 1)
+
+    def test_mark_all_rejects_non_object_json(self):
+        url = reverse('mark_all_notifications_read')
+        for body in ('[]', '"x"', '1', '{"type": 5}'):
+            response = self.client.post(url, body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+
+class NotificationRetentionTests(TestCase):
+    """prune_notifications merges old bursts into digests and archives old rows."""
+
+    def setUp(self):
+        self.reader = GymStaff.objects.get(pk=make_staff('reader@example.com').pk)
+        self.other = GymStaff.objects.get(pk=make_staff('other@example.com').pk)
+        # Staff accounts predate the seeded notifications
+        CustomUser.objects.filter(is_staff=True).update(date_joined=timezone.now() - timedelta(days=400))
+
+    def _seed(self, count, days_ago, notification_type='NEW_REGISTRATION'):
+        when = timezone.now() - timedelta(days=days_ago)
+        return [
+            Notification.objects.create(message=f'{notification_type} {i}', notification_type=notification_type,
+                                        timestamp=when + timedelta(seconds=i), redirect_url='/staff/?filter=pending')
+            for i in range(count)
+        ]
+
+    def _prune(self, *args):
+        call_command('prune_notifications', '--batch-size', '3', *args, stdout=StringIO())
+
+    def test_bursts_become_digests(self):
+        burst = self._seed(7, days_ago=2)
+        self._seed(2, days_ago=2, notification_type='NEW_REQUEST')  # Too few to merge
+        fresh = self._seed(6, days_ago=0)
+        for notification in burst:
+            Notification_Read.objects.create(notification=notification, staff=self.reader)
+
+        self._prune()
+
+        digest = Notification.objects.get(digest_count__isnull=False)
+        self.assertEqual(digest.digest_count, 7)
+        self.assertTrue(digest.message.startswith('7 new member registrations on'))
+        self.assertEqual(digest.redirect_url, '/staff/?filter=pending')
+        self.assertEqual(list(digest.read_receipts.values_list('staff_id', flat=True)), [self.reader.pk])
+        self.assertEqual(Notification_Archive.objects.count(), 7)
+        self.assertEqual(Notification.objects.filter(notification_type='NEW_REQUEST').count(), 2)
+        self.assertTrue(Notification.objects.filter(pk=fresh[0].pk).exists())
+
+        self.reader.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.reader.unread_notifications, 2 + 6)
+        self.assertEqual(self.other.unread_notifications, 1 + 2 + 6)
+
+    def test_archives_read_and_stale_notifications(self):
+        read_by_all, read_by_one = self._seed(2, days_ago=40, notification_type='NEW_REQUEST')
+        stale = self._seed(1, days_ago=200, notification_type='NEW_REQUEST')[0]
+        for staff in (self.reader, self.other):
+            Notification_Read.objects.create(notification=read_by_all, staff=staff)
+        Notification_Read.objects.create(notification=read_by_one, staff=self.reader)
+
+        self._prune('--no-coalesce')
+
+        self.assertEqual(list(Notification.objects.values_list('pk', flat=True)), [read_by_one.pk])
+        self.assertEqual(sorted(Notification_Archive.objects.values_list('notification_id', flat=True)),
+                         sorted([read_by_all.pk, stale.pk]))
+        self.assertFalse(Notification_Read.objects.filter(notification_id=read_by_all.pk).exists())
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.unread_notifications, 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN plans are checked on PostgreSQL only.')
+class QueryPlanTests(TestCase):
+    """
+    Hot queries must be able to use an index. Sequential scans are
+    switched off for the session, so a plan that still shows
+    "Seq Scan" on the queried table means no usable index exists.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        staff = make_staff()
+        cls.staff = GymStaff.objects.get(pk=staff.pk)
+        seed_roster(40)
+        cls.member = make_member(100, is_frozen=True)
+        now = timezone.now()
+        Billing_Record.objects.bulk_create([
+            Billing_Record(member=cls.member, transaction_type='PAYMENT', amount=Decimal('-10.00'),
+                           timestamp=now - timedelta(days=i))
+            for i in range(200)
+        ])
+        Activity_Log.objects.bulk_create([
+            Activity_Log(member=cls.member, activity_date=now.date() - timedelta(days=i), duration_minutes=60)
+            for i in range(200)
+        ])
+        Account_Request.objects.create(member=cls.member, request_type='UNFREEZE', status='PENDING')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, table, ordered=False):
+        """`ordered`: the index must also deliver the ORDER BY (no Sort node)."""
+        plan = queryset.explain()
+        self.assertNotIn(f'Seq Scan on {table}', plan, f'Sequential scan on {table}:\n{plan}')
+        if ordered:
+            self.assertNotIn('Sort', plan, f'Ordering on {table} is not served by an index:\n{plan}')
+
+    def test_member_queries(self):
+        today = timezone.localdate()
+        self.assertUsesIndex(roster.pending_members(), 'gymapp_gym_member')
+        self.assertUsesIndex(gym_Member.objects.filter(is_frozen=True), 'gymapp_gym_member')
+        self.assertUsesIndex(gym_Member.objects.filter(next_due_date__lt=today), 'gymapp_gym_member')
+        self.assertUsesIndex(gym_Member.objects.filter(membership_id__startswith='CFH-2025-'), 'gymapp_gym_member')
+
+    def test_request_queries(self):
+        # The SQL the KPI header actually runs, not a look-alike queryset
+        with CaptureQueriesContext(connection) as ctx:
+            member_kpis(timezone.localdate())
+        pending = [q['sql'] for q in ctx.captured_queries if 'gymapp_account_request' in q['sql']]
+        self.assertEqual(len(pending), 1)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {pending[0]}')
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn('acct_req_pending_idx', plan)
+        self.assertUsesIndex(
+            Account_Request.objects.filter(member=self.member, status='APPROVED', request_type='FREEZE'),
+            'gymapp_account_request',
+        )
+
+    def test_ledger_and_visit_queries(self):
+        self.assertUsesIndex(Billing_Record.objects.filter(transaction_type='PAYMENT').order_by('-timestamp')[:10],
+                             'gymapp_billing_record', ordered=True)
+        self.assertUsesIndex(Billing_Record.objects.filter(member=self.member).order_by('-timestamp'),
+                             'gymapp_billing_record', ordered=True)
+        self.assertUsesIndex(Check_In.objects.filter(member=self.member).order_by('-check_in_time')[:1],
+                             'gymapp_check_in', ordered=True)
+        self.assertUsesIndex(Activity_Log.objects.filter(member=self.member, activity_date__gte=timezone.localdate()),
+                             'gymapp_activity_log')
+
+    def test_notification_feed(self):
+        self.assertUsesIndex(staff_feed(self.staff), 'gymapp_notification', ordered=True)
+
+    def test_open_visits(self):
+        with connection.cursor() as cursor:
+            # A few dozen open rows are cheapest to sort; ask whether an index can deliver the order
+            cursor.execute('SET enable_sort = off')
+        open_visits = Check_In.objects.filter(check_out_time__isnull=True)
+        self.assertUsesIndex(open_visits.order_by('check_in_time', 'pk')[:25], 'gymapp_check_in', ordered=True)
+        self.assertIn('checkin_open_idx', open_visits.order_by('check_in_time', 'pk')[:25].explain())
+
+
+@override_settings(METRICS_ENABLED=True)
+class ViewQueryBudgetTests(TestCase):
+    """
+    Every URL in gymapp/urls.py, requested by the role that uses it, runs
+    in at most its query budget and in the same number of queries with 8
+    members as with 48. Wall-clock timings are collected per request;
+    set VIEW_TIMINGS_FILE to a path to have them written out as JSON.
+    Metrics are on, so their middleware is shown not to add queries.
+    """
+    SMALL, LARGE = 8, 40
+    timings = []
+
+    # (url name, method, query budget). `_case_<url name>` (or
+    # `_case_<url name>_post` for a POST next to a GET) returns
+    # (user, url, payload) for one fresh request.
+    CASES = [
+        ('landing', 'get', 0),
+        ('register_submission', 'get', 0),
+        ('member_login', 'get', 0),
+        ('logout', 'get', 4),
+        ('member_dashboard', 'get', 8),
+        ('account_settings', 'get', 5),
+        ('account_settings', 'post', 8),
+        ('member_details', 'get', 2),
+        ('member_details', 'post', 5),
+        ('check_in', 'get', 4),
+        ('billing_history', 'get', 4),
+        ('member_schedule', 'get', 2),
+        ('class_schedule', 'get', 2),
+        ('member_schedule_data', 'get', 4),
+        ('staff_dashboard', 'get', 9),
+        ('staff_schedule', 'get', 2),
+        ('staff_schedule_data', 'get', 4),
+        ('staff_schedule_add', 'post', 4),
+        ('staff_schedule_delete', 'delete', 4),
+        ('check_in_out_view', 'post', 7),
+        ('staff_settings', 'get', 2),
+        ('staff_settings', 'post', 3),
+        ('log_payment_view', 'post', 9),
+        ('manual_freeze_view', 'post', 8),
+        ('process_request_view', 'post', 9),
+        ('activate_member_view', 'post', 15),
+        ('deactivate_member_view', 'post', 9),
+        ('reactivate_member_view', 'post', 15),
+        ('manual_unfreeze_view', 'post', 8),
+        ('edit_member_view', 'post', 6),
+        ('revenue_chart_data', 'get', 3),
+        ('mark_notification_read', 'get', 11),
+        ('fetch_notifications_api', 'get', 5),
+        ('staff_notification_stream', 'get', 2),
+        ('mark_all_notifications_read', 'post', 6),
+        ('reject_member_view', 'post', 4),
+        ('staff_member_list_api', 'get', 3),
+        ('staff_kpis_api', 'get', 5),
+        ('staff_in_gym_api', 'get', 4),
+        ('request_profiles', 'get', 2),
+        ('metrics', 'get', 3),
+        ('health_live', 'get', 0),
+        ('health_ready', 'get', 8),  # SELECT 1 wrapped in a savepoint with its statement_timeout set and restored
+    ]
+
+    @classmethod
+    def tearDownClass(cls):
+        path = os.environ.get('VIEW_TIMINGS_FILE')
+        if path and cls.timings:
+            with open(path, 'w') as handle:
+                json.dump(cls.timings, handle, indent=2)
+        super().tearDownClass()
+
+    def setUp(self):
+        OCCUPANCY_TRACKER.objects.create(pk=1)
+        self.staff = make_staff()
+        self.member = make_member(900, balance=Decimal('1500.00'))
+        self.next_index = 1000
+        self.member_history(self.member, 3)
+        # Today's rollup rows exist, so both runs take the same UPDATE path
+        Billing_Record.objects.create(member=self.member, transaction_type='FEE', amount=Decimal('1.00'))
+        Billing_Record.objects.create(member=self.member, transaction_type='PAYMENT', amount=Decimal('-1.00'))
+
+    def fresh_member(self, **fields):
+        self.next_index += 1
+        return make_member(self.next_index, **fields)
+
+    def member_history(self, member, visits):
+        """Adds closed visits, payments and an old request to `member`."""
+        now = timezone.now()
+        staff = self.staff.gym_staff
+        for day in range(1, visits + 1):
+            Check_In.objects.create(member=member, check_in_time=now - timedelta(days=day, hours=1),
+                                    check_out_time=now - timedelta(days=day))
+            Billing_Record.objects.create(member=member, staff_processor=staff, transaction_type='PAYMENT',
+                                          amount=Decimal('-100.00'), timestamp=now - timedelta(days=day))
+        Account_Request.objects.create(member=member, request_type='FREEZE', reason='Travelling abroad.',
+                                       status='REJECTED', request_date=now - timedelta(days=visits))
+        for day in range(1, 4):
+            ClassSchedule.objects.create(class_name=f'Class {member.pk}-{day}', instructor_name='Coach',
+                                         day_of_week=day, start_time='08:00', end_time='09:00')
+
+    # --- Cases: each returns (user to log in or None, url, payload) ---
+
+    def _case_landing(self):
+        return None, reverse('landing'), None
+
+    def _case_register_submission(self):
+        return None, reverse('register_submission'), None
+
+    def _case_member_login(self):
+        return None, reverse('member_login'), None
+
+    def _case_logout(self):
+        return self.member.user, reverse('logout'), None
+
+    def _member_page(self, name):
+        return self.member.user, reverse(name), None
+
+    def _case_member_dashboard(self):
+        return self._member_page('member_dashboard')
+
+    def _case_account_settings(self):
+        return self._member_page('account_settings')
+
+    def _case_account_settings_post(self):
+        member = self.fresh_member()
+        return member.user, reverse('account_settings'), {
+            'request_freeze': '1', 'freeze-duration': '3', 'freeze-reason': 'Out of town for a week.',
+        }
+
+    def _case_member_details(self):
+        return self._member_page('member_details')
+
+    def _case_member_details_post(self):
+        return self.member.user, reverse('member_details'), {'contact_number': '09171234567'}
+
+    def _case_check_in(self):
+        return self._member_page('check_in')
+
+    def _case_billing_history(self):
+        return self._member_page('billing_history')
+
+    def _case_member_schedule(self):
+        return self._member_page('member_schedule')
+
+    def _case_class_schedule(self):
+        return self._member_page('class_schedule')
+
+    def _case_member_schedule_data(self):
+        return self._member_page('member_schedule_data')
+
+    def _staff_get(self, name, *args):
+        return self.staff, reverse(name, args=args), None
+
+    def _case_staff_dashboard(self):
+        return self._staff_get('staff_dashboard')
+
+    def _case_staff_schedule(self):
+        return self._staff_get('staff_schedule')
+
+    def _case_staff_schedule_data(self):
+        return self._staff_get('staff_schedule_data')
+
+    def _case_staff_schedule_add(self):
+        hour = 10 + ClassSchedule.objects.filter(class_name='Spin').count()  # Next free slot
+        return self.staff, reverse('staff_schedule_add'), {
+            'class_name': 'Spin', 'instructor_name': 'Ana', 'day_of_week': 7,
+            'start_time': f'{hour:02d}:00', 'end_time': f'{hour:02d}:30',
+        }
+
+    def _case_staff_schedule_delete(self):
+        gym_class = ClassSchedule.objects.create(class_name='Pilates', instructor_name='Ana', day_of_week=6,
+                                                 start_time='10:00', end_time='11:00')
+        return self.staff, reverse('staff_schedule_delete', args=[gym_class.pk]), None
+
+    def _case_check_in_out_view(self):
+        member = self.fresh_member()
+        return self.staff, reverse('check_in_out_view'), {'member_id': member.user.pk, 'action': 'checkin'}
+
+    def _case_staff_settings(self):
+        return self._staff_get('staff_settings')
+
+    def _case_staff_settings_post(self):
+        return self.staff, reverse('staff_settings'), {
+            'contact_number': '09171234567', 'default_fee': '1500.00', 'gym_capacity': 60,
+            'peak_start': '17:00', 'peak_end': '20:00',
+        }
+
+    def _case_log_payment_view(self):
+        member = self.fresh_member(balance=Decimal('1500.00'))
+        return self.staff, reverse('log_payment_view'), {'member_id': member.user.pk, 'amount': '500.00'}
+
+    def _case_manual_freeze_view(self):
+        member = self.fresh_member()
+        return self.staff, reverse('manual_freeze_view'), {'member_id': member.user.pk, 'reason': 'Injury.'}
+
+    def _case_process_request_view(self):
+        member = self.fresh_member()
+        request = Account_Request.objects.create(member=member, request_type='FREEZE', reason='Exams.', days_requested=3)
+        return self.staff, reverse('process_request_view'), {
+            'request_id': request.pk, 'action': 'approve', 'staff_reason': 'OK',
+        }
+
+    def _pending_member(self):
+        member = self.fresh_member(activation_status='pending')
+        member.user.is_active = False
+        member.user.save()
+        return member
+
+    def _case_activate_member_view(self):
+        member = self._pending_member()
+        return self.staff, reverse('activate_member_view'), {
+            'member_id': member.user.pk, 'amount': '1500.00', 'description': 'Initial Payment',
+        }
+
+    def _case_deactivate_member_view(self):
+        member = self.fresh_member()
+        return self.staff, reverse('deactivate_member_view'), {'member_id': member.user.pk}
+
+    def _case_reactivate_member_view(self):
+        member = self.fresh_member(next_due_date=timezone.now().date() - timedelta(days=5))
+        return self.staff, reverse('reactivate_member_view'), {'member_id': member.user.pk, 'amount': '1500.00'}
+
+    def _case_manual_unfreeze_view(self):
+        member = self.fresh_member(is_frozen=True, days_remaining_on_freeze=10)
+        return self.staff, reverse('manual_unfreeze_view'), {'member_id': member.user.pk}
+
+    def _case_edit_member_view(self):
+        member = self.fresh_member()
+        return self.staff, reverse('edit_member_view'), {'member_id': member.user.pk, 'first_name': 'Edited'}
+
+    def _case_revenue_chart_data(self):
+        return self.staff, reverse('revenue_chart_data'), {'granularity': 'week'}
+
+    def _case_mark_notification_read(self):
+        notification = Notification.objects.create(notification_type='SYSTEM', message='Budget test')
+        return self._staff_get('mark_notification_read', notification.pk)
+
+    def _case_fetch_notifications_api(self):
+        return self._staff_get('fetch_notifications_api')
+
+    def _case_staff_notification_stream(self):
+        return self._staff_get('staff_notification_stream')
+
+    def _case_mark_all_notifications_read(self):
+        return self.staff, reverse('mark_all_notifications_read'), {}
+
+    def _case_reject_member_view(self):
+        member = self._pending_member()
+        return self.staff, reverse('reject_member_view'), {'member_id': member.user.pk}
+
+    def _case_staff_member_list_api(self):
+        return self._staff_get('staff_member_list_api', 'active')
+
+    def _case_staff_kpis_api(self):
+        return self._staff_get('staff_kpis_api')
+
+    def _case_request_profiles(self):
+        return self._staff_get('request_profiles')
+
+    def _case_staff_in_gym_api(self):
+        return self._staff_get('staff_in_gym_api')
+
+    def _case_metrics(self):
+        return None, reverse('metrics'), None
+
+    def _case_health_live(self):
+        return None, reverse('health_live'), None
+
+    def _case_health_ready(self):
+        health.clear()  # Measure a full round of checks, not the cached result
+        return None, reverse('health_ready'), None
+
+    # --- Runner ---
+
+    def _request(self, name, method, scale):
+        case = getattr(self, f'_case_{name}_{method}', None) or getattr(self, f'_case_{name}')
+        user, url, payload = case()
+
+        self.client.logout()
+        if user is not None:
+            self.client.force_login(user)
+
+        if method == 'get':
+            call = lambda: self.client.get(url, payload)
+        elif name in ('account_settings', 'member_details'):
+            call = lambda: self.client.post(url, payload)
+        else:
+            call = lambda: getattr(self.client, method)(url, data=payload, content_type='application/json')
+
+        get_gym_settings()  # Budgets are for a warm settings cache
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = call()
+            elapsed = (time.perf_counter() - started) * 1000
+
+        self.assertLess(response.status_code, 400, f'{method.upper()} {url}')
+        if response.get('Content-Type', '').startswith('application/json'):
+            self.assertNotEqual(response.json().get('status'), 'error', f'{method.upper()} {url}: {response.json()}')
+        self.timings.append({
+            'url': name, 'method': method, 'members': scale,
+            'queries': len(ctx.captured_queries), 'ms': round(elapsed, 2),
+        })
+        return len(ctx.captured_queries)
+
+    def test_every_url_is_covered(self):
+        from .urls import urlpatterns
+        covered = {name for name, _, _ in self.CASES}
+        self.assertEqual({pattern.name for pattern in urlpatterns} - covered, set())
+
+    def test_query_budgets(self):
+        seed_roster(self.SMALL)
+        small = {(name, method): self._request(name, method, self.SMALL) for name, method, _ in self.CASES}
+
+        seed_roster(self.LARGE, start=self.SMALL)
+        self.member_history(self.member, 30)
+        large = {(name, method): self._request(name, method, self.SMALL + self.LARGE) for name, method, _ in self.CASES}
+
+        for name, method, budget in self.CASES:
+            with self.subTest(url=name, method=method):
+                self.assertLessEqual(small[name, method], budget)
+                self.assertEqual(small[name, method], large[name, method])
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_DIR=None, METRICS_TOKEN=None)
+class MetricsTests(TestCase):
+    """/metrics exposes request, query and business metrics, summed over the workers' snapshots."""
+
+    def setUp(self):
+        OCCUPANCY_TRACKER.objects.create(pk=1, current_count=7, capacity_limit=80)
+        metrics.reset()
+        self.staff = make_staff()
+        self.member = make_member(1, balance=Decimal('500.00'))
+        Account_Request.objects.create(member=self.member, request_type='FREEZE', reason='Travelling abroad.')
+
+    def scrape(self, **headers):
+        response = self.client.get(reverse('metrics'), **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode().splitlines()
+
+    def test_request_and_business_metrics(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('staff_kpis_api'))
+        Check_In.objects.create(member=self.member)
+        Billing_Record.objects.create(member=self.member, transaction_type='PAYMENT', amount=Decimal('-250.50'))
+
+        lines = self.scrape()
+        self.assertIn('gymapp_http_requests_total{method="GET",status="200",view="staff_kpis_api"} 1', lines)
+        self.assertIn('gymapp_http_request_duration_seconds_bucket{view="staff_kpis_api",le="+Inf"} 1', lines)
+        self.assertIn('gymapp_http_request_duration_seconds_count{view="staff_kpis_api"} 1', lines)
+        self.assertTrue(any(line.startswith('gymapp_db_queries_total{view="staff_kpis_api"} ') for line in lines))
+        self.assertIn('gymapp_http_requests_in_flight 1', lines)  # The scrape itself
+        self.assertIn('gymapp_check_ins_total 1', lines)
+        self.assertIn('gymapp_payments_total 1', lines)
+        self.assertIn('gymapp_payment_amount_total 250.5', lines)
+        self.assertIn('gymapp_occupancy_current 1', lines)  # Open visits, not the row's 7
+        self.assertIn('gymapp_occupancy_capacity 80', lines)
+        self.assertIn('gymapp_pending_approvals 1', lines)
+        self.assertIn('# TYPE gymapp_http_request_duration_seconds histogram', lines)
+
+    def test_unmatched_requests_share_one_label(self):
+        self.client.get('/no-such-page/')
+        self.assertIn('gymapp_http_requests_total{method="GET",status="404",view="<unmatched>"} 1', self.scrape())
+
+    def test_snapshots_of_all_workers_are_summed(self):
+        directory = tempfile.mkdtemp()
+        series = [['gymapp_http_requests_total', [['method', 'GET'], ['status', 200], ['view', 'landing']], 3]]
+        histogram = [['gymapp_http_request_duration_seconds', [['view', 'landing']],
+                      [1, 2] + [0] * (len(metrics.BUCKETS) - 1) + [0.02]]]
+        exited = subprocess.Popen(['true'])
+        exited.wait()
+        workers = (
+            ('parent', os.getppid(), 'a1', 2),
+            ('exited', exited.pid, 'b2', 5),
+            ('recycled', os.getpid(), 'c3', 4),  # An earlier worker that had this process's pid
+        )
+        for _, pid, process_id, in_flight in workers:
+            with open(os.path.join(directory, f'metrics-{pid}-{process_id}.json'), 'w') as handle:
+                json.dump({'pid': pid, 'id': process_id, 'counters': series, 'histograms': histogram,
+                           'in_flight': in_flight}, handle)
+
+        with self.settings(METRICS_DIR=directory, METRICS_FLUSH_SECONDS=0):
+            lines = self.scrape()
+            self.assertEqual(
+                sorted(name for name in os.listdir(directory) if name.startswith('metrics-')),
+                sorted([f'metrics-{os.getppid()}-a1.json', f'metrics-{os.getpid()}-{metrics._process_id()}.json']),
+            )
+            self.assertTrue(os.path.exists(os.path.join(directory, metrics.EXITED_FILE)))
+            rescrape = self.scrape()
+
+        self.assertIn('gymapp_http_requests_total{method="GET",status="200",view="landing"} 9', lines)
+        self.assertIn('gymapp_http_request_duration_seconds_bucket{view="landing",le="0.005"} 3', lines)
+        self.assertIn('gymapp_http_request_duration_seconds_bucket{view="landing",le="0.01"} 9', lines)
+        self.assertIn('gymapp_http_request_duration_seconds_count{view="landing"} 9', lines)
+        self.assertIn('gymapp_http_requests_in_flight 3', lines)  # Exited workers' in-flight dropped
+        # Folded, not lost or counted twice
+        self.assertIn('gymapp_http_requests_total{method="GET",status="200",view="landing"} 9', rescrape)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.scrape(HTTP_AUTHORIZATION='Bearer s3cret')
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_off_by_default(self):
+        Check_In.objects.create(member=self.member)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        with self.settings(METRICS_ENABLED=True):
+            lines = self.scrape()
+        # Nothing was recorded while off: no check-in, no 404 request
+        self.assertFalse(any(line.startswith(('gymapp_check_ins_total ', 'gymapp_http_requests_total{')) for line in lines))
+
+
+class GymSettingsCacheTests(TestCase):
+    """The settings row is read once per version stamp, checked at most every few seconds; saves bump the stamp."""
+
+    def setUp(self):
+        OCCUPANCY_TRACKER.objects.create(pk=1, capacity_limit=80, default_monthly_fee=Decimal('1800.00'))
+        self.staff = make_staff()
+
+    def test_reads_after_the_first_are_free(self):
+        self.assertEqual(get_gym_settings().capacity_limit, 80)
+        with self.assertNumQueries(0):
+            settings = get_gym_settings()
+        self.assertEqual(settings.default_monthly_fee, Decimal('1800.00'))
+
+        settings.capacity_limit = 5  # Callers get a copy
+        self.assertEqual(get_gym_settings().capacity_limit, 80)
+
+    def test_settings_page_save_reaches_every_worker(self):
+        get_gym_settings()
+        self.client.force_login(self.staff)
+        response = self.client.post(reverse('staff_settings'), data={
+            'contact_number': '09170000000', 'default_fee': '2100.00', 'gym_capacity': 150,
+            'peak_start': '07:00', 'peak_end': '21:00',
+        }, content_type='application/json')
+        self.assertEqual(response.json()['status'], 'success')
+        with self.assertNumQueries(1):
+            self.assertEqual(get_gym_settings().capacity_limit, 150)
+
+        # Another worker saving bumps the shared stamp; this one reloads once its check is due
+        OCCUPANCY_TRACKER.objects.filter(pk=1).update(capacity_limit=200)
+        caches['shared'].set(gym_settings.VERSION_KEY, 'saved-by-another-worker', None)
+        self.assertEqual(get_gym_settings().capacity_limit, 150)
+        with self.settings(GYM_SETTINGS_CHECK_SECONDS=0):
+            self.assertEqual(get_gym_settings().capacity_limit, 200)
+
+    def test_admin_save_invalidates(self):
+        get_gym_settings()
+        tracker = OCCUPANCY_TRACKER.objects.get(pk=1)
+        tracker.member_id_prefix = 'GYM'
+        tracker.save()  # What the admin change form does
+        self.assertEqual(get_gym_settings().member_id_prefix, 'GYM')
+
+    def test_check_ins_keep_the_cache_and_count_live(self):
+        get_gym_settings()
+        member = make_member(1)
+        self.client.force_login(self.staff)
+        self.client.post(reverse('check_in_out_view'), data={'member_id': member.user.pk, 'action': 'checkin'},
+                         content_type='application/json')
+        with self.assertNumQueries(0):
+            get_gym_settings()
+        self.assertEqual(current_occupancy(), 1)
+
+    def test_settings_save_keeps_the_live_count(self):
+        get_gym_settings()
+        OCCUPANCY_TRACKER.objects.filter(pk=1).update(current_count=12)  # Check-ins since the row was cached
+        self.client.force_login(self.staff)
+        self.client.post(reverse('staff_settings'), data={
+            'contact_number': '', 'default_fee': '1800.00', 'gym_capacity': 80,
+            'peak_start': '08:00', 'peak_end': '20:00',
+        }, content_type='application/json')
+        self.assertEqual(OCCUPANCY_TRACKER.objects.get(pk=1).current_count, 12)
+
+
+def _add_to_counter(path, times):
+    counter = occupancy.SharedCounter(path)
+    for _ in range(times):
+        counter.add(1)
+    counter.close()
+
+
+@skipUnless(occupancy.fcntl is not None, 'The shared counter needs POSIX file locks.')
+class SharedOccupancyCounterTests(TestCase):
+    """With OCCUPANCY_COUNTER_FILE set, check-ins count in shared memory and reach the row behind it."""
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'occupancy')
+        settings = override_settings(OCCUPANCY_COUNTER_FILE=self.path, OCCUPANCY_FLUSH_SECONDS=3600)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(occupancy.close)
+        OCCUPANCY_TRACKER.objects.create(pk=1, current_count=50)  # Drifted from reality
+        self.staff = make_staff()
+        self.members = [make_member(i) for i in range(3)]
+        now = timezone.now()
+        for member in self.members[:2]:
+            Check_In.objects.create(member=member, check_in_time=now - timedelta(minutes=20))
+        Check_In.objects.create(member=self.members[2], check_in_time=now - timedelta(hours=2),
+                                check_out_time=now - timedelta(hours=1))
+
+    def post(self, member, action):
+        self.client.force_login(self.staff)
+        return self.client.post(reverse('check_in_out_view'), data={'member_id': member.user.pk, 'action': action},
+                                content_type='application/json')
+
+    def tracker_count(self):
+        return OCCUPANCY_TRACKER.objects.get(pk=1).current_count
+
+    def test_new_file_recovers_from_open_visits(self):
+        self.assertEqual(current_occupancy(), 2)
+        self.assertEqual(self.tracker_count(), 2)
+        with self.assertNumQueries(0):
+            current_occupancy()
+
+    def test_check_ins_write_behind(self):
+        current_occupancy()
+        with CaptureQueriesContext(connection) as ctx:
+            self.post(self.members[2], 'checkin')
+        self.assertFalse([q for q in ctx.captured_queries if 'occupancy_tracker' in q['sql'].lower()])
+        self.assertEqual(current_occupancy(), 3)
+        self.assertEqual(self.tracker_count(), 2)  # Not flushed yet
+
+        occupancy.flush(force=True)
+        self.assertEqual(self.tracker_count(), 3)
+
+        with self.settings(OCCUPANCY_FLUSH_SECONDS=0):
+            self.post(self.members[0], 'checkout')
+            self.assertEqual(self.tracker_count(), 2)
+
+    def test_never_below_zero(self):
+        Check_In.objects.update(check_out_time=timezone.now())
+        occupancy.recover()
+        occupancy.record_check_out()
+        self.assertEqual(current_occupancy(), 0)
+
+    def test_existing_file_is_reused_not_recounted(self):
+        current_occupancy()
+        occupancy.record_check_in()
+        occupancy.close()  # Another worker opening the same file
+        self.assertEqual(current_occupancy(), 3)
+
+    def test_increments_from_several_processes_are_atomic(self):
+        current_occupancy()
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_add_to_counter, args=(self.path, 250)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(current_occupancy(), 2 + 4 * 250)
+
+    def test_recover_command(self):
+        current_occupancy()
+        occupancy.record_check_in()
+        out = StringIO()
+        call_command('recover_occupancy', stdout=out)
+        self.assertIn('Occupancy reset to 2', out.getvalue())
+        self.assertEqual(current_occupancy(), 2)
+        self.assertEqual(self.tracker_count(), 2)
+
+
+class CheckInUniquenessTests(TestCase):
+    """A member has at most one open visit; repeated clicks change nothing."""
+
+    def setUp(self):
+        OCCUPANCY_TRACKER.objects.create(pk=1)
+        self.member = make_member(1)
+        self.client.force_login(make_staff())
+
+    def post(self, action):
+        return self.client.post(reverse('check_in_out_view'), data={'member_id': self.member.user.pk, 'action': action},
+                                content_type='application/json').json()
+
+    def test_repeated_check_in_is_idempotent(self):
+        self.assertEqual(self.post('checkin')['message'], 'Member checked in.')
+        repeat = self.post('checkin')
+        self.assertEqual(repeat, {'status': 'success', 'message': 'Member is already checked in.'})
+        self.assertEqual(Check_In.objects.filter(check_out_time__isnull=True).count(), 1)
+        self.assertEqual(OCCUPANCY_TRACKER.objects.get(pk=1).current_count, 1)
+
+    def test_repeated_check_out_closes_once(self):
+        self.post('checkin')
+        self.assertEqual(self.post('checkout')['status'], 'success')
+        self.assertEqual(self.post('checkout')['status'], 'error')
+        self.assertEqual(Activity_Log.objects.filter(member=self.member).count(), 1)
+        self.assertEqual(OCCUPANCY_TRACKER.objects.get(pk=1).current_count, 0)
+
+    def test_database_rejects_a_second_open_visit(self):
+        Check_In.objects.create(member=self.member)
+        Check_In.objects.create(member=self.member, check_out_time=timezone.now())  # Closed visits are unrestricted
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Check_In.objects.create(member=self.member)
+
+
+def _hammer(client, url, payloads, barrier, responses):
+    try:
+        barrier.wait()
+        for payload in payloads:
+            response = client.post(url, data=payload, content_type='application/json')
+            responses.append((response.status_code, response.json()['message']))
+    finally:
+        connections.close_all()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'In-memory SQLite cannot serve concurrent connections.')
+class ConcurrentCheckInTests(TransactionTestCase):
+    """Kiosks clicking at once, each request on its own connection, keep the count equal to the open visits."""
+
+    KIOSKS = 6
+    MEMBERS = 5
+
+    def setUp(self):
+        OCCUPANCY_TRACKER.objects.create(pk=1)
+        staff = make_staff()
+        self.members = [make_member(i) for i in range(self.MEMBERS)]
+        self.clients = []
+        for _ in range(self.KIOSKS):
+            client = Client()
+            client.force_login(staff)
+            self.clients.append(client)
+
+    def burst(self, action):
+        """Every kiosk sends `action` for every member, all starting together."""
+        url = reverse('check_in_out_view')
+        barrier = threading.Barrier(self.KIOSKS)
+        responses = []
+        threads = [
+            threading.Thread(target=_hammer, args=(client, url, [
+                {'member_id': member.user.pk, 'action': action} for member in self.members
+            ], barrier, responses))
+            for client in self.clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(responses), self.KIOSKS * self.MEMBERS)
+        self.assertEqual({status for status, _ in responses}, {200})
+        return [message for _, message in responses]
+
+    def open_visits(self):
+        return Check_In.objects.filter(check_out_time__isnull=True).count()
+
+    def assert_consistent(self, expected):
+        self.assertEqual(self.open_visits(), expected)
+        self.assertEqual(current_occupancy(), expected)
+        occupancy.flush(force=True)
+        self.assertEqual(OCCUPANCY_TRACKER.objects.get(pk=1).current_count, expected)
+
+    def run_day(self):
+        messages = self.burst('checkin')
+        self.assertEqual(messages.count('Member checked in.'), self.MEMBERS)
+        self.assert_consistent(self.MEMBERS)
+
+        messages = self.burst('checkout')
+        self.assertEqual(messages.count('Member checked out.'), self.MEMBERS)
+        self.assert_consistent(0)
+        self.assertEqual(Activity_Log.objects.count(), self.MEMBERS)
+
+    def test_database_counter(self):
+        self.run_day()
+
+    @skipUnless(occupancy.fcntl is not None, 'The shared counter needs POSIX file locks.')
+    def test_shared_counter(self):
+        path = os.path.join(tempfile.mkdtemp(), 'occupancy')
+        self.addCleanup(occupancy.close)
+        with self.settings(OCCUPANCY_COUNTER_FILE=path):
+            self.run_day()
+
+
+class StaleVisitSweeperTests(TestCase):
+    """close_stale_visits checks out forgotten visits in batches and keeps the count in step."""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.members = [make_member(i) for i in range(8)]
+        # Six forgotten visits (5-10 hours old), two members still training
+        for i, member in enumerate(self.members[:6]):
+            Check_In.objects.create(member=member, check_in_time=self.now - timedelta(hours=5 + i))
+        for member in self.members[6:]:
+            Check_In.objects.create(member=member, check_in_time=self.now - timedelta(minutes=45))
+        OCCUPANCY_TRACKER.objects.create(pk=1, current_count=8)
+
+    def sweep(self, **options):
+        out = StringIO()
+        call_command('close_stale_visits', stdout=out, **options)
+        return out.getvalue()
+
+    def test_closes_visits_past_the_cap(self):
+        output = self.sweep(max_hours=4)
+        self.assertIn('Closed 6 open visits; occupancy is now 2.', output)
+        self.assertEqual(OCCUPANCY_TRACKER.objects.get(pk=1).current_count, 2)
+        self.assertEqual(
+            set(Check_In.objects.filter(check_out_time__isnull=True).values_list('member', flat=True)),
+            {m.pk for m in self.members[6:]},
+        )
+        visit = Check_In.objects.get(member=self.members[3])
+        self.assertEqual(visit.check_out_time - visit.check_in_time, timedelta(hours=4))
+        self.assertEqual(list(Activity_Log.objects.values_list('duration_minutes', flat=True).distinct()), [240])
+        self.assertEqual(Activity_Log.objects.count(), 6)
+
+        self.assertIn('Closed 0 open visits', self.sweep(max_hours=4))
+
+    def test_each_batch_inserts_its_logs_at_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            occupancy.close_stale_visits(timedelta(hours=4), batch_size=2)
+        self.assertEqual(Activity_Log.objects.count(), 6)
+        inserts = [q for q in ctx.captured_queries if 'gymapp_activity_log' in q['sql']]
+        self.assertEqual(len(inserts), 3)  # One INSERT per batch of two
+
+    def test_closing_time_empties_the_gym(self):
+        self.sweep(all=True, max_hours=4, batch_size=3)
+        self.assertFalse(Check_In.objects.filter(check_out_time__isnull=True).exists())
+        self.assertEqual(OCCUPANCY_TRACKER.objects.get(pk=1).current_count, 0)
+        # Still training at closing: credited the time actually spent
+        recent = Check_In.objects.get(member=self.members[7])
+        self.assertAlmostEqual(recent.check_out_time - recent.check_in_time, timedelta(minutes=45),
+                               delta=timedelta(seconds=30))
+        self.assertEqual(Activity_Log.objects.get(member=self.members[7]).duration_minutes, 45)
+
+    def test_leaves_visits_opened_during_the_sweep(self):
+        late = make_member(20)
+        Check_In.objects.create(member=late, check_in_time=self.now + timedelta(seconds=90))
+        occupancy.close_stale_visits(timedelta(hours=4), everyone=True)
+        self.assertTrue(Check_In.objects.get(member=late).check_out_time is None)
+        self.assertFalse(Activity_Log.objects.filter(duration_minutes__lt=0).exists())
+        self.assertEqual(Activity_Log.objects.count(), 8)
+
+    def test_rejects_bad_options(self):
+        with self.assertRaises(CommandError):
+            self.sweep(batch_size=0)
+
+
+class HealthCheckTests(TestCase):
+    """Liveness never queries; readiness reports each check and caches the round."""
+
+    def setUp(self):
+        health.clear()
+
+    def test_liveness_skips_the_database(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('health_live'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'ok')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_readiness_breakdown_is_cached(self):
+        response = self.client.get(reverse('health_ready'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['status'], 'ok')
+        self.assertFalse(data['cached'])
+        self.assertEqual(set(data['checks']), {'database', 'connections', 'migrations', 'cache'})
+        self.assertEqual(data['checks']['migrations']['pending'], [])
+        self.assertIn('latency_ms', data['checks']['database'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get(reverse('health_ready')).json()
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertTrue(again['cached'])
+        self.assertEqual(again['checked_at'], data['checked_at'])
+
+    @override_settings(HEALTH_DB_SLOW_MS=-1)
+    def test_slow_database_is_degraded_but_ready(self):
+        response = self.client.get(reverse('health_ready'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'degraded')
+        self.assertEqual(response.json()['checks']['database']['status'], 'degraded')
+
+    def test_probes_do_not_wait_for_a_running_round(self):
+        started, release = threading.Event(), threading.Event()
+
+        def hanging():
+            started.set()
+            release.wait(5)
+            return {'status': 'ok'}
+
+        original = health.CHECKS
+        health.CHECKS = [('database', hanging)]
+        try:
+            refresher = threading.Thread(target=health.readiness)
+            refresher.start()
+            started.wait(5)
+            first = health.readiness()  # Nothing cached yet: answers at once
+            self.assertEqual((first['status'], first['checks']), ('degraded', {}))
+            release.set()
+            refresher.join()
+
+            with self.settings(HEALTH_CHECK_CACHE_SECONDS=0):
+                release.clear()
+                started.clear()
+                refresher = threading.Thread(target=health.readiness)
+                refresher.start()
+                started.wait(5)
+                stale = health.readiness()  # The previous round, not a second hanging one
+                self.assertEqual(stale['status'], 'ok')
+                self.assertTrue(stale['cached'])
+                release.set()
+                refresher.join()
+        finally:
+            release.set()
+            health.CHECKS = original
+
+    @skipUnless(connection.vendor == 'postgresql', 'statement_timeout is PostgreSQL only.')
+    @override_settings(HEALTH_DB_TIMEOUT_MS=1500)
+    def test_database_probe_has_its_own_timeout(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(health.check_database()['status'], 'ok')
+        self.assertTrue(any("set_config('statement_timeout', '1500', true)" in q['sql'] for q in ctx.captured_queries))
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            self.assertEqual(cursor.fetchone()[0], '0')  # Not left on the shared connection
+
+    def test_failing_check_answers_503(self):
+        def broken():
+            raise ConnectionError('cache server unreachable')
+
+        original = health.CHECKS
+        health.CHECKS = [('database', health.check_database), ('cache', broken)]
+        try:
+            response = self.client.get(reverse('health_ready'))
+        finally:
+            health.CHECKS = original
+        self.assertEqual(response.status_code, 503)
+        data = response.json()
+        self.assertEqual(data['status'], 'fail')
+        self.assertEqual(data['checks']['database']['status'], 'ok')
+        self.assertIn('cache server unreachable', data['checks']['cache']['error'])
+
+
+class SyntheticDataTests(TestCase):
+    """generate_synthetic_data writes consistent data without signals; benchmark_views reports on it."""
+
+    def setUp(self):
+        call_command('generate_synthetic_data', members=20, staff=2, years=1, notifications=30,
+                     checked_in=3, batch_size=50, stdout=StringIO())
+
+    def test_volumes_and_derived_tables(self):
+        self.assertEqual(gym_Member.objects.count(), 20)
+        self.assertEqual(GymStaff.objects.count(), 2)
+        # Bulk inserts skip the signals: no registration or request notifications were raised
+        self.assertEqual(Notification.objects.count(), 30)
+        self.assertGreater(Check_In.objects.count(), 100)
+        self.assertEqual(Check_In.objects.filter(check_out_time__isnull=False).count(), Activity_Log.objects.count())
+        self.assertEqual(OCCUPANCY_TRACKER.objects.get(pk=1).current_count, 3)
+
+        ledger = Billing_Record.objects.filter(transaction_type='PAYMENT').aggregate(total=Sum('amount'))['total']
+        rollup = Daily_Revenue_Rollup.objects.filter(transaction_type='PAYMENT').aggregate(total=Sum('total_amount'))['total']
+        self.assertEqual(ledger, rollup)
+        for member in gym_Member.objects.filter(activation_status='approved'):
+            owed = member.billing_records.aggregate(total=Sum('amount'))['total'] or 0
+            self.assertEqual(member.balance, owed)
+        self.assertEqual(set(GymStaff.objects.values_list('unread_notifications', flat=True)), {30})
+
+    def test_rerun_needs_flush(self):
+        with self.assertRaises(CommandError):
+            call_command('generate_synthetic_data', members=5, stdout=StringIO())
+        call_command('generate_synthetic_data', members=5, staff=1, years=1, notifications=0, flush=True, stdout=StringIO())
+        self.assertEqual(gym_Member.objects.count(), 5)
+        self.assertEqual(Notification.objects.count(), 0)
+
+    def test_benchmark_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first = os.path.join(directory, 'first.json')
+            call_command('benchmark_views', iterations=1, warmup=0, output=first, stdout=StringIO())
+            with open(first) as handle:
+                report = json.load(handle)
+            self.assertEqual(report['volumes']['members'], 20)
+            self.assertTrue(all(row['status'] == 200 for row in report['results']), report['results'])
+
+            out = StringIO()
+            call_command('benchmark_views', iterations=1, warmup=0, output=os.path.join(directory, 'second.json'),
+                         compare=first, only=['KPI'], stdout=out)
+            self.assertIn('queries +0', out.getvalue())
+
+
+@override_settings(REQUEST_PROFILING=True)
+class ProfilingMiddlewareTests(TestCase):
+    """With REQUEST_PROFILING on, each request is timed, counted and kept for the staff page."""
+
+    def setUp(self):
+        OCCUPANCY_TRACKER.objects.create(pk=1)
+        profiling.clear_profiles()
+        self.staff = make_staff()
+        self.client.force_login(self.staff)
+
+    def test_server_timing_and_buffer(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('staff_dashboard'))
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertIn(f'{len(ctx.captured_queries)} queries', timing)
+        self.assertIn('tpl;dur=', timing)
+
+        entry = profiling.recent_profiles()[0]
+        self.assertEqual(entry['view'], 'staff_dashboard')
+        self.assertEqual(entry['sql_count'], len(ctx.captured_queries))
+        self.assertGreater(entry['template_ms'], 0)
+
+    def test_duplicate_queries_are_flagged(self):
+        sqltiming.add_listener(profiling._record_query)
+        profile = profiling.RequestProfile()
+        token = profiling._current.set(profile)
+        try:
+            for _ in range(3):
+                OCCUPANCY_TRACKER.objects.first()
+            GymStaff.objects.count()
+        finally:
+            profiling._current.reset(token)
+        self.assertEqual(profile.sql_count, 4)
+        [(sql, count)] = profile.duplicates()
+        self.assertIn('OCCUPANCY_TRACKER', sql.upper())
+        self.assertEqual(count, 3)
+
+    def test_staff_page(self):
+        self.client.get(reverse('staff_kpis_api'))
+        page = self.client.get(reverse('request_profiles'))
+        self.assertContains(page, 'staff_kpis_api')
+        data = self.client.get(reverse('request_profiles'), {'format': 'json'}).json()
+        self.assertTrue(data['enabled'])
+        self.assertIn('staff_kpis_api', [row['view'] for row in data['summary']])
+
+        self.client.post(reverse('request_profiles'))
+        self.assertEqual(len(profiling.recent_profiles()), 1)  # Only the redirect that follows the clear
+
+        self.client.force_login(make_member(2).user)
+        self.assertRedirects(self.client.get(reverse('request_profiles')), reverse('landing'))
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_off_by_default(self):
+        response = self.client.get(reverse('staff_kpis_api'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(profiling.recent_profiles(), [])
+
+
+class QueryLogTests(TestCase):
+    """QUERY_LOG_FILE turns on the slow/duplicate query log; without it nothing is wrapped."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, 'queries.jsonl')
+        settings = override_settings(QUERY_LOG_FILE=self.path, QUERY_LOG_SLOW_MS=10_000, QUERY_LOG_REPEAT_THRESHOLD=3)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(querylog.uninstall)
+        OCCUPANCY_TRACKER.objects.create(pk=1)
+
+    def events(self):
+        with open(self.path) as handle:
+            return [json.loads(line) for line in handle]
+
+    def test_duplicates_and_repeated_statements(self):
+        members = [make_member(i) for i in range(4)]
+
+        def view(request):
+            OCCUPANCY_TRACKER.objects.first()
+            OCCUPANCY_TRACKER.objects.first()
+            for member in members:
+                Check_In.objects.filter(member=member).exists()
+            GymStaff.objects.count()
+            return JsonResponse({})
+
+        querylog.QueryLogMiddleware(view)(RequestFactory().get('/dashboard/'))
+        events = {event['type']: event for event in self.events()}
+        self.assertEqual(set(events), {'duplicate_query', 'repeated_statement'})
+
+        duplicate = events['duplicate_query']
+        self.assertEqual(duplicate['count'], 2)
+        self.assertIn('occupancy_tracker', duplicate['sql'].lower())
+        self.assertEqual(duplicate['path'], '/dashboard/')
+        self.assertTrue(duplicate['origin'].startswith('gymapp/tests.py:'))
+
+        repeated = events['repeated_statement']
+        self.assertEqual((repeated['count'], repeated['distinct_params']), (4, 4))
+        self.assertIn('check_in', repeated['sql'].lower())
+
+    @override_settings(QUERY_LOG_SLOW_MS=0)
+    def test_slow_queries_name_view_and_origin(self):
+        self.client.force_login(make_staff())
+        self.client.get(reverse('staff_kpis_api'))
+        slow = [event for event in self.events() if event['type'] == 'slow_query' and event['view'] == 'staff_kpis_api']
+        self.assertTrue(slow)
+        self.assertTrue(all('duration_ms' in event and 'params' in event for event in slow))
+        self.assertTrue(any(event['origin'] and event['origin'].startswith('gymapp/') for event in slow))
+
+    @override_settings(QUERY_LOG_FILE=None, QUERY_LOG_SLOW_MS=0)
+    def test_disabled_adds_no_wrapper(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            querylog.QueryLogMiddleware(lambda request: None)
+        self.client.force_login(make_staff())
+        self.assertEqual(self.client.get(reverse('staff_kpis_api')).status_code, 200)
+        self.assertFalse(sqltiming.listening(querylog.log_queries))
+        self.assertFalse(os.path.exists(self.path))
+
+    @override_settings(REQUEST_PROFILING=True, METRICS_ENABLED=True, METRICS_DIR=None, METRICS_TOKEN=None)
+    def test_one_timing_wrapper_for_every_consumer(self):
+        """Profiling, the query log and metrics share a single wrapper per statement."""
+        profiling.clear_profiles()
+        metrics.reset()
+        self.client.force_login(make_staff())
+        self.client.get(reverse('staff_kpis_api'))
+        self.assertEqual(connection.execute_wrappers.count(sqltiming.timed_execute), 1)
+        self.assertEqual(len(connection.execute_wrappers), 1)
+
+        entry = profiling.recent_profiles()[0]
+        self.assertEqual(entry['view'], 'staff_kpis_api')
+        self.assertGreater(entry['sql_count'], 0)
+        self.assertIn(f'gymapp_db_queries_total{{view="staff_kpis_api"}} {entry["sql_count"]}',
+                      self.client.get(reverse('metrics')).content.decode())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'In-memory SQLite cannot serve concurrent live-server requests.')
+class LoadTestCommandTests(LiveServerTestCase):
+    """load_test drives the front-desk and member scenarios against a live server."""
+
+    def test_short_run_without_errors(self):
+        OCCUPANCY_TRACKER.objects.create(pk=1)
+        make_staff()
+        for i in range(3):
+            make_member(i, balance=Decimal('10.00'))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'load.json')
+            call_command('load_test', url=self.live_server_url, front_desk=1, members=1, duration=1,
+                         output=path, stdout=StringIO())
+            with open(path) as handle:
+                report = json.load(handle)
+
+        rows = {row['endpoint']: row for row in report['results']}
+        self.assertGreater(rows['check in']['requests'], 0)
+        self.assertGreater(rows['member dashboard']['requests'], 0)
+        self.assertEqual(report['errors'], {})
+        self.assertEqual(Check_In.objects.filter(check_out_time__isnull=True).count(), 0)
+        self.assertEqual(OCCUPANCY_TRACKER.objects.get(pk=1).current_count, 0)
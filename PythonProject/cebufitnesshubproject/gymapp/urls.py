@@ -46,7 +46,16 @@ from .views import (
     revenue_chart_data_view,
     mark_notification_read_view,
     fetch_notifications_api, #for auto refresh(asks the server, "Any new notifications?" every 5 seconds)
+    staff_notification_stream, #pushes new notifications as they happen (SSE, ASGI only)
+    mark_all_notifications_read_view,
     reject_member_view,
+    staff_member_list_api,
+    staff_kpis_api,
+    request_profiles_view,
+    staff_in_gym_api,
+    metrics_view,
+    health_live_view,
+    health_ready_view,
 )
 
 urlpatterns = [
@@ -88,7 +97,16 @@ urlpatterns = [
     path('staff/revenue-chart-data/', revenue_chart_data_view, name='revenue_chart_data'),
     path('staff/notifications/read/<int:notification_id>/', mark_notification_read_view, name='mark_notification_read'),
     path('staff/api/notifications/', fetch_notifications_api, name='fetch_notifications_api'),
+    path('staff/api/notifications/stream/', staff_notification_stream, name='staff_notification_stream'),
+    path('staff/api/notifications/read-all/', mark_all_notifications_read_view, name='mark_all_notifications_read'),
     path('staff/reject-member/', reject_member_view, name='reject_member_view'),
+    path('staff/api/members/<str:tab>/', staff_member_list_api, name='staff_member_list_api'),
+    path('staff/api/kpis/', staff_kpis_api, name='staff_kpis_api'),
+    path('staff/api/in-gym/', staff_in_gym_api, name='staff_in_gym_api'),
+    path('staff/profiling/', request_profiles_view, name='request_profiles'),
+    path('metrics', metrics_view, name='metrics'),
+    path('health/live/', health_live_view, name='health_live'),
+    path('health/ready/', health_ready_view, name='health_ready'),
     
     # --- These paths are no longer needed ---
     # They all point to views that have been consolidated.
@@ -2,16 +2,22 @@ from django.db.models import Q # For complex 'OR' queries
 from django.db.models.functions import TruncDay
 from datetime import datetime, timedelta # Import timedelta and datetime utilities
 from decimal import Decimal
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.urls import reverse
 from django.utils.timesince import timesince # Import this for the timestamp formatting
+from django.utils.formats import date_format
+from django.template.defaultfilters import floatformat
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.core.exceptions import ValidationError
+import asyncio
 import json
 from django.utils import timezone
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from .forms import (
     CustomUserRegistrationForm, FreezeRequestForm, MemberLoginForm, 
     PasswordChangeForm, UnfreezeRequestForm
@@ -19,11 +25,18 @@ from .forms import (
 # Corrected and expanded model imports
 from .models import (
     CustomUser, GymStaff, gym_Member, Account_Request, 
-    Billing_Record, Check_In, ClassSchedule, OCCUPANCY_TRACKER,
+    Billing_Record, Check_In, ClassSchedule,
     Activity_Log, Notification
 )
-from django.views.decorators.http import require_http_methods
-from django.db.models import Max, Sum, Count # For dashboard metrics
+from . import events, health, metrics, profiling, roster
+from .occupancy import prepare_counter, record_check_in, record_check_out
+from .gym_settings import get_gym_settings
+from .kpis import dashboard_kpis
+from .notifications import feed_etag, mark_all_read, mark_read, serialize_notification, staff_feed, staff_notifications
+from .revenue import GRANULARITIES, MAX_BUCKETS, count_buckets, revenue_series
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.http import condition, require_http_methods
+from django.db.models import Max, Count # For dashboard metrics (Max/Count also build the schedule ETag)
 from django.db.models import F # For updating the tracker
 import calendar
 
@@ -269,7 +282,8 @@ def member_dashboard(request):
         account_status = "Inactive"
 
     # --- 5. Occupancy Data ---
-    occupancy = OCCUPANCY_TRACKER.objects.first()
+    occupancy = get_gym_settings()
+    occupancy.current_count = roster.in_gym_count()  # Same count as the staff 'In the Gym' list
     occupancy_percent = 0
     gym_status = "Open"
 
@@ -561,103 +575,20 @@ def staff_dashboard_view(request):
         return redirect('landing')
 
     now = timezone.now()
-    today = now.date()
 
     # --- 1. KPI DATA ---
-    pending_approvals = Account_Request.objects.filter(status='PENDING').count()
-    active_members_count = gym_Member.objects.filter(
-        user__is_active=True,
-        is_frozen=False
-    ).filter(
-        Q(next_due_date__isnull=True) | Q(next_due_date__gte=today)
-    ).count()
-
-    # We use .lstrip('-') to handle the negative 'PAYMENT' values
-    todays_revenue = (Billing_Record.objects.filter(
-        transaction_type='PAYMENT',
-        timestamp__date=now.date()
-    ).aggregate(Sum('amount'))['amount__sum'] or 0.00) * -1 # Multiply by -1 to make positive
-
-    monthly_revenue = (Billing_Record.objects.filter(
-        transaction_type='PAYMENT',
-        timestamp__month=now.month,
-        timestamp__year=now.year
-    ).aggregate(Sum('amount'))['amount__sum'] or 0.00) * -1 # Multiply by -1
-    
-    # MRR (fees charged) are positive in your new 'Debt Ledger' model
-    mrr = Billing_Record.objects.filter(
-        transaction_type='FEE',
-        timestamp__month=now.month,
-        timestamp__year=now.year
-    ).aggregate(Sum('amount'))['amount__sum'] or 0.00
+    # Two aggregate queries in total (see kpis.py). The header refreshes
+    # itself through staff_kpis_api without reloading the page.
+    kpis = dashboard_kpis(now)
 
     # --- 2. MEMBER MANAGEMENT TABLES ---
 
     search_query = request.GET.get('q', None) #new logic for search filter
-    
-    # Get the 3 separate member lists
-    active_members_list = gym_Member.objects.filter(
-        user__is_active=True,
-        is_frozen=False
-    ).filter(
-        Q(next_due_date__isnull=True) | Q(next_due_date__gte=today)
-    ).select_related('user')
-    #pending_members_list = gym_Member.objects.filter(user__is_active=False).select_related('user')
-    # NEW LINE (Filter by activation_status instead):
-    pending_members_list = gym_Member.objects.filter(activation_status='pending').select_related('user')
-    frozen_members_list = gym_Member.objects.filter(is_frozen=True).select_related('user')
-    deactivated_members_list = gym_Member.objects.filter(
-        activation_status='approved'
-    ).filter(
-        Q(user__is_active=False) | Q(next_due_date__lt=today)
-    ).select_related('user')
-
-    # If a search query exists, filter the 'active' list
-    if search_query:
-        active_members_list = active_members_list.filter(
-            Q(user__first_name__icontains=search_query) |  # Search by first name
-            Q(user__last_name__icontains=search_query) |   # Search by last name
-            Q(user__email__icontains=search_query) |      # Search by email
-            Q(membership_id__icontains=search_query)    # Search by Member ID
-        )
-    # --- END OF SEARCH LOGIC ---
-
-    # Process the 'Active' list (which you already did)
-    active_member_data = []
-    for member in active_members_list:
-        latest_checkin = member.check_ins.order_by('-check_in_time').first()
-        is_checked_in = False
-        last_checkin_time = None
-        if latest_checkin:
-            last_checkin_time = latest_checkin.check_in_time
-            if latest_checkin.check_out_time is None:
-                is_checked_in = True
-        active_member_data.append({
-            'member': member,
-            'is_checked_in': is_checked_in,
-            'last_checkin_time': last_checkin_time
-        })
 
-    # Process the 'Frozen' list
-    frozen_member_data = []
-    for member in frozen_members_list:
-        latest_checkin = member.check_ins.order_by('-check_in_time').first()
-        frozen_member_data.append({
-            'member': member,
-            'last_checkin_time': latest_checkin.check_in_time if latest_checkin else None
-        })
+    # The four member tables are no longer rendered here. Each tab is
+    # fetched page by page from staff_member_list_api when it is opened,
+    # so this page costs the same no matter how many members exist.
 
-    # Process the 'Deactivated' list
-    deactivated_member_data = []
-    for member in deactivated_members_list:
-        latest_checkin = member.check_ins.order_by('-check_in_time').first()
-        status_label = 'Deactivated' if not member.user.is_active else 'Expired'
-        deactivated_member_data.append({
-            'member': member,
-            'status_label': status_label,
-            'last_checkin_time': latest_checkin.check_in_time if latest_checkin else None
-        })
-        
     # --- 3. APPROVAL QUEUE DATA ---
     approval_requests = Account_Request.objects.filter(status='PENDING').select_related('member__user')
 
@@ -668,9 +599,7 @@ def staff_dashboard_view(request):
 
     # --- 5. NOTIFICATIONS ---
     # Get the 10 most recent notifications, regardless of read status
-    notifications = Notification.objects.filter(
-        recipient_staff=staff_profile
-    ).order_by('-timestamp')[:10] # Get the 10 newest
+    notifications = staff_feed(staff_profile)
 
     # --- 6. FINAL CONTEXT ---
     context = {
@@ -678,29 +607,198 @@ def staff_dashboard_view(request):
         'staff_profile': staff_profile,
 
         # --- ADD THIS LINE ---
-        'settings': OCCUPANCY_TRACKER.objects.first(), # Pass settings to template
+        'settings': get_gym_settings(), # Pass settings to template
         # --- END ADD ---
 
         'search_query': search_query, # Pass the query back to the template
         
         # KPI Context
-        'pending_approvals': pending_approvals,
-        'active_members': active_members_count,
-        'todays_revenue': todays_revenue,
-        'monthly_revenue': monthly_revenue,
-        'mrr': mrr,
+        'pending_approvals': kpis['pending_approvals'],
+        'active_members': kpis['active_members'],
+        'todays_revenue': kpis['todays_revenue'],
+        'monthly_revenue': kpis['monthly_revenue'],
+        'mrr': kpis['mrr'],
         
         # Table Context
-        'active_member_list': active_member_data,   # For 'Active' table
-        'pending_member_list': pending_members_list, # For 'Pending' table
-        'frozen_member_list': frozen_member_data,    # For 'Frozen' table
-        'deactivated_member_list': deactivated_member_data, # For 'Deactivated' table
+        'member_page_size': roster.DEFAULT_PAGE_SIZE,
         'approval_requests': approval_requests,
         'revenue_transactions': revenue_transactions,
         'notifications': notifications,
+        'unread_notifications': staff_profile.unread_notifications,
     }
     return render(request, 'gymapp/staff_dashboard.html', context)
 
+def _serialize_roster_member(member, tab):
+    """
+    Builds the JSON row for one member in a dashboard tab.
+    Display strings use the same formats the template used to render.
+    """
+    user = member.user
+    last_checkin_time = getattr(member, 'last_checkin_time', None)
+    if tab == 'active':
+        status_text = 'Active'
+    elif tab == 'pending':
+        status_text = 'Pending'
+    elif tab == 'frozen':
+        status_text = 'Frozen'
+    else:
+        status_text = member.status_label
+
+    return {
+        'member_id': user.pk,
+        'name': user.get_full_name(),
+        'email': user.email,
+        'contact_number': user.contact_number or '',
+        'emergency_contact_name': user.emergency_contact_name or '',
+        'emergency_contact_number': user.emergency_contact_number or '',
+        'medical_conditions': user.medical_conditions or '',
+        'fitness_goals': user.fitness_goals or '',
+        'membership_id': member.membership_id or 'N/A',
+        'date_joined': date_format(timezone.localtime(user.date_joined), 'Y-m-d'),
+        'balance': str(member.balance),
+        'balance_display': intcomma(floatformat(member.balance, 2)),
+        'status_text': status_text,
+        'is_checked_in': getattr(member, 'is_checked_in', False),
+        'last_checkin_time': last_checkin_time.isoformat() if last_checkin_time else None,
+        'last_checkin_display': (
+            date_format(timezone.localtime(last_checkin_time), 'M. d, g:i A')
+            if last_checkin_time else 'N/A'
+        ),
+    }
+
+@login_required
+@require_http_methods(["GET"])
+def staff_member_list_api(request, tab):
+    """
+    API endpoint that returns one page of a member management tab.
+
+    Query parameters:
+    - q: search by name, email or membership ID
+    - sort: 'name', 'joined' or 'balance' ('-' prefix for descending)
+    - cursor: the 'next_cursor' value from the previous page
+    - limit: page size (max 100)
+    - status: 'expired' or 'deactivated' (deactivated tab only)
+    - checked_in: '1' or '0' (active and frozen tabs)
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
+
+    if tab not in roster.MEMBER_TABS:
+        return JsonResponse({'error': 'Unknown member list.'}, status=404)
+
+    checked_in = request.GET.get('checked_in')
+    if checked_in in ('1', 'true'):
+        checked_in = True
+    elif checked_in in ('0', 'false'):
+        checked_in = False
+    else:
+        checked_in = None
+
+    try:
+        limit = int(request.GET.get('limit', roster.DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Invalid page size.'}, status=400)
+    limit = max(1, min(limit, roster.MAX_PAGE_SIZE))
+
+    queryset = roster.tab_queryset(
+        tab,
+        timezone.now().date(),
+        search_query=request.GET.get('q', '').strip(),
+        status=request.GET.get('status'),
+        checked_in=checked_in,
+    )
+
+    try:
+        members, next_cursor = roster.paginate(
+            queryset,
+            sort=request.GET.get('sort') or roster.DEFAULT_SORT,
+            cursor=request.GET.get('cursor'),
+            limit=limit,
+        )
+    except KeyError:
+        return JsonResponse({'error': 'Invalid sort option.'}, status=400)
+    except (roster.InvalidCursor, ValidationError):
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+
+    return JsonResponse({
+        'tab': tab,
+        'results': [_serialize_roster_member(member, tab) for member in members],
+        'next_cursor': next_cursor,
+    })
+
+def _serialize_open_visit(visit, now):
+    """JSON row for one member in the 'In the Gym' panel."""
+    member = visit.member
+    return {
+        'member_id': member.user.pk,
+        'name': member.user.get_full_name(),
+        'membership_id': member.membership_id or 'N/A',
+        'check_in_time': visit.check_in_time.isoformat(),
+        'check_in_display': date_format(timezone.localtime(visit.check_in_time), 'g:i A'),
+        'elapsed_minutes': max(0, int((now - visit.check_in_time).total_seconds() // 60)),
+    }
+
+@login_required
+@require_http_methods(["GET"])
+def staff_in_gym_api(request):
+    """
+    API endpoint that returns one page of the members checked in right now,
+    with the total count and the capacity.
+
+    Query parameters:
+    - sort: 'checked_in' (longest inside first) or '-checked_in' (newest first)
+    - cursor: the 'next_cursor' value from the previous page
+    - limit: page size (max 100)
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
+
+    try:
+        limit = int(request.GET.get('limit', roster.DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Invalid page size.'}, status=400)
+    limit = max(1, min(limit, roster.MAX_PAGE_SIZE))
+
+    try:
+        visits, next_cursor = roster.paginate(
+            roster.open_visits(),
+            sort=request.GET.get('sort') or roster.IN_GYM_DEFAULT_SORT,
+            cursor=request.GET.get('cursor'),
+            limit=limit,
+            sort_fields=roster.IN_GYM_SORT_FIELDS,
+        )
+    except KeyError:
+        return JsonResponse({'error': 'Invalid sort option.'}, status=400)
+    except (roster.InvalidCursor, ValidationError):
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+
+    now = timezone.now()
+    return JsonResponse({
+        'count': roster.in_gym_count(),
+        'capacity': get_gym_settings().capacity_limit,
+        'results': [_serialize_open_visit(visit, now) for visit in visits],
+        'next_cursor': next_cursor,
+    })
+
+@login_required
+@require_http_methods(["GET"])
+def staff_kpis_api(request):
+    """
+    API endpoint that returns the dashboard header KPIs as JSON.
+    Money values are sent as exact decimal strings.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
+
+    kpis = dashboard_kpis()
+    return JsonResponse({
+        'pending_approvals': kpis['pending_approvals'],
+        'active_members': kpis['active_members'],
+        'todays_revenue': str(kpis['todays_revenue']),
+        'monthly_revenue': str(kpis['monthly_revenue']),
+        'mrr': str(kpis['mrr']),
+    })
+
 SCHEDULE_START_MINUTES = 7 * 60 + 30  # 7:30 AM
 SCHEDULE_END_MINUTES = 19 * 60        # 7:00 PM
 SCHEDULE_INTERVAL = 30
@@ -758,8 +856,19 @@ def _parse_time_value(value):
 def _time_to_minutes(time_value):
     return time_value.hour * 60 + time_value.minute
 
+def _schedule_etag(request):
+    """
+    Version token for the schedule JSON (one aggregate query). Adding,
+    editing or deleting a class changes the newest updated_at or the count.
+    """
+    version = ClassSchedule.objects.aggregate(latest=Max('updated_at'), total=Count('pk'))
+    latest = version['latest'].timestamp() if version['latest'] else 0
+    return f"schedule-{version['total']}-{latest}"
+
 @login_required
 @require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_schedule_etag)
 def staff_schedule_data_view(request):
     if not request.user.is_staff:
         return JsonResponse({'error': 'Permission denied.'}, status=403)
@@ -886,6 +995,8 @@ def class_schedule_view(request):
     return redirect('member_schedule')
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_schedule_etag)
 def member_schedule_data_view(request):
     classes = ClassSchedule.objects.all().order_by('day_of_week', 'start_time')
 
@@ -923,55 +1034,58 @@ def check_in_out_view(request):
             action = data.get('action')
             
             member = get_object_or_404(gym_Member, user__pk=member_id)
-            tracker = OCCUPANCY_TRACKER.objects.first()  # Get the tracker
+            prepare_counter()  # Before the visit changes (see occupancy.prepare_counter)
 
             if action == 'checkin':
                 # --- CHECK-IN LOGIC ---
-                # 1. Create a new CheckIn record
-                Check_In.objects.create(
-                    member=member,
-                    check_in_time=timezone.now(),
-                    check_out_time=None  # This is important
-                )
-                
-                # 2. Update the Occupancy Tracker
-                if tracker:
-                    tracker.current_count = F('current_count') + 1
-                    tracker.last_updated = timezone.now()
-                    tracker.save()
-                
+                # 1. Open a visit. The unique_open_check_in constraint lets only one
+                #    open row per member exist, so a double click or a second kiosk
+                #    racing this one gets an IntegrityError instead of a duplicate.
+                try:
+                    with transaction.atomic():
+                        Check_In.objects.create(
+                            member=member,
+                            check_in_time=timezone.now(),
+                            check_out_time=None  # This is important
+                        )
+                except IntegrityError:
+                    # Already inside: answer as if this request did it, and count nothing
+                    return JsonResponse({'status': 'success', 'message': 'Member is already checked in.'})
+
+                # 2. Update the live occupancy count (only for the request that opened the visit)
+                record_check_in()
+
                 return JsonResponse({'status': 'success', 'message': 'Member checked in.'})
 
             elif action == 'checkout':
                 # --- CHECK-OUT LOGIC ---
-                # 1. Find the latest check-in record that is still open
-                latest_checkin = Check_In.objects.filter(
-                    member=member,
-                    check_out_time__isnull=True
-                ).order_by('-check_in_time').first()
-                
-                if latest_checkin:
+                with transaction.atomic():
+                    # 1. Lock the member's open visit (there is at most one). A racing
+                    #    check-out waits here, then finds the visit closed.
+                    open_checkin = Check_In.objects.select_for_update().filter(
+                        member=member,
+                        check_out_time__isnull=True
+                    ).first()
+
+                    if open_checkin is None:
+                        return JsonResponse({'status': 'error', 'message': 'Could not find an open check-in record to close.'})
+
                     # 2. Close the record
-                    latest_checkin.check_out_time = timezone.now()
-                    latest_checkin.save()
-                    
-                    # 3. Update the Occupancy Tracker
-                    if tracker and tracker.current_count > 0:
-                        tracker.current_count = F('current_count') - 1
-                        tracker.last_updated = timezone.now()
-                        tracker.save()
-
-                    # 4. (Optional but recommended) Create the Activity_Log record
-                    duration = (latest_checkin.check_out_time - latest_checkin.check_in_time).total_seconds() / 60
+                    open_checkin.check_out_time = timezone.now()
+                    open_checkin.save(update_fields=['check_out_time'])
+
+                    # 3. Create the Activity_Log record
+                    duration = (open_checkin.check_out_time - open_checkin.check_in_time).total_seconds() / 60
                     Activity_Log.objects.create(
                         member=member,
-                        activity_date=latest_checkin.check_in_time.date(),
+                        activity_date=open_checkin.check_in_time.date(),
                         duration_minutes=int(duration)
                     )
-                    
-                    return JsonResponse({'status': 'success', 'message': 'Member checked out.'})
-                else:
-                    return JsonResponse({'status': 'error', 'message': 'Could not find an open check-in record to close.'})
+
+                # 4. Update the live occupancy count once the visit is closed for good
+                record_check_out()
+
+                return JsonResponse({'status': 'success', 'message': 'Member checked out.'})
 
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
@@ -990,21 +1104,8 @@ def staff_settings_view(request):
         messages.error(request, 'You do not have permission to access this page.')
         return redirect('landing')
 
-    # Get the one and only settings object.
-    # .get_or_create() ensures it exists on the first run.
-    # We use 'pk=1' to always get the same row.
-    settings, created = OCCUPANCY_TRACKER.objects.get_or_create(
-        pk=1,
-        defaults={
-            'capacity_limit': 120,
-            'peak_hours_start': '08:00',
-            'peak_hours_end': '20:00',
-            'default_monthly_fee': 2000.00,
-            'gym_name': 'Cebu Fitness Hub',
-            'contact_number': '+63 917 123 4567',
-            'contact_address': '5th Floor, 8 Banawa Centrale, R. Duterte Street, Cebu City'
-        }
-    )
+    # Get the one and only settings object (pk=1, created on the first run).
+    settings = get_gym_settings()
 
     # --- HANDLE POST REQUEST (from JavaScript fetch) ---
     if request.method == 'POST':
@@ -1020,7 +1121,10 @@ def staff_settings_view(request):
             
             # You can also save gym_name and contact_address if you add them to your form
             
-            settings.save()
+            # Only the fields above: current_count in the cached copy is stale
+            settings.save(update_fields=[
+                'contact_number', 'default_monthly_fee', 'capacity_limit', 'peak_hours_start', 'peak_hours_end',
+            ])
             return JsonResponse({'status': 'success', 'message': 'Settings saved successfully!'})
             
         except Exception as e:
@@ -1199,7 +1303,7 @@ def activate_member_view(request):
             amount_paid = Decimal(amount_str)
             
             # Get the single source of truth for the fee
-            settings = OCCUPANCY_TRACKER.objects.get(pk=1)
+            settings = get_gym_settings()
             default_fee = settings.default_monthly_fee
 
             # --- 1. MEMBERSHIP ID GENERATOR LOGIC ---
@@ -1310,8 +1414,8 @@ def reactivate_member_view(request):
                 if amount_paid < 0:
                     return JsonResponse({'status': 'error', 'message': 'Amount cannot be negative.'})
 
-            settings = OCCUPANCY_TRACKER.objects.first()
-            default_fee = settings.default_monthly_fee if settings else Decimal('0.00')
+            settings = get_gym_settings()
+            default_fee = settings.default_monthly_fee or Decimal('0.00')
 
             if member.user.is_active and member.next_due_date and member.next_due_date >= today:
                 return JsonResponse({'status': 'error', 'message': 'Member is already active.'})
@@ -1437,58 +1541,72 @@ def edit_member_view(request):
 # -----------------------------------------------------------------
 # --- Imlementing Chart in Staff dashboard ---
 # -----------------------------------------------------------------
+def _chart_label(day, granularity, multi_year):
+    if granularity == 'month':
+        return day.strftime('%b %Y') if multi_year else day.strftime('%b')
+    label = f"{day.strftime('%b')} {day.day}"  # e.g. "Nov 3"
+    return f"{label}, {day.year}" if multi_year else label
+
+
 @login_required
 def revenue_chart_data_view(request):
     """
     API endpoint to send revenue data for the chart.
-    Handles two filter types:
-    - 'daily': Returns daily totals for the current month.
-    - 'monthly': Returns monthly totals for the current year.
+
+    Query parameters:
+    - start, end: inclusive local dates (YYYY-MM-DD)
+    - granularity: 'day', 'week' (Monday-based) or 'month'
+    The legacy 'filter' parameter is still accepted:
+    - 'daily': daily totals for the current month.
+    - 'monthly': monthly totals for the current year.
+
+    Totals are bucketed and summed in the database from the daily
+    revenue rollup and returned as exact decimal strings; empty
+    buckets are filled with "0.00".
     """
     if not request.user.is_staff:
         return JsonResponse({'error': 'Permission denied'}, status=403)
 
+    today = timezone.localdate()
     filter_type = request.GET.get('filter', 'daily') # Default to 'daily'
-    now = timezone.now()
-    
-    # We only care about payments (negative numbers in the 'Debt Ledger')
-    base_queryset = Billing_Record.objects.filter(transaction_type='PAYMENT')
 
     if filter_type == 'monthly':
-        # --- LOGIC FOR "THIS YEAR (MONTHLY)" ---
-        
-        # 1. Get all payments for the current year
-        payments_this_year = base_queryset.filter(timestamp__year=now.year)
-        
-        # 2. Format for Chart.js
-        labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-        data = [0.0] * 12 # A list of 12 zeros
-        
-        for payment in payments_this_year:
-            # (payment.amount is negative, so *-1 makes it positive)
-            data[payment.timestamp.month - 1] += float(payment.amount * -1)
-
+        default_start = today.replace(month=1, day=1)
+        default_end = today.replace(month=12, day=31)
+        default_granularity = 'month'
     else:
-        # --- LOGIC FOR "THIS MONTH (DAILY)" ---
-        
-        # 1. Get all payments for the current month and year
-        payments_this_month = base_queryset.filter(
-            timestamp__year=now.year,
-            timestamp__month=now.month
-        )
-        
-        # 2. Format for Chart.js
-        num_days = calendar.monthrange(now.year, now.month)[1] # Gets days in current month (e.g., 30)
-        labels = [f"{now.strftime('%b')} {day}" for day in range(1, num_days + 1)] # e.g., ["Nov 1", "Nov 2", ...]
-        data = [0.0] * num_days # A list of 30 zeros
+        default_start = today.replace(day=1)
+        default_end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+        default_granularity = 'day'
 
-        for payment in payments_this_month:
-            # (payment.amount is negative, so *-1 makes it positive)
-            data[payment.timestamp.day - 1] += float(payment.amount * -1)
+    try:
+        start_date = datetime.strptime(request.GET['start'], '%Y-%m-%d').date() if request.GET.get('start') else default_start
+        end_date = datetime.strptime(request.GET['end'], '%Y-%m-%d').date() if request.GET.get('end') else default_end
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Dates must use YYYY-MM-DD.'}, status=400)
+
+    granularity = request.GET.get('granularity') or default_granularity
+    if granularity not in GRANULARITIES:
+        return JsonResponse({'status': 'error', 'message': 'Granularity must be day, week or month.'}, status=400)
+    if start_date > end_date:
+        return JsonResponse({'status': 'error', 'message': 'Start date must not be after end date.'}, status=400)
+    if count_buckets(start_date, end_date, granularity) > MAX_BUCKETS:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Range too large: at most {MAX_BUCKETS} points. Use a coarser granularity.'
+        }, status=400)
+
+    series = revenue_series(start_date, end_date, granularity)
+    multi_year = start_date.year != end_date.year
 
     return JsonResponse({
-        'labels': labels,
-        'data': data
+        'labels': [_chart_label(day, granularity, multi_year) for day, _ in series],
+        'data': [str(total) for _, total in series],
+        'buckets': [day.isoformat() for day, _ in series],
+        'total': str(sum((total for _, total in series), Decimal('0.00'))),
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'granularity': granularity,
     })
 
 
@@ -1503,16 +1621,15 @@ def mark_notification_read_view(request, notification_id):
     if not request.user.is_staff:
         return redirect('landing')
     
+    staff_profile = request.user.gym_staff
     notification = get_object_or_404(
-        Notification, 
-        notification_id=notification_id, 
-        recipient_staff=request.user.gym_staff
+        staff_notifications(staff_profile),
+        notification_id=notification_id
     )
     
-    # Mark as read
+    # Mark as read (one receipt row for this staff member)
     if not notification.is_read:
-        notification.is_read = True
-        notification.save()
+        mark_read(notification, staff_profile)
 
     # --- START: NEW VALIDATION LOGIC ---
     if notification.redirect_url and "#" in notification.redirect_url:
@@ -1548,12 +1665,21 @@ def mark_notification_read_view(request, notification_id):
     
     return redirect('staff_dashboard')
 
+def _notifications_etag(request):
+    if not request.user.is_staff or not hasattr(request.user, 'gym_staff'):
+        return None
+    return feed_etag(request.user.gym_staff)
+
 #auto fetch/ auto refresh
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_notifications_etag)
 def fetch_notifications_api(request):
     """
     API endpoint that returns the latest 10 notifications as JSON.
     Used by JavaScript to auto-reload the notification feed.
+    Answers If-None-Match with 304 when the feed has not changed,
+    without loading the feed.
     """
     if not request.user.is_staff:
         return JsonResponse({'notifications': []})
@@ -1562,44 +1688,88 @@ def fetch_notifications_api(request):
         staff_profile = request.user.gym_staff
         
         # Fetch latest 10 notifications
-        notifications_qs = Notification.objects.filter(
-            recipient_staff=staff_profile
-        ).order_by('-timestamp')[:10]
-
-        data = []
-        for notif in notifications_qs:
-            # Determine the prefix/label based on type
-            prefix = "System:"
-            if notif.notification_type == 'NEW_REQUEST':
-                prefix = "Action Required:"
-            elif notif.notification_type == 'NEW_REGISTRATION':
-                prefix = "New Member:"
-
-            # Determine styling class (matches your HTML logic)
-            style_type = "neutral"
-            if notif.notification_type in ['NEW_REQUEST', 'NEW_REGISTRATION']:
-                style_type = "warning"
-
-            # Build the URL for the click action
-            from django.urls import reverse
-            read_url = reverse('mark_notification_read', args=[notif.notification_id])
-
-            data.append({
-                'id': notif.notification_id,
-                'message': notif.message,
-                'prefix': prefix,
-                'time_ago': timesince(notif.timestamp) + " ago",
-                'is_read': notif.is_read,
-                'style_type': style_type,
-                'read_url': read_url
-            })
+        notifications_qs = staff_feed(staff_profile)
 
-        return JsonResponse({'notifications': data})
+        data = [serialize_notification(notif, notif.is_read) for notif in notifications_qs]
+
+        return JsonResponse({
+            'notifications': data,
+            'unread_count': staff_profile.unread_notifications,
+        })
 
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@login_required
+@require_http_methods(["POST"])
+def mark_all_notifications_read_view(request):
+    """
+    Marks all of the staff member's notifications as read.
+    Optional 'type' (form or JSON body) limits it to one notification_type,
+    e.g. NEW_REGISTRATION.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'status': 'error', 'message': 'Permission denied.'}, status=403)
+
+    try:
+        data = json.loads(request.body.decode('utf-8')) if request.body else {}
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        data = request.POST
+    if not isinstance(data, dict) or not isinstance(data.get('type') or '', str):
+        return JsonResponse({'status': 'error', 'message': "Send a JSON object with an optional 'type' string."},
+                            status=400)
+    notification_type = (data.get('type') or '').strip() or None
+
+    staff_profile = request.user.gym_staff
+    marked = mark_all_read(staff_profile, notification_type)
+    staff_profile.refresh_from_db(fields=['unread_notifications'])
+
+    return JsonResponse({
+        'status': 'success',
+        'marked': marked,
+        'unread_count': staff_profile.unread_notifications,
+    })
+
+
+# --- Live notification stream (Server-Sent Events) ---
+STREAM_KEEPALIVE_SECONDS = 25
+
+
+async def staff_notification_stream(request):
+    """
+    Pushes new notifications to the staff dashboard as Server-Sent Events.
+    Waiting clients hold no database connection; events arrive from
+    gymapp.events when a notification is committed. Needs an ASGI server
+    (asgi.py); under WSGI it answers 204 so the browser falls back to
+    polling fetch_notifications_api.
+    """
+    user = await request.auser()
+    if not user.is_authenticated or not user.is_staff:
+        return JsonResponse({'status': 'error', 'message': 'Permission denied'}, status=403)
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    async def event_stream():
+        queue = events.subscribe()
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'  # Keeps proxies from closing an idle connection
+                    continue
+                yield f"event: notification\nid: {event['id']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            events.unsubscribe(queue)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering
+    return response
+
+
 @login_required
 def reject_member_view(request):
     """
@@ -1631,6 +1801,74 @@ def reject_member_view(request):
             
     return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
 
+# --- Request Profiling (REQUEST_PROFILING) ---
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def request_profiles_view(request):
+    """
+    Shows the recent request profiles kept by ProfilingMiddleware in
+    this process: a per-view summary and the newest requests.
+    ?format=json returns the same data; POST clears the buffer.
+    """
+    if not request.user.is_staff:
+        messages.error(request, 'You do not have permission to access this page.')
+        return redirect('landing')
+
+    if request.method == 'POST':
+        profiling.clear_profiles()
+        return redirect('request_profiles')
+
+    recent = profiling.recent_profiles(limit=100)
+    summary = profiling.view_summary()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'enabled': profiling.enabled(),
+            'summary': summary,
+            'recent': recent,
+        })
+
+    return render(request, 'gymapp/request_profiles.html', {
+        'staff_user': request.user,
+        'enabled': profiling.enabled(),
+        'summary': summary,
+        'recent': recent,
+    })
+
+@require_http_methods(["GET"])
+@never_cache
+def metrics_view(request):
+    """
+    Prometheus scrape target: every worker's counters and histograms
+    plus occupancy and approval gauges, in the text exposition format.
+    404 unless METRICS_ENABLED is on; needs the METRICS_TOKEN bearer
+    token when one is configured.
+    """
+    if not metrics.enabled():
+        raise Http404
+    if not metrics.authorized(request):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# --- Health probes (no login; see gymapp.health) ---
+
+@require_http_methods(["GET", "HEAD"])
+@never_cache
+def health_live_view(request):
+    """Liveness: the worker answers. Never touches the database."""
+    return JsonResponse(health.liveness())
+
+
+@require_http_methods(["GET", "HEAD"])
+@never_cache
+def health_ready_view(request):
+    """
+    Readiness: database, connections, migrations and cache, with a
+    per-check breakdown. 503 when any check fails.
+    """
+    result = health.readiness()
+    return JsonResponse(result, status=503 if result['status'] == health.FAIL else 200)
+
 # --- Deprecated / Redundant Views ---
 # The logic from these views has been consolidated into 'account_settings_view'
 # and 'general_logout_view'. They can be safely removed from urls.py.
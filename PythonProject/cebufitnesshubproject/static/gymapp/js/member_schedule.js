@@ -68,8 +68,10 @@
     }
 
     function fetchSchedule() {
-      const url = `/api/member-schedule/?t=${Date.now()}`;
-      fetch(url, { cache: 'no-store' })
+      // 'no-cache' revalidates with If-None-Match, so an unchanged
+      // schedule comes back as a cheap 304
+      const url = '/api/member-schedule/';
+      fetch(url, { cache: 'no-cache' })
         .then(handleResponse)
         .then(data => {
           scheduleState.classes = data.classes || [];
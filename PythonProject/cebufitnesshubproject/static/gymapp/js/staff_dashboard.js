@@ -167,37 +167,198 @@
   // MEMBER MANAGEMENT FUNCTIONS
   // ====================================================================
 
+  // Each tab is fetched from /staff/api/members/<tab>/ the first time it
+  // is opened, then page by page through the "Load more" button.
+  const MEMBER_TBODY_IDS = {
+    active: 'member-management-tbody',
+    pending: 'member-management-tbody-pending',
+    frozen: 'member-management-tbody-frozen',
+    deactivated: 'member-management-tbody-deactivated'
+  };
+
+  const MEMBER_EMPTY_TEXT = {
+    active: 'No active members found.',
+    pending: 'No pending members found.',
+    frozen: 'No frozen members found.',
+    deactivated: 'No deactivated members found.'
+  };
+
+  const memberTabState = {};
+  let currentMemberTab = 'active';
+
+  function getMemberTabState(tab) {
+    if (!memberTabState[tab]) {
+      memberTabState[tab] = { loaded: false, loading: false, nextCursor: null };
+    }
+    return memberTabState[tab];
+  }
+
+  function memberMessageRow(text) {
+    const tr = document.createElement('tr');
+    const td = document.createElement('td');
+    td.colSpan = 6;
+    td.style.textAlign = 'center';
+    td.style.padding = '20px';
+    td.style.color = '#666';
+    td.textContent = text;
+    tr.appendChild(td);
+    return tr;
+  }
+
+  function buildMemberRow(tab, member) {
+    const template = document.getElementById(`member-row-template-${tab}`);
+    const table = document.querySelector('.member-table');
+    const row = template.content.firstElementChild.cloneNode(true);
+
+    row.dataset.memberId = member.member_id;
+    row.dataset.memberName = member.name;
+    row.dataset.memberEmail = member.email;
+    row.dataset.contactNumber = member.contact_number;
+    row.dataset.eName = member.emergency_contact_name;
+    row.dataset.eContact = member.emergency_contact_number;
+    row.dataset.medical = member.medical_conditions;
+    row.dataset.goals = member.fitness_goals;
+    row.dataset.memberIdStr = member.membership_id;
+    row.dataset.dateJoined = member.date_joined;
+    row.dataset.balance = member.balance_display;
+    row.dataset.statusText = member.status_text;
+    row.dataset.checkinStatus = member.is_checked_in ? 'checked-in' : 'checked-out';
+
+    row.cells[0].textContent = member.name;
+    row.cells[2].textContent = `₱${table ? table.dataset.planFee : ''}`;
+    row.cells[3].textContent = member.last_checkin_display;
+    row.cells[4].textContent = `₱${member.balance_display}`;
+
+    if (tab === 'deactivated' && member.status_text === 'Expired') {
+      const badge = row.cells[1].querySelector('.badge');
+      badge.classList.remove('danger');
+      badge.classList.add('warning');
+      badge.textContent = 'Expired';
+    }
+    return row;
+  }
+
+  function loadMemberTab(tab, { reset = false } = {}) {
+    const tbody = document.getElementById(MEMBER_TBODY_IDS[tab]);
+    const state = getMemberTabState(tab);
+    if (!tbody || state.loading) return;
+    if (!reset && state.loaded && !state.nextCursor) return;
+
+    const table = document.querySelector('.member-table');
+    const params = new URLSearchParams();
+    const searchInput = document.getElementById('member-search-input');
+    const sortSelect = document.getElementById('member-sort-select');
+    const searchQuery = tab === 'active' && searchInput ? searchInput.value.trim() : '';
+
+    if (searchQuery) params.set('q', searchQuery);
+    if (sortSelect) params.set('sort', sortSelect.value);
+    if (table && table.dataset.pageSize) params.set('limit', table.dataset.pageSize);
+    if (!reset && state.nextCursor) params.set('cursor', state.nextCursor);
+
+    if (reset) {
+      state.loaded = false;
+      state.nextCursor = null;
+      tbody.innerHTML = '';
+    }
+    if (!state.loaded) {
+      tbody.appendChild(memberMessageRow('Loading members...'));
+    }
+
+    state.loading = true;
+    updateLoadMoreButton();
+
+    fetch(`/staff/api/members/${tab}/?${params.toString()}`)
+      .then(response => response.json())
+      .then(data => {
+        if (!state.loaded) tbody.innerHTML = '';
+        if (data.error) throw new Error(data.error);
+
+        data.results.forEach(member => tbody.appendChild(buildMemberRow(tab, member)));
+        state.loaded = true;
+        state.nextCursor = data.next_cursor;
+
+        if (!tbody.rows.length) {
+          const emptyText = searchQuery
+            ? `No active members found matching "${searchQuery}".`
+            : MEMBER_EMPTY_TEXT[tab];
+          tbody.appendChild(memberMessageRow(emptyText));
+        }
+      })
+      .catch(err => {
+        console.error('Error loading members:', err);
+        if (!state.loaded) {
+          tbody.innerHTML = '';
+          tbody.appendChild(memberMessageRow('Could not load members. Please try again.'));
+        }
+      })
+      .finally(() => {
+        state.loading = false;
+        updateLoadMoreButton();
+      });
+  }
+
+  function updateLoadMoreButton() {
+    const button = document.getElementById('member-load-more');
+    if (!button) return;
+    const state = getMemberTabState(currentMemberTab);
+    button.hidden = !(state.loaded && state.nextCursor);
+    button.disabled = state.loading;
+  }
+
   function handleMemberFilterChange(selectedValue) {
     const searchGroup = document.getElementById('member-search-group');
     if (!searchGroup) return;
 
-    const activeTbody = document.getElementById('member-management-tbody');
-    const pendingTbody = document.getElementById('member-management-tbody-pending');
-    const frozenTbody = document.getElementById('member-management-tbody-frozen');
-    const deactivatedTbody = document.getElementById('member-management-tbody-deactivated');
-
     // Hide all sections
-    [activeTbody, pendingTbody, frozenTbody, deactivatedTbody].forEach(tbody => {
+    Object.values(MEMBER_TBODY_IDS).forEach(id => {
+      const tbody = document.getElementById(id);
       if (tbody) tbody.style.display = 'none';
     });
 
-    // Show the selected section
+    const selectedTbody = document.getElementById(MEMBER_TBODY_IDS[selectedValue]);
+    if (!selectedTbody) return;
+
+    // Show the selected section (search only applies to the Active list)
     const searchInput = document.getElementById('member-search-input');
-    if (selectedValue === 'active' && activeTbody) {
-      activeTbody.style.display = 'table-row-group';
+    selectedTbody.style.display = 'table-row-group';
+    if (selectedValue === 'active') {
       searchGroup.style.display = 'flex';
-    } else if (selectedValue === 'pending' && pendingTbody) {
-      pendingTbody.style.display = 'table-row-group';
-      searchGroup.style.display = 'none';
-      if (searchInput) searchInput.value = '';
-    } else if (selectedValue === 'frozen' && frozenTbody) {
-      frozenTbody.style.display = 'table-row-group';
-      searchGroup.style.display = 'none';
-      if (searchInput) searchInput.value = '';
-    } else if (selectedValue === 'deactivated' && deactivatedTbody) {
-      deactivatedTbody.style.display = 'table-row-group';
+    } else {
       searchGroup.style.display = 'none';
-      if (searchInput) searchInput.value = '';
+      if (searchInput && searchInput.value) {
+        searchInput.value = '';
+        memberTabState.active = null; // Reload Active without the old search next time
+      }
+    }
+
+    currentMemberTab = selectedValue;
+    loadMemberTab(selectedValue);
+    updateLoadMoreButton();
+  }
+
+  function initializeMemberList() {
+    const searchGroup = document.getElementById('member-search-group');
+    if (searchGroup) {
+      searchGroup.addEventListener('submit', e => {
+        e.preventDefault();
+        loadMemberTab('active', { reset: true });
+      });
+    }
+
+    const sortSelect = document.getElementById('member-sort-select');
+    if (sortSelect) {
+      sortSelect.addEventListener('change', () => {
+        // Other tabs reload with the new order when they are next opened
+        Object.keys(memberTabState).forEach(tab => {
+          if (tab !== currentMemberTab) memberTabState[tab] = null;
+        });
+        loadMemberTab(currentMemberTab, { reset: true });
+      });
+    }
+
+    const loadMoreBtn = document.getElementById('member-load-more');
+    if (loadMoreBtn) {
+      loadMoreBtn.addEventListener('click', () => loadMemberTab(currentMemberTab));
     }
   }
 
@@ -617,6 +778,113 @@
     });
   }
 
+  // ====================================================================
+  // IN THE GYM (members checked in right now)
+  // ====================================================================
+
+  // Loaded from /staff/api/in-gym/, longest inside first, page by page.
+  // The count next to the title is the same figure members see.
+  const inGymState = { loaded: false, loading: false, nextCursor: null };
+
+  function formatElapsed(minutes) {
+    if (minutes < 60) return `${minutes} min`;
+    return `${Math.floor(minutes / 60)} h ${minutes % 60} min`;
+  }
+
+  function inGymMessageRow(text) {
+    const tr = document.createElement('tr');
+    const td = document.createElement('td');
+    td.colSpan = 4;
+    td.style.textAlign = 'center';
+    td.style.padding = '20px';
+    td.style.color = '#666';
+    td.textContent = text;
+    tr.appendChild(td);
+    return tr;
+  }
+
+  function buildInGymRow(visit) {
+    const tr = document.createElement('tr');
+    tr.dataset.memberId = visit.member_id;
+    [visit.name, visit.membership_id, visit.check_in_display, formatElapsed(visit.elapsed_minutes)]
+      .forEach(text => {
+        const td = document.createElement('td');
+        td.textContent = text;
+        tr.appendChild(td);
+      });
+    return tr;
+  }
+
+  function loadInGym({ reset = false } = {}) {
+    const tbody = document.getElementById('in-gym-tbody');
+    const button = document.getElementById('in-gym-load-more');
+    if (!tbody || inGymState.loading) return;
+    if (!reset && inGymState.loaded && !inGymState.nextCursor) return;
+
+    const table = document.querySelector('.in-gym-table');
+    const params = new URLSearchParams();
+    if (table && table.dataset.pageSize) params.set('limit', table.dataset.pageSize);
+    if (!reset && inGymState.nextCursor) params.set('cursor', inGymState.nextCursor);
+
+    inGymState.loading = true;
+    if (button) button.disabled = true;
+
+    fetch(`/staff/api/in-gym/?${params.toString()}`)
+      .then(response => response.json())
+      .then(data => {
+        if (data.error) throw new Error(data.error);
+        if (reset || !inGymState.loaded) tbody.innerHTML = '';
+
+        data.results.forEach(visit => tbody.appendChild(buildInGymRow(visit)));
+        inGymState.loaded = true;
+        inGymState.nextCursor = data.next_cursor;
+
+        const countEl = document.getElementById('in-gym-count');
+        if (countEl) countEl.textContent = `${data.count} / ${data.capacity}`;
+        if (!tbody.rows.length) tbody.appendChild(inGymMessageRow('Nobody is checked in right now.'));
+      })
+      .catch(err => {
+        console.error('Error loading the in-gym list:', err);
+        if (!inGymState.loaded) {
+          tbody.innerHTML = '';
+          tbody.appendChild(inGymMessageRow('Could not load the list. Please try again.'));
+        }
+      })
+      .finally(() => {
+        inGymState.loading = false;
+        if (button) {
+          button.hidden = !(inGymState.loaded && inGymState.nextCursor);
+          button.disabled = false;
+        }
+      });
+  }
+
+  // ====================================================================
+  // KPI HEADER REFRESH
+  // ====================================================================
+
+  function formatPeso(value) {
+    const amount = Number(value) || 0;
+    return '₱' + amount.toLocaleString('en-US', {
+      minimumFractionDigits: 2,
+      maximumFractionDigits: 2
+    });
+  }
+
+  function refreshKpis() {
+    fetch('/staff/api/kpis/')
+      .then(response => response.json())
+      .then(data => {
+        if (data.error) return;
+        document.querySelectorAll('[data-kpi]').forEach(el => {
+          const value = data[el.dataset.kpi];
+          if (value === undefined) return;
+          el.textContent = el.hasAttribute('data-kpi-money') ? formatPeso(value) : value;
+        });
+      })
+      .catch(err => console.error('Error refreshing KPIs:', err));
+  }
+
     // ========================================================================
     //-----------------------CHART FUNCTION----------------------------------
     //=======================================================================
@@ -628,8 +896,17 @@
 
     const chartTitleEl = document.getElementById('revenue-chart-title');
 
-    // Fetch data from the API, now with a 'filter' parameter
-    fetch(`/staff/revenue-chart-data/?filter=${filterType}`)
+    // 'history' charts the last three years by month; the other
+    // filters map onto the API's built-in ranges.
+    let query = `filter=${filterType}`;
+    if (filterType === 'history') {
+        const today = new Date();
+        const start = `${today.getFullYear() - 2}-01-01`;
+        const end = `${today.getFullYear()}-12-31`;
+        query = `start=${start}&end=${end}&granularity=month`;
+    }
+
+    fetch(`/staff/revenue-chart-data/?${query}`)
         .then(response => response.json())
         .then(data => {
             
@@ -641,6 +918,8 @@
             let chartLabel = 'Revenue This Month';
             if (filterType === 'monthly') {
                 chartLabel = 'Revenue This Year';
+            } else if (filterType === 'history') {
+                chartLabel = 'Revenue (Last 3 Years)';
             }
             
             // Update the title in the HTML
@@ -655,7 +934,7 @@
                     labels: data.labels, // The dates or months
                     datasets: [{
                         label: chartLabel,
-                        data: data.data, // The amounts
+                        data: data.data.map(Number), // Amounts arrive as exact decimal strings
                         borderColor: '#6BCB3D',
                         backgroundColor: 'rgba(107, 203, 61, 0.1)',
                         fill: true,
@@ -780,6 +1059,7 @@
 
     // Setup member management dropdown
     initializeFilterDropdown();
+    initializeMemberList();
     handleMemberFilterChange('active');
 
     updateRevenueChart('daily'); 
@@ -1446,12 +1726,60 @@
     // --- END NEW LOGIC ---
 
     // ==========================================================
-    // NOTIFICATION AUTO-RELOADER (POLLING)
+    // NOTIFICATION FEED (LIVE STREAM WITH POLLING FALLBACK)
     // ==========================================================
+    const NOTIFICATION_FEED_SIZE = 10;
+
+    function setUnreadCount(count) {
+        document.querySelectorAll('[data-unread-badge]').forEach(badge => {
+            badge.textContent = count;
+            badge.hidden = count <= 0;
+        });
+    }
+
+    function getUnreadCount() {
+        const badge = document.querySelector('[data-unread-badge]');
+        return badge ? parseInt(badge.textContent, 10) || 0 : 0;
+    }
+
+    function buildNotificationItem(notif) {
+        const isReadClass = notif.is_read ? 'is-read' : '';
+        const styleClass = `notif-item--${notif.style_type}`; // e.g., notif-item--warning
+
+        // Determine dot color
+        let dotColor = 'neutral';
+        if (notif.is_read) {
+            dotColor = 'neutral'; // Gray if read
+        } else if (notif.style_type === 'warning') {
+            dotColor = 'warning'; // Yellow if warning
+        } else {
+            dotColor = 'success'; // Green otherwise
+        }
+
+        const item = document.createElement('li');
+        item.className = `notif-item ${isReadClass} ${styleClass}`;
+        item.dataset.notificationId = notif.id;
+        item.innerHTML = `
+            <a href="${notif.read_url}" class="notif-link">
+                <span class="dot ${dotColor}" aria-hidden="true"></span>
+                <div class="notif-content">
+                    <span class="notif-prefix"></span>
+                    <span class="notif-message"></span>
+                </div>
+                <time class="notif-time"></time>
+            </a>`;
+        item.querySelector('.notif-prefix').textContent = notif.prefix;
+        item.querySelector('.notif-message').textContent = notif.message;
+        item.querySelector('.notif-time').textContent = notif.time_ago;
+        return item;
+    }
+
     function loadNotifications() {
       fetch('/staff/api/notifications/')
           .then(response => response.json())
           .then(data => {
+              if (typeof data.unread_count === 'number') setUnreadCount(data.unread_count);
+
               const listContainer = document.querySelector('.notif-list');
               if (!listContainer || !data.notifications) return;
 
@@ -1474,47 +1802,101 @@
 
               // Rebuild list from JSON data
               data.notifications.forEach(notif => {
-                  const isReadClass = notif.is_read ? 'is-read' : '';
-                  const styleClass = `notif-item--${notif.style_type}`; // e.g., notif-item--warning
-                  
-                  // Determine dot color
-                  let dotColor = 'neutral';
-                  if (notif.is_read) {
-                      dotColor = 'neutral'; // Gray if read
-                  } else if (notif.style_type === 'warning') {
-                      dotColor = 'warning'; // Yellow if warning
-                  } else {
-                      dotColor = 'success'; // Green otherwise
-                  }
-
-                  const html = `
-                      <li class="notif-item ${isReadClass} ${styleClass}">
-                          <a href="${notif.read_url}" class="notif-link">
-                              <span class="dot ${dotColor}" aria-hidden="true"></span>
-                              <div class="notif-content">
-                                  <span class="notif-prefix">${notif.prefix}</span>
-                                  <span class="notif-message">${notif.message}</span>
-                              </div>
-                              <time class="notif-time">${notif.time_ago}</time>
-                          </a>
-                      </li>
-                  `;
-                  listContainer.insertAdjacentHTML('beforeend', html);
+                  listContainer.appendChild(buildNotificationItem(notif));
               });
           })
           .catch(err => console.error('Error loading notifications:', err));
   }
 
-  // 1. Load immediately on init (to refresh timestamps)
-  // loadNotifications(); // Optional: Uncomment if you want JS to take over immediately
+  function prependNotification(notif) {
+      const listContainer = document.querySelector('.notif-list');
+      if (!listContainer) return;
+      if (listContainer.querySelector(`[data-notification-id="${notif.id}"]`)) return;
+
+      // Drop the "no notifications" placeholder, then keep the newest 10
+      listContainer.querySelectorAll('.notif-item:not([data-notification-id])').forEach(el => {
+          if (el.querySelector('.notif-link[href="#"]')) el.remove();
+      });
+      listContainer.prepend(buildNotificationItem(notif));
+      if (!notif.is_read) setUnreadCount(getUnreadCount() + 1);
+      while (listContainer.children.length > NOTIFICATION_FEED_SIZE) {
+          listContainer.lastElementChild.remove();
+      }
+  }
+
+  let notificationPollTimer = null;
+
+  function startNotificationPolling() {
+      if (notificationPollTimer) return;
+      // Poll every 5 seconds (5000ms)
+      notificationPollTimer = setInterval(loadNotifications, 5000);
+  }
+
+  function startNotificationStream() {
+      if (!window.EventSource) {
+          startNotificationPolling();
+          return;
+      }
+
+      const source = new EventSource('/staff/api/notifications/stream/');
+      let hasConnected = false;
 
-  // 2. Set interval to run every 5 seconds (5000ms)
-  setInterval(loadNotifications, 5000);
+      source.addEventListener('open', () => {
+          // After a reconnect, fetch once to pick up anything missed
+          if (hasConnected) loadNotifications();
+          hasConnected = true;
+      });
+      source.addEventListener('notification', (event) => {
+          prependNotification(JSON.parse(event.data));
+      });
+      source.addEventListener('error', () => {
+          // CLOSED means the server cannot stream (e.g. 204 under WSGI):
+          // stop retrying and fall back to polling.
+          if (source.readyState === EventSource.CLOSED) {
+              startNotificationPolling();
+          }
+      });
+  }
+
+  startNotificationStream();
+
+  const markAllButton = document.getElementById('notif-mark-all');
+  if (markAllButton) {
+      markAllButton.addEventListener('click', () => {
+          const csrfToken = document.querySelector('input[name="csrfmiddlewaretoken"]').value;
+          markAllButton.disabled = true;
+          fetch(markAllButton.dataset.url, {
+              method: 'POST',
+              headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken },
+              body: JSON.stringify({})
+          })
+              .then(response => response.json())
+              .then(data => {
+                  if (data.status !== 'success') throw new Error(data.message);
+                  setUnreadCount(data.unread_count);
+                  loadNotifications();
+              })
+              .catch(err => console.error('Error marking notifications read:', err))
+              .finally(() => { markAllButton.disabled = false; });
+      });
+  }
   // ==========================================================
 
+  // Refresh the KPI header and the in-gym list once a minute while the tab is visible
+  setInterval(() => {
+    if (document.hidden) return;
+    refreshKpis();
+    loadInGym({ reset: true });
+  }, 60000);
+
     // Initialize dropdowns
     initializeActionDropdowns(modals);
 
+    // --- In the Gym panel ---
+    const inGymLoadMore = document.getElementById('in-gym-load-more');
+    if (inGymLoadMore) inGymLoadMore.addEventListener('click', () => loadInGym());
+    loadInGym({ reset: true });
+
     // --- Notifications: show loading state on selection ---
     const notifLinks = document.querySelectorAll('.notif-list .notif-link');
     notifLinks.forEach(link => {